@@ -0,0 +1,120 @@
+"""
+Compares the cost of evaluating selectors with lxml's CSSSelector (XPath)
+and with screp's selectors (see screp/selectors.py), on a class-heavy
+synthetic document (see corpus.py): from the root, as a primary selector is,
+and from every row, as the selectors of terms are.
+
+Usage: python benchmarks/bench_selectors.py [--rows N] [--repeat N]
+"""
+import sys
+import os
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import lxml.etree as etree
+from lxml.cssselect import CSSSelector
+
+from screp.utils import translate_css
+from screp.selectors import (
+        make_css_selector,
+        make_axis_selector,
+        )
+
+from corpus import make_document
+
+
+# selectors evaluated from the root
+ROOT_SELECTORS = [
+        'tr',
+        'tr.row',
+        '.row',
+        '.row.kind-3',
+        'td.price',
+        '#products',
+        'table > tr.row',
+        'div.level tr .name a',
+        ]
+
+# selectors evaluated from each row: (action, selector)
+ROW_SELECTORS = [
+        ('desc', '.price'),
+        ('desc', 'a'),
+        ('desc', 'td.desc b'),
+        ('fdesc', '.name > a'),
+        ('children', 'td.desc'),
+        ('ancestors', 'div.level'),
+        ]
+
+AXES = {
+        'children': 'child::',
+        'ancestors': 'ancestor::',
+        }
+
+
+def best_time(f, repeat):
+    best = None
+
+    for _ in xrange(repeat):
+        start = time.time()
+        f()
+        elapsed = time.time() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def make_selectors(action, selector):
+    """
+    Returns (XPath selector, screp selector) applying the action.
+    """
+    if action == 'desc':
+        return (CSSSelector(selector), make_css_selector(selector))
+    elif action == 'fdesc':
+        xpath = CSSSelector(selector)
+        fast = make_css_selector(selector)
+        return (lambda e: xpath(e)[0], fast.first)
+    else:
+        axis = AXES[action]
+        return (etree.XPath(translate_css(selector, prefix=axis)), make_axis_selector(selector, axis))
+
+
+def report(label, xpath_time, fast_time):
+    print '%-32s xpath %9.3f ms   screp %9.3f ms   x%.2f' % (label, xpath_time * 1e3, fast_time * 1e3, xpath_time / fast_time)
+
+
+def main(argv):
+    parser = OptionParser(usage='%prog [options]')
+
+    parser.add_option('--rows', dest='rows', type='int', default=5000,
+            help='number of rows of the document')
+    parser.add_option('--repeat', dest='repeat', type='int', default=5,
+            help='number of runs of each selector; the best is reported')
+
+    (options, _) = parser.parse_args(argv)
+
+    root = etree.fromstring(make_document(rows=options.rows), etree.HTMLParser(remove_blank_text=True))
+    rows = CSSSelector('tr.row')(root)
+
+    for selector in ROOT_SELECTORS:
+        (xpath, fast) = make_selectors('desc', selector)
+
+        assert xpath(root) == fast(root)
+
+        report(selector, best_time(lambda: xpath(root), options.repeat), best_time(lambda: fast(root), options.repeat))
+
+    for (action, selector) in ROW_SELECTORS:
+        (xpath, fast) = make_selectors(action, selector)
+
+        assert [xpath(r) for r in rows] == [fast(r) for r in rows]
+
+        report('%s("%s") x %d' % (action, selector, len(rows)),
+                best_time(lambda: [xpath(r) for r in rows], options.repeat),
+                best_time(lambda: [fast(r) for r in rows], options.repeat))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,175 @@
+"""
+Measures the start up of screp: the time to run it on a tiny document, in a
+new interpreter, for several modes, and the modules each mode imports.
+
+Python 2 has no '-X importtime', so with --imports the time spent importing
+each module is measured by wrapping __import__, and reported like
+'-X importtime' does: the time of the module alone and including the modules
+it imports, in us.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--imports MODE]
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from optparse import OptionParser
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+DOCUMENT = '<html><body><ul><li class="a"><a href="/1">one</a></li><li><a href="/2">two</a></li></ul></body></html>'
+
+# name -> command line, with the document as the last argument; the program
+# cache directory is given by --program-cache if the mode uses it
+MODES = [
+        ('csv', ['-c', '$.fdesc("a").text, $.fdesc("a").attr("href")', 'li']),
+        ('json', ['-j', 'text=$.fdesc("a").text, href=$.fdesc("a").attr("href")', 'li']),
+        ('json_lines', ['-J', 'text=$.fdesc("a").text', 'li']),
+        ('cached_program', ['--program-cache', None, '-c', '$.fdesc("a").text, $.fdesc("a").attr("href")', 'li']),
+        ]
+
+# runs main in a new interpreter, then writes the imported modules on stderr
+RUNNER = '''
+import sys
+sys.path.insert(0, %(root)r)
+%(setup)s
+import screp.main
+sys.argv = ['screp'] + %(args)r
+try:
+    screp.main.main()
+except SystemExit:
+    pass
+%(report)s
+sys.stderr.write('\\nMODULES ' + ' '.join(sorted(m for (m, v) in sys.modules.items() if v is not None)) + '\\n')
+'''
+
+# times the imports, as -X importtime does
+IMPORT_TIMER = '''
+import __builtin__
+import time
+
+import_times = []
+depth = [0]
+real_import = __builtin__.__import__
+
+def timed_import(name, *args, **kwargs):
+    if name in sys.modules:
+        return real_import(name, *args, **kwargs)
+
+    depth[0] += 1
+    nested = len(import_times)
+    start = time.time()
+
+    try:
+        return real_import(name, *args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        depth[0] -= 1
+        inner = sum(t for (d, n, t, _) in import_times[nested:] if d == depth[0] + 1)
+        import_times.append((depth[0], name, elapsed, elapsed - inner))
+
+__builtin__.__import__ = timed_import
+'''
+
+IMPORT_REPORT = '''
+sys.stderr.write('import time: self [us] | cumulative | imported package\\n')
+for (d, name, cumulative, own) in import_times:
+    sys.stderr.write('import time: %9d | %10d | %s%s\\n' % (own * 1e6, cumulative * 1e6, '  ' * d, name))
+'''
+
+
+def make_args(mode_args, path, cache_dir):
+    return [cache_dir if a is None else a for a in mode_args] + [path]
+
+
+def run_mode(mode_args, path, cache_dir, imports=False):
+    """
+    Runs screp in a new interpreter; returns (elapsed time, stderr output).
+    """
+    runner = RUNNER % {
+            'root': ROOT,
+            'setup': IMPORT_TIMER if imports else '',
+            'args': make_args(mode_args, path, cache_dir),
+            'report': IMPORT_REPORT if imports else '',
+            }
+
+    start = time.time()
+
+    process = subprocess.Popen([sys.executable, '-c', runner], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (_, err) = process.communicate()
+
+    return (time.time() - start, err)
+
+
+def imported_modules(err):
+    for line in err.splitlines():
+        if line.startswith('MODULES '):
+            return line.split()[1:]
+
+    return []
+
+
+def main(argv):
+    parser = OptionParser(usage='%prog [options]')
+
+    parser.add_option('--repeat', dest='repeat', type='int', default=10,
+            help='number of runs of each mode; the best is reported')
+    parser.add_option('--imports', dest='imports', default=None,
+            help='report the import times of this mode, instead')
+    parser.add_option('-o', '--output', dest='output', default=None,
+            help='write the results to this file, as JSON')
+
+    (options, _) = parser.parse_args(argv)
+
+    modes = dict(MODES)
+
+    directory = tempfile.mkdtemp(prefix='screp-bench-')
+
+    try:
+        path = os.path.join(directory, 'page.html')
+        cache_dir = os.path.join(directory, 'programs')
+
+        with open(path, 'w') as f:
+            f.write(DOCUMENT)
+
+        if options.imports is not None:
+            # a first run fills the program cache
+            run_mode(modes[options.imports], path, cache_dir)
+            (_, err) = run_mode(modes[options.imports], path, cache_dir, imports=True)
+            sys.stderr.write('\n'.join(l for l in err.splitlines() if not l.startswith('MODULES ')) + '\n')
+            return
+
+        results = {}
+
+        for (name, mode_args) in MODES:
+            run_mode(mode_args, path, cache_dir)
+
+            times = []
+
+            for _ in xrange(options.repeat):
+                (elapsed, err) = run_mode(mode_args, path, cache_dir)
+                times.append(elapsed)
+
+            modules = [m for m in imported_modules(err) if not m.startswith('screp')]
+
+            results[name] = {
+                    'ms': round(min(times) * 1e3, 2),
+                    'modules': len(modules),
+                    }
+
+            print '%-16s %8.2f ms  %4d modules' % (name, min(times) * 1e3, len(modules))
+    finally:
+        shutil.rmtree(directory)
+
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,203 @@
+"""
+Runs representative screp invocations on a synthetic document (see
+corpus.py) and reports the best time of each, in us per record. The results
+can be saved as JSON with --output and compared with compare.py.
+
+The invocations run in process, through the same functions as the command
+line, from reading the document to formatting the records; the output is
+discarded.
+
+Usage: python benchmarks/bench_suite.py [options] [case ...]
+"""
+import sys
+import os
+import time
+import json
+import shutil
+import platform
+import tempfile
+import subprocess
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import screp.main as screp_main
+from screp.output import OutputSink
+from screp.planner import make_plan
+
+from corpus import make_document
+
+
+SELECTOR = 'tr.row'
+
+# name -> command line options; every case selects SELECTOR
+CASES = [
+        ('csv_simple', ['-c', '$.attr("id"), $.fdesc("a").text, $.attr("class")']),
+        ('csv_anchors', [
+            '-a', 'name=$.fdesc(".name a")',
+            '-a', 'desc=$.fdesc(".desc")',
+            '-c', 'name.text, name.attr("href"), name.attr("title"), desc.fdesc("b").text, desc.fdesc("span").text',
+            ]),
+        ('csv_deep_chains', ['-c', ','.join([
+            '$.parent.parent.parent.attr("class")',
+            '$.ancestors("div").last.attr("class")',
+            '$.children("td").last.children("span").first.fdesc("b").text',
+            '$.parent.children("tr").first.fdesc("a").attr("href")',
+            '$.fsiblings("tr").first.attr("id")',
+            ])]),
+        ('csv_regex', ['-c', ','.join([
+            '$.fdesc(".price").text | resub("[^0-9]", "", "g")',
+            '$.fdesc("a").attr("href") | resub("/item/", "")',
+            '$.fdesc("a").text | resub("^(\\\\w+) (\\\\w+)", "\\\\2 \\\\1", "f") | upper',
+            ])]),
+        ('csv_shared_contexts', ['-c', ','.join([
+            '@.fdesc("h1").text',
+            '@.fdesc("#footer p").text',
+            '$.parent.fdesc("tr").attr("id")',
+            '$.fdesc("a").text',
+            ])]),
+        ('json', ['-j', 'id=$.attr("id"), name=$.fdesc("a").text | upper, href=$.fdesc("a").attr("href")']),
+        ('json_lines', ['-J', 'id=$.attr("id"), name=$.fdesc("a").text | upper, href=$.fdesc("a").attr("href")']),
+        ('general', ['-f', 'item {$.attr("id")}: {$.fdesc("a").text} ({$.fdesc("a").attr("href")})']),
+        ('csv_stream', ['--stream', '-c', '$.attr("id"), $.fdesc("a").text, $.attr("class")']),
+        ]
+
+
+class NullStream(object):
+    def write(self, s):
+        pass
+
+
+    def flush(self):
+        pass
+
+
+def prepare(argv, path):
+    """
+    Compiles an invocation of screp as main does; returns a function running
+    it on the document at 'path'.
+    """
+    (options, selector, _) = screp_main.parse_cli_options(argv + [SELECTOR])
+
+    screp_main.options = options
+
+    factory = screp_main.make_anchors_factory(options.anchors)
+    (formatter, terms) = screp_main.get_formatter(factory)
+    factory.prune(terms)
+    plan = make_plan(terms, factory)
+    selector = screp_main.get_selector(selector)
+
+    def run():
+        # the module globals may have been set by another case
+        screp_main.options = options
+        screp_main.output = OutputSink(NullStream())
+
+        screp_main.screp_all(formatter, plan, selector, screp_main.make_data_sources([path]))
+
+        screp_main.output.flush()
+
+    return run
+
+
+def measure(run, repeat):
+    best = None
+
+    for _ in xrange(repeat):
+        start = time.time()
+        run()
+        elapsed = time.time() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def get_revision():
+    try:
+        directory = os.path.dirname(os.path.abspath(__file__))
+
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=directory, stderr=devnull).strip()
+    except Exception:
+        return None
+
+
+def parse_options(argv):
+    parser = OptionParser(usage='%prog [options] [case ...]')
+
+    parser.add_option('--rows', dest='rows', type='int', default=5000,
+            help='number of rows of the document')
+    parser.add_option('--depth', dest='depth', type='int', default=3,
+            help='number of div elements around the table')
+    parser.add_option('--words', dest='words', type='int', default=8,
+            help='number of words in the parts of the descriptions')
+    parser.add_option('--seed', dest='seed', type='int', default=0,
+            help='seed of the generated document')
+    parser.add_option('--repeat', dest='repeat', type='int', default=5,
+            help='number of runs of each case; the best is reported')
+    parser.add_option('-o', '--output', dest='output', default=None,
+            help='write the results to this file, as JSON')
+
+    (options, names) = parser.parse_args(argv)
+
+    known = [name for (name, _) in CASES]
+
+    for name in names:
+        if name not in known:
+            parser.error('Unknown case: %s! Cases: %s' % (name, ', '.join(known)))
+
+    return (options, names)
+
+
+def main(argv):
+    (options, names) = parse_options(argv)
+
+    cases = [(name, args) for (name, args) in CASES if len(names) == 0 or name in names]
+
+    document = make_document(rows=options.rows, depth=options.depth, words=options.words, seed=options.seed)
+
+    directory = tempfile.mkdtemp(prefix='screp-bench-')
+
+    try:
+        path = os.path.join(directory, 'corpus.html')
+
+        with open(path, 'w') as f:
+            f.write(document)
+
+        results = {}
+
+        for (name, args) in cases:
+            elapsed = measure(prepare(args, path), options.repeat)
+
+            results[name] = {
+                    'seconds': round(elapsed, 6),
+                    'us_per_record': round(elapsed * 1e6 / options.rows, 3),
+                    }
+
+            print '%-16s %9.2f us/record  %8.3f s' % (name, elapsed * 1e6 / options.rows, elapsed)
+    finally:
+        shutil.rmtree(directory)
+
+    report = {
+            'revision': get_revision(),
+            'python': platform.python_version(),
+            'corpus': {
+                'rows': options.rows,
+                'depth': options.depth,
+                'words': options.words,
+                'seed': options.seed,
+                'bytes': len(document),
+                },
+            'repeat': options.repeat,
+            'cases': results,
+            }
+
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,123 @@
+"""
+Measures the per-record cost of computing terms and anchors: executed action
+by action, and planned together, with their common prefixes computed once.
+
+Usage: python benchmarks/bench_terms.py [records] [repeat]
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import lxml.html as html
+from lxml.cssselect import CSSSelector
+
+from screp.context import (
+        AnchorContext,
+        AnchorContextFactory,
+        )
+from screp.planner import make_plan
+from screp.format_parsers import (
+        parse_csv_formatter,
+        parse_anchor,
+        )
+
+
+FORMAT = ','.join([
+        '$.text',
+        '$.attr("id")',
+        '$.children("b").first.tag',
+        '$.fdesc("b").text',
+        '$.parent.children("td").first.fdesc("b").text',
+        '$.fdesc("b").text.resub("[0-9]", "#", "g")',
+        'row.attr("class")',
+        'row.attr("id")',
+        '$.parent.parent.attr("id")',
+        '$.parent.parent.tag',
+        '$.fsiblings("td").last.text',
+        '$.fsiblings("td").last.text.upper.strip("0")',
+        ])
+
+ANCHORS = [
+        'row=$.parent',
+        ]
+
+
+def make_document(records):
+    rows = []
+
+    for i in xrange(records):
+        rows.append('<tr id="r%d" class="row c%d"><td id="c%d"><b>%d</b>%d</td><td>%d0</td></tr>' % (i, i % 7, i, i, i, i))
+
+    return '<html><body><table id="t">%s</table></body></html>' % (''.join(rows),)
+
+
+def make_program():
+    factory = AnchorContextFactory((('$', 'element'), ('@', 'element')))
+
+    for a in ANCHORS:
+        factory.add_anchor(parse_anchor(a, factory))
+
+    (_, terms) = parse_csv_formatter(FORMAT, factory)
+
+    return (factory, terms)
+
+
+def interpret_record(factory, terms, primary):
+    context = AnchorContext(primary)
+
+    for anchor in factory.anchors:
+        context.add_anchor(anchor.name, anchor.term.execute(context))
+
+    return [t.execute(context) for t in terms]
+
+
+def planned_record(plan, primary):
+    values = plan.evaluate(primary)
+
+    return [t.execute(values) for t in plan.outputs]
+
+
+def run(primaries, compute, repeat):
+    best = None
+
+    for _ in xrange(repeat):
+        start = time.time()
+
+        for primary in primaries:
+            compute(primary)
+
+        elapsed = time.time() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def main(argv):
+    records = int(argv[0]) if len(argv) > 0 else 20000
+    repeat = int(argv[1]) if len(argv) > 1 else 5
+
+    dom = html.fromstring(make_document(records))
+    (factory, terms) = make_program()
+    plan = make_plan(terms, factory)
+
+    primaries = [{'$': e, '@': dom} for e in CSSSelector('td:first-child')(dom)]
+
+    results = [
+            ('interpreted', run(primaries, lambda p: interpret_record(factory, terms, p), repeat)),
+            ('planned', run(primaries, lambda p: planned_record(plan, p), repeat)),
+            ]
+
+    print 'records: %d, terms: %d, anchors: %d' % (len(primaries), len(terms), len(ANCHORS))
+
+    baseline = results[0][1]
+
+    for (name, elapsed) in results:
+        print '%-12s %7.2f us/record  %.2fx' % (name + ':', elapsed * 1e6 / len(primaries), baseline / elapsed)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+"""
+Compares two results files of bench_suite.py, usually of two revisions, and
+reports the change of each case. Exits with status 1 if some case got slower
+by more than the threshold.
+
+Usage: python benchmarks/compare.py [--threshold PERCENT] old.json new.json
+"""
+import sys
+import json
+from optparse import OptionParser
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold):
+    """
+    Returns a list of tuples (case, old us/record, new us/record, change in
+    percent, whether it is a regression), for the cases in both results.
+    """
+    rows = []
+
+    for name in sorted(set(old['cases']) & set(new['cases'])):
+        before = old['cases'][name]['us_per_record']
+        after = new['cases'][name]['us_per_record']
+
+        change = 100.0 * (after - before) / before
+
+        rows.append((name, before, after, change, change > threshold))
+
+    return rows
+
+
+def main(argv):
+    parser = OptionParser(usage='%prog [options] old.json new.json')
+
+    parser.add_option('-t', '--threshold', dest='threshold', type='float', default=10.0,
+            help='slowdown, in percent, reported as a regression')
+
+    (options, args) = parser.parse_args(argv)
+
+    if len(args) != 2:
+        parser.error('Two results files are needed!')
+
+    (old, new) = [load(path) for path in args]
+
+    if old['corpus'] != new['corpus']:
+        print >>sys.stderr, 'WARNING: the results were measured on different documents'
+
+    print '%-16s %12s %12s %9s' % ('case', old['revision'], new['revision'], 'change')
+
+    regressions = 0
+
+    for (name, before, after, change, regression) in compare(old, new, options.threshold):
+        print '%-16s %12.2f %12.2f %+8.1f%%%s' % (name, before, after, change, '  REGRESSION' if regression else '')
+
+        if regression:
+            regressions += 1
+
+    if regressions > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
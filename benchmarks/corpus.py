@@ -0,0 +1,81 @@
+"""
+Generates synthetic HTML documents for the benchmarks: a table of product
+rows, nested in 'depth' levels of div elements, within a page with a header
+and a footer. The same parameters always generate the same document.
+
+Each row looks like:
+
+    <tr id="r12" class="row kind-3">
+      <td class="name"><a href="/item/12" title="...">words</a></td>
+      <td class="price">$123.45</td>                    (missing in some rows)
+      <td class="desc"><span>words <b>words</b></span> words</td>
+    </tr>
+
+Usage: python benchmarks/corpus.py [rows] [depth] [words] [seed] > page.html
+"""
+import sys
+import random
+
+
+WORDS = '''
+alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi
+omicron pi rho sigma tau upsilon phi chi psi omega red green blue black white
+small large light heavy fast slow new old cheap rare common 2012 2013 42 7
+'''.split()
+
+# the share of the rows without a price
+MISSING_PRICE = 0.1
+
+KINDS = 5
+
+
+def make_words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in xrange(count))
+
+
+def make_row(rng, i, words):
+    cells = []
+
+    cells.append('<td class="name"><a href="/item/%d" title="%s">%s</a></td>' % (i, make_words(rng, 2), make_words(rng, 3)))
+
+    if rng.random() >= MISSING_PRICE:
+        cells.append('<td class="price">$%d.%02d</td>' % (rng.randint(1, 999), rng.randint(0, 99)))
+
+    cells.append('<td class="desc"><span>%s <b>%s</b></span> %s</td>' % (make_words(rng, words), make_words(rng, 2), make_words(rng, words)))
+
+    return '<tr id="r%d" class="row kind-%d">%s</tr>\n' % (i, rng.randint(1, KINDS), ''.join(cells))
+
+
+def make_document(rows=1000, depth=3, words=8, seed=0):
+    """
+    Returns a document with 'rows' rows nested in 'depth' div elements, with
+    descriptions of about 2 * 'words' words.
+    """
+    rng = random.Random(seed)
+
+    parts = ['<html><head><title>Products</title></head><body>\n',
+            '<div id="header"><h1>Products</h1><p>%s</p></div>\n' % (make_words(rng, 20),)]
+
+    for level in xrange(depth):
+        parts.append('<div class="level level-%d">' % (level,))
+
+    parts.append('<table id="products">\n')
+
+    for i in xrange(rows):
+        parts.append(make_row(rng, i, words))
+
+    parts.append('</table>')
+    parts.append('</div>' * depth)
+    parts.append('\n<div id="footer"><p>%s</p></div>\n</body></html>\n' % (make_words(rng, 20),))
+
+    return ''.join(parts)
+
+
+def main(argv):
+    args = [int(a) for a in argv]
+
+    sys.stdout.write(make_document(*args))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,20 @@
+# the library interface is imported when first used, not by the command line
+# tool, which imports this package first
+
+
+def compile(selector, format, anchors=(), null_value=None, stop_on_error=False):
+    """
+    Compiles a selector and a format into a Scraper (see screp.api.compile).
+    """
+    from .api import compile
+
+    return compile(selector, format, anchors=anchors, null_value=null_value, stop_on_error=stop_on_error)
+
+
+def Scraper(*args, **kwargs):
+    """
+    Makes a screp.api.Scraper; Scrapers are usually made by compile.
+    """
+    from .api import Scraper
+
+    return Scraper(*args, **kwargs)
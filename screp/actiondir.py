@@ -1,7 +1,9 @@
-from lxml.etree import (
-        XPath,
-        tostring,
+from operator import (
+        attrgetter,
+        itemgetter,
+        methodcaller,
         )
+from lxml.etree import tostring
 
 from .termactions import (
         make_generic_action,
@@ -10,10 +12,8 @@ from .termactions import (
         make_custom_selector_action,
         RegexTermAction,
         )
-from .utils import (
-        generic_translator,
-        preprocess_selector,
-        )
+from .utils import preprocess_selector
+from .selectors import make_axis_selector
 
 
 def match_selector(elset, selector):
@@ -43,8 +43,8 @@ def regex_action_builder(identification, args):
 
 class SiblingSelector(object):
     def __init__(self, selector):
-        self._preceding_sel = XPath(generic_translator.css_to_xpath(preprocess_selector(selector), prefix="preceding-sibling::"))
-        self._following_sel = XPath(generic_translator.css_to_xpath(preprocess_selector(selector), prefix="following-sibling::"))
+        self._preceding_sel = make_axis_selector(preprocess_selector(selector), "preceding-sibling::")
+        self._following_sel = make_axis_selector(preprocess_selector(selector), "following-sibling::")
 
 
     def __call__(self, element):
@@ -53,17 +53,17 @@ class SiblingSelector(object):
 
 actions = [
         # accessors
-        (('first', 'f'),            make_generic_action(lambda s: s[0], 'element_set', 'element')),
-        (('last', 'l'),             make_generic_action(lambda s: s[-1], 'element_set', 'element')),
+        (('first', 'f'),            make_generic_action(itemgetter(0), 'element_set', 'element')),
+        (('last', 'l'),             make_generic_action(itemgetter(-1), 'element_set', 'element')),
         (('class',),                make_generic_action(lambda e: get_attr(e, 'class'), 'element', 'string')),
         (('id',),                   make_generic_action(lambda e: get_attr(e, 'id'), 'element', 'string')),
         (('parent', 'p'),           make_generic_action(lambda e: get_parent(e), 'element', 'element')),
-        (('text',),                 make_generic_action(lambda e: e.text, 'element', 'string')),
-        (('tag',),                  make_generic_action(lambda e: e.tag, 'element', 'string')),
+        (('text',),                 make_generic_action(attrgetter('text'), 'element', 'string')),
+        (('tag',),                  make_generic_action(attrgetter('tag'), 'element', 'string')),
         (('attr', 'a'),             make_generic_action(lambda e, a: get_attr(e, a), 'element', 'string')),
         (('nth', 'n'),              make_generic_action(lambda s, i: s[int(i)], 'element_set', 'element')),
         (('desc', 'd'),             make_selector_action(lambda e, sel: sel(e), 'element', 'element_set')),
-        (('fdesc', 'fd'),           make_selector_action(lambda e, sel: sel(e)[0], 'element', 'element')),
+        (('fdesc', 'fd'),           make_selector_action(lambda e, sel: sel.first(e), 'element', 'element')),
         (('ancestors', 'ancs'),     make_axis_selector_action(lambda e, sel: sel(e), 'ancestor::', 'element', 'element_set')),
         (('children', 'kids'),      make_axis_selector_action(lambda e, sel: sel(e), 'child::', 'element', 'element_set')),
         (('fsiblings', 'fsibs'),    make_axis_selector_action(lambda e, sel: sel(e), 'following-sibling::', 'element', 'element_set')),
@@ -74,9 +74,9 @@ actions = [
 
 
         # functions/filters
-        (('upper',),                make_generic_action(lambda s: s.upper(), 'string', 'string')),
-        (('lower',),                make_generic_action(lambda s: s.lower(), 'string', 'string')),
-        (('trim', 't'),             make_generic_action(lambda s: s.strip(), 'string', 'string')),
+        (('upper',),                make_generic_action(methodcaller('upper'), 'string', 'string')),
+        (('lower',),                make_generic_action(methodcaller('lower'), 'string', 'string')),
+        (('trim', 't'),             make_generic_action(methodcaller('strip'), 'string', 'string')),
         (('strip',),                make_generic_action(lambda s, chars: s.strip(chars), 'string', 'string')),
         (('replace',),              make_generic_action(lambda s, old, new: s.replace(old, new), 'string', 'string')),
         (('resub',),                regex_action_builder),
@@ -89,7 +89,21 @@ def multiply_keys(lst):
             yield (k, val)
 
 
-actions_dir = dict(multiply_keys(actions))
+def named_builder(name, builder):
+    """
+    Makes the actions built by 'builder' carry the action's (first) name and
+    a key identifying the action and its arguments.
+    """
+    def build(identification, args):
+        action = builder(identification, args)
+        action.name = name
+        action.key = (name,) + tuple(args)
+        return action
+
+    return build
+
+
+actions_dir = dict(multiply_keys((keys, named_builder(keys[0], builder)) for (keys, builder) in actions))
 
 
 def make_action(parsed_action):
@@ -0,0 +1,218 @@
+"""
+The library interface of screp: a selector, a format and anchors are compiled
+once into a Scraper, which computes the records of any number of documents,
+as tuples or dicts of strings.
+
+    scraper = screp.compile('tr.row', '$.fdesc("a").text, $.attr("id")')
+
+    for (name, id) in scraper.scrape(data):
+        ...
+"""
+import lxml.etree as etree
+
+from .parsed import build_anchors_factory
+from .term import make_term
+from .planner import make_plan
+from .source import (
+        FileDataSource,
+        URLDataSource,
+        is_url,
+        )
+from .utils import raise_again
+from .selectors import make_css_selector
+from .docindex import indexed_document
+
+
+class CompiledScraper(object):
+    """
+    What a thread scrapes with: the plan computing the terms, the selector
+    and a parser. None of them can be shared between threads.
+    """
+    def __init__(self, plan, selector, parser):
+        self.plan = plan
+        self.selector = selector
+        self.parser = parser
+
+
+class Scraper(object):
+    """
+    Computes the records of the elements matching a selector.
+
+    A Scraper can be used by several threads at once: each thread builds its
+    own plan from the parsed format, the first time it scrapes; the format is
+    never parsed again.
+    """
+    def __init__(self, selector, keys, pterms, parsed_anchors, null_value=None, stop_on_error=False):
+        import threading
+
+        self.selector = selector
+        # the names of the terms, or None if they have none
+        self.keys = keys
+        self.null_value = null_value
+        self.stop_on_error = stop_on_error
+
+        self._pterms = pterms
+        self._parsed_anchors = parsed_anchors
+        self._local = threading.local()
+
+        # errors in the format show up when compiling
+        self._get_compiled()
+
+
+    def _compile(self):
+        anchors_factory = build_anchors_factory(self._parsed_anchors)
+
+        try:
+            terms = [make_term(pterm, anchors_factory, required_out_type='string') for pterm in self._pterms]
+        except Exception as e:
+            raise_again('Parsing format specification: %s' % (e,))
+
+        anchors_factory.prune(terms)
+
+        try:
+            selector = make_css_selector(self.selector)
+        except Exception as e:
+            raise_again('Parsing selector: %s' % (e,))
+
+        return CompiledScraper(make_plan(terms, anchors_factory), selector, etree.HTMLParser(remove_blank_text=True))
+
+
+    def _get_compiled(self):
+        try:
+            return self._local.compiled
+        except AttributeError:
+            compiled = self._local.compiled = self._compile()
+            return compiled
+
+
+    def _compute_values(self, plan, primary_values):
+        # the values of the terms, null_value for those that failed
+        values = []
+
+        for t in plan.outputs:
+            try:
+                values.append(t.execute(primary_values))
+            except Exception:
+                if self.stop_on_error:
+                    raise
+
+                values.append(self.null_value)
+
+        return values
+
+
+    def _make_record(self, as_dict):
+        if not as_dict:
+            return tuple
+
+        if self.keys is None:
+            raise ValueError('The terms of the format have no names!')
+
+        keys = self.keys
+
+        return lambda values: dict(zip(keys, values))
+
+
+    def _scrape_root(self, compiled, root, make_record):
+        plan = compiled.plan
+
+        with indexed_document(root):
+            for e in compiled.selector(root):
+                yield make_record(self._compute_values(plan, plan.evaluate({'$': e, '@': root})))
+
+
+    def _parse(self, compiled, data):
+        try:
+            return etree.fromstring(data, compiled.parser)
+        except Exception as e:
+            raise_again('Parsing document: %s' % (e,))
+
+
+    def _parse_source(self, compiled, source):
+        if not source.streamable:
+            return self._parse(compiled, source.read_data())
+
+        stream = source.open_data()
+
+        try:
+            return etree.parse(stream, compiled.parser).getroot()
+        except Exception as e:
+            raise_again('Parsing document: %s' % (e,))
+        finally:
+            stream.close()
+
+
+    def scrape(self, data, as_dict=False):
+        """
+        Generates the records of a document, given as a string, as tuples,
+        or as dicts if as_dict.
+        """
+        make_record = self._make_record(as_dict)
+        compiled = self._get_compiled()
+
+        return self._scrape_root(compiled, self._parse(compiled, data), make_record)
+
+
+    def scrape_tree(self, root, as_dict=False):
+        """
+        Generates the records of a document already parsed by lxml: an
+        element, usually the root, or an element tree.
+        """
+        if isinstance(root, etree._ElementTree):
+            root = root.getroot()
+
+        return self._scrape_root(self._get_compiled(), root, self._make_record(as_dict))
+
+
+    def scrape_sources(self, sources, as_dict=False):
+        """
+        Generates the records of several documents: data sources (see
+        source.py), file names, archives (see archives.py) or URLs.
+        """
+        from .archives import iter_data_sources
+
+        make_record = self._make_record(as_dict)
+
+        for source in iter_data_sources(sources, make_data_source):
+            compiled = self._get_compiled()
+
+            for record in self._scrape_root(compiled, self._parse_source(compiled, source), make_record):
+                yield record
+
+
+def make_data_source(source):
+    if is_url(source):
+        return URLDataSource(source)
+    else:
+        return FileDataSource(source)
+
+
+def compile(selector, format, anchors=(), null_value=None, stop_on_error=False):
+    """
+    Compiles a selector and a format into a Scraper.
+
+    The format lists the terms of the records, like the CSV format
+    ('$.text, $.attr("href")'), or names them, like the JSON formats
+    ('text=$.text, href=$.attr("href")'); records can then be dicts too.
+    The anchors are definitions like those of -a ('name=term'). The terms
+    that cannot be computed are null_value, unless stop_on_error.
+    """
+    from .format_parsers import (
+            read_record_format,
+            read_anchor,
+            )
+
+    try:
+        (keys, pterms) = read_record_format(format)
+    except Exception as e:
+        raise_again('Parsing format specification: %s' % (e,))
+
+    parsed_anchors = []
+
+    for string in anchors:
+        try:
+            parsed_anchors.append(read_anchor(string))
+        except Exception as e:
+            raise_again('Parsing anchor: %s' % (e,))
+
+    return Scraper(selector, keys, pterms, parsed_anchors, null_value=null_value, stop_on_error=stop_on_error)
@@ -0,0 +1,317 @@
+"""
+Archives of documents: tar files (compressed or not), zip files and WARC files
+(web archives, compressed or not). Each document of an archive is a data
+source, named after the archive and the document ('pages.tar!a/b.html'), read
+in turn without extracting the archive.
+
+Archives are recognized by their names; see archive_kind.
+"""
+from .source import (
+        BaseDataSource,
+        DataSource,
+        is_url,
+        )
+from .compression import (
+        open_decompressed,
+        detect_compression,
+        decompress,
+        decode_content,
+        )
+
+
+# file name ending -> kind of archive
+archive_suffixes = [
+        ('.tar', 'tar'),
+        ('.tar.gz', 'tar'),
+        ('.tgz', 'tar'),
+        ('.tar.bz2', 'tar'),
+        ('.tbz2', 'tar'),
+        ('.tar.xz', 'tar'),
+        ('.txz', 'tar'),
+        ('.zip', 'zip'),
+        ('.warc', 'warc'),
+        ('.warc.gz', 'warc'),
+        ]
+
+
+def archive_kind(path):
+    """
+    Returns the kind of archive ('tar', 'zip' or 'warc') the file 'path' is,
+    according to its name, or None if it is not an archive.
+    """
+    lower = path.lower()
+
+    for (suffix, kind) in archive_suffixes:
+        if lower.endswith(suffix):
+            return kind
+
+    return None
+
+
+def member_name(path, name):
+    return '%s!%s' % (path, name)
+
+
+def decompress_member(data):
+    # compressed documents in archives are decompressed, like compressed files
+    compression = detect_compression(data)
+
+    if compression is None:
+        return data
+    else:
+        return decompress(compression, data)
+
+
+def iter_tar_members(path):
+    """
+    Generates (name, data) for the regular files of a tar file, reading it
+    sequentially.
+    """
+    import tarfile
+
+    f = open_decompressed(open(path, 'rb'))
+
+    try:
+        archive = tarfile.open(fileobj=f, mode='r|')
+
+        for member in archive:
+            if member.isfile():
+                yield (member.name, archive.extractfile(member).read())
+    finally:
+        f.close()
+
+
+def iter_zip_members(path):
+    """
+    Generates (name, data) for the files of a zip file, in the order they are
+    stored.
+    """
+    import zipfile
+
+    with open(path, 'rb') as f:
+        archive = zipfile.ZipFile(f)
+
+        for info in archive.infolist():
+            if not info.filename.endswith('/'):
+                yield (info.filename, archive.read(info))
+
+
+class RecordReader(object):
+    """
+    Reads lines and blocks from a file-like object which only has read.
+    """
+    def __init__(self, f, chunk_size=64 * 1024):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        # where the data not read yet starts in the buffer
+        self._pos = 0
+
+
+    def _fill(self):
+        # returns whether there was more data
+        data = self._file.read(self._chunk_size)
+
+        if data:
+            self._buffer = self._buffer[self._pos:] + data
+            self._pos = 0
+
+        return data != ''
+
+
+    def _take(self, end):
+        data = self._buffer[self._pos:end]
+        self._pos = end
+
+        return data
+
+
+    def readline(self):
+        """
+        Returns the next line, with its end of line, or '' at the end.
+        """
+        while True:
+            end = self._buffer.find('\n', self._pos) + 1
+
+            if end > 0:
+                return self._take(end)
+
+            if not self._fill():
+                return self._take(len(self._buffer))
+
+
+    def read(self, size):
+        """
+        Returns the next size bytes; raises ValueError if there are fewer.
+        """
+        while len(self._buffer) - self._pos < size:
+            if not self._fill():
+                raise ValueError('Truncated WARC record!')
+
+        return self._take(self._pos + size)
+
+
+def read_headers(lines):
+    """
+    Reads header lines ('Name: value') up to an empty line, and returns them
+    as a dict with lowercase names.
+    """
+    headers = {}
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        if line == '':
+            break
+
+        (name, _, value) = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    return headers
+
+
+def decode_chunked(data):
+    """
+    Returns a body sent with 'Transfer-Encoding: chunked' without the chunks'
+    framing.
+    """
+    chunks = []
+    pos = 0
+
+    while True:
+        end = data.find('\n', pos)
+
+        if end < 0:
+            raise ValueError('Truncated chunked body!')
+
+        size = int(data[pos:end].split(';')[0].strip(), 16)
+
+        if size == 0:
+            return ''.join(chunks)
+
+        chunks.append(data[end + 1:end + 1 + size])
+        # the chunk is followed by CRLF
+        pos = data.find('\n', end + 1 + size) + 1
+
+        if pos == 0:
+            raise ValueError('Truncated chunked body!')
+
+
+def is_document(content_type):
+    # records without a type are taken as documents
+    return content_type is None or 'html' in content_type or 'xml' in content_type
+
+
+def read_http_response(block):
+    """
+    Returns the body of an HTTP response, as recorded in a WARC response
+    record, or None if it is not a document or not a success.
+    """
+    (head, sep, body) = block.partition('\r\n\r\n')
+
+    if not sep:
+        (head, sep, body) = block.partition('\n\n')
+
+    lines = head.split('\n')
+
+    # error pages and redirections are not documents
+    status = lines[0].split(None, 2)[1:2]
+
+    if status == [] or not (status[0].isdigit() and 200 <= int(status[0]) < 300):
+        return None
+
+    headers = read_headers(lines[1:])
+
+    if not is_document(headers.get('content-type')):
+        return None
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = decode_chunked(body)
+
+    return decode_content(headers.get('content-encoding', ''), body)
+
+
+def iter_warc_members(path):
+    """
+    Generates (target URI, document) for the response and resource records
+    of a WARC file holding documents (HTML or XML), reading it sequentially.
+    """
+    f = open_decompressed(open(path, 'rb'))
+
+    try:
+        reader = RecordReader(f)
+
+        while True:
+            line = reader.readline()
+
+            if line == '':
+                return
+
+            # records are separated by empty lines
+            if line.strip() == '':
+                continue
+
+            if not line.startswith('WARC/'):
+                raise ValueError('Not a WARC record: %r!' % (line[:50],))
+
+            headers = read_headers(iter(reader.readline, ''))
+            block = reader.read(int(headers.get('content-length', '0')))
+            name = headers.get('warc-target-uri') or headers.get('warc-record-id', '')
+            record_type = headers.get('warc-type')
+
+            if record_type == 'response':
+                document = read_http_response(block)
+            elif record_type == 'resource' and is_document(headers.get('content-type')):
+                document = block
+            else:
+                document = None
+
+            if document is not None:
+                yield (name, document)
+    finally:
+        f.close()
+
+
+member_readers = {
+        'tar': iter_tar_members,
+        'zip': iter_zip_members,
+        'warc': iter_warc_members,
+        }
+
+
+def iter_archive_sources(path, kind=None):
+    """
+    Generates a data source for each document of the archive 'path', of the
+    given kind, or of the kind its name shows.
+    """
+    if kind is None:
+        kind = archive_kind(path)
+
+    for (name, data) in member_readers[kind](path):
+        yield DataSource(member_name(path, name), decompress_member(data))
+
+
+def iter_data_sources(sources, make_source, onerror=None):
+    """
+    Generates the data sources of 'sources', which are data sources, names of
+    archives, replaced by the sources of their documents, or other names
+    (files or URLs), made into sources by make_source.
+
+    onerror is called with the name of an archive that cannot be read and the
+    exception, while it is handled; the rest of the archive is then skipped,
+    unless onerror raises. Without onerror, the exception is raised again.
+    """
+    for source in sources:
+        if isinstance(source, BaseDataSource):
+            yield source
+        elif not is_url(source) and archive_kind(source) is not None:
+            try:
+                for s in iter_archive_sources(source):
+                    yield s
+            except Exception as e:
+                if onerror is None:
+                    raise
+
+                onerror(source, e)
+        else:
+            yield make_source(source)
@@ -0,0 +1,314 @@
+"""
+Reading compressed documents: gzip, bzip2 and xz files are recognized by their
+first bytes, whatever their names, and decompressed while they are read.
+
+xz needs the lzma module (Python 3, or backports.lzma); without it, the xz
+command decompresses the files that can be given to it.
+"""
+import zlib
+import bz2
+
+
+# how much compressed data is read at a time
+CHUNK_SIZE = 64 * 1024
+
+# compression -> first bytes of the compressed data
+magic_numbers = {
+        'gzip': '\x1f\x8b',
+        'bzip2': 'BZh',
+        'xz': '\xfd7zXZ\x00',
+        }
+
+MAGIC_SIZE = max(len(m) for m in magic_numbers.values())
+
+
+def detect_compression(head):
+    """
+    Returns the compression of the data starting with 'head' (at least
+    MAGIC_SIZE bytes of it, unless it is shorter), or None if it looks
+    uncompressed.
+    """
+    for (name, magic) in magic_numbers.items():
+        if head.startswith(magic):
+            return name
+
+    return None
+
+
+def import_lzma():
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            return None
+
+    return lzma
+
+
+def make_decompressor(compression):
+    """
+    Returns an object decompressing one stream ('member') of the compression
+    incrementally, like zlib's decompression objects.
+    """
+    if compression == 'gzip':
+        # with the gzip header and trailer
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == 'bzip2':
+        return bz2.BZ2Decompressor()
+    elif compression == 'xz':
+        lzma = import_lzma()
+
+        if lzma is None:
+            raise ValueError('Decompressing xz data needs the lzma module!')
+
+        return lzma.LZMADecompressor()
+    else:
+        raise ValueError('Unknown compression: %s!' % (compression,))
+
+
+def stream_ended(compression, decompressor):
+    """
+    Returns whether a decompressor (from make_decompressor) reached the end of
+    its stream.
+    """
+    if compression == 'gzip':
+        if decompressor.unused_data:
+            return True
+
+        # Python 2's zlib tells nothing more: data given after the end of the
+        # stream is left unused
+        probe = decompressor.copy()
+
+        try:
+            probe.decompress('\0')
+        except zlib.error:
+            return False
+
+        return probe.unused_data == '\0'
+    elif compression == 'bzip2':
+        try:
+            decompressor.decompress('')
+        except EOFError:
+            return True
+
+        return False
+    else:
+        return decompressor.eof
+
+
+class DecompressingFile(object):
+    """
+    A file-like object reading the decompressed data of a file, of one or
+    more streams (like concatenated gzip files). A file ending within a
+    stream raises an IOError, like gzip's "unexpected end of file".
+    """
+    def __init__(self, f, compression, head=''):
+        self._file = f
+        self._compression = compression
+        self._magic = magic_numbers[compression]
+        self._decompressor = make_decompressor(compression)
+
+        # compressed data read from the file but not decompressed yet
+        self._pending = head
+        # decompressed data not read yet
+        self._buffer = ''
+        self._eof = False
+
+
+    def _decompress(self, data):
+        out = []
+
+        while data:
+            try:
+                out.append(self._decompressor.decompress(data))
+            except EOFError:
+                # bz2 decompressors raise it when given data after the end of
+                # their stream
+                unused = data
+            else:
+                unused = self._decompressor.unused_data
+
+            if not unused:
+                break
+
+            if len(unused) < len(self._magic) and self._magic.startswith(unused):
+                # maybe the start of the next stream, decompressed with the
+                # next data
+                self._pending = unused
+                self._decompressor = make_decompressor(self._compression)
+                break
+
+            if not unused.startswith(self._magic):
+                # trailing garbage, ignored like gzip does
+                self._eof = True
+                break
+
+            self._decompressor = make_decompressor(self._compression)
+            data = unused
+
+        return ''.join(out)
+
+
+    def _fill(self, size):
+        # decompresses until the buffer holds size bytes, or all the data if
+        # size is negative
+        chunks = [self._buffer]
+        available = len(self._buffer)
+
+        while not self._eof and (size < 0 or available < size):
+            data = self._file.read(CHUNK_SIZE)
+
+            if not data:
+                self._eof = True
+
+                if self._pending:
+                    chunks.append(self._decompress(self._pending))
+
+                if not stream_ended(self._compression, self._decompressor):
+                    raise IOError('Unexpected end of %s data!' % (self._compression,))
+
+                break
+
+            (data, self._pending) = (self._pending + data, '')
+            chunk = self._decompress(data)
+
+            chunks.append(chunk)
+            available += len(chunk)
+
+        self._buffer = ''.join(chunks)
+
+
+    def read(self, size=-1):
+        self._fill(size)
+
+        if size < 0:
+            (data, self._buffer) = (self._buffer, '')
+        else:
+            (data, self._buffer) = (self._buffer[:size], self._buffer[size:])
+
+        return data
+
+
+    def close(self):
+        self._file.close()
+
+
+class CommandFile(object):
+    """
+    A file-like object reading the output of a command given a file as its
+    standard input, like 'xz -dc'.
+    """
+    def __init__(self, args, f):
+        import subprocess
+
+        self._args = args
+        self._file = f
+
+        try:
+            self._process = subprocess.Popen(args, stdin=f, stdout=subprocess.PIPE, close_fds=True)
+        except OSError as e:
+            raise ValueError('Running %s: %s!' % (args[0], e.strerror))
+
+
+    def read(self, size=-1):
+        data = self._process.stdout.read(size)
+
+        if not data and (size != 0) and self._process.wait() != 0:
+            raise ValueError('%s failed with status %s!' % (self._args[0], self._process.returncode))
+
+        return data
+
+
+    def close(self):
+        self._process.stdout.close()
+
+        if self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+
+        self._file.close()
+
+
+class PrefixedFile(object):
+    """
+    A file-like object reading some data, then the rest of a file.
+    """
+    def __init__(self, head, f):
+        self._head = head
+        self._file = f
+
+
+    def read(self, size=-1):
+        if not self._head:
+            return self._file.read(size)
+
+        if size < 0:
+            data = self._head + self._file.read()
+            self._head = ''
+        else:
+            (data, self._head) = (self._head[:size], self._head[size:])
+
+        return data
+
+
+    def close(self):
+        self._file.close()
+
+
+def open_decompressed(f):
+    """
+    Returns a file-like object reading the data of the file f, decompressed
+    if it is compressed.
+    """
+    head = f.read(MAGIC_SIZE)
+    compression = detect_compression(head)
+
+    try:
+        # back to the start, for uncompressed files to be read directly
+        f.seek(-len(head), 1)
+    except (IOError, AttributeError):
+        seekable = False
+    else:
+        seekable = True
+        head = ''
+
+    if compression is None:
+        if seekable:
+            return f
+        else:
+            return PrefixedFile(head, f)
+
+    if compression == 'xz' and import_lzma() is None and seekable and hasattr(f, 'fileno'):
+        return CommandFile(['xz', '--decompress', '--stdout'], f)
+
+    return DecompressingFile(f, compression, head=head)
+
+
+def decompress(compression, data):
+    """
+    Returns the decompressed data of a string.
+    """
+    import StringIO
+
+    return DecompressingFile(StringIO.StringIO(data), compression).read()
+
+
+def decode_content(encoding, body):
+    """
+    Returns a body decoded according to an HTTP content coding.
+    """
+    encoding = encoding.strip().lower()
+
+    if encoding in ('', 'identity'):
+        return body
+
+    if encoding not in ('gzip', 'x-gzip'):
+        raise ValueError('Unsupported content encoding: %s!' % (encoding,))
+
+    # empty bodies, like those of redirects and 304 responses, are not encoded
+    if body:
+        return decompress('gzip', body)
+    else:
+        return body
@@ -7,6 +7,13 @@ def make_id_anchor(name, out_type):
     return Anchor(name, Term([AnchorTermAction(name, out_type)]))
 
 
+def referenced_anchors(term):
+    """
+    Returns the names of the anchors a term refers to.
+    """
+    return set(a.anchor for a in term.actions if isinstance(a, AnchorTermAction))
+
+
 class AnchorContext(object):
     def __init__(self, anchors):
         self._anchors = dict(anchors)
@@ -22,18 +29,77 @@ class AnchorContext(object):
 
 class AnchorContextFactory(object):
     def __init__(self, primary_anchors):
-        self._anchors = map(lambda x: make_id_anchor(*x), primary_anchors)
+        self._anchors = []
+        # name -> index of its latest definition
+        self._latest = {}
+        # the value of self._latest when each definition was added
+        self._bindings = []
+
+        for x in primary_anchors:
+            self.add_anchor(make_id_anchor(*x))
 
 
     def get_anchor(self, name):
         # return the last definition of that anchor
-        return [x for x in self._anchors if x.name == name][-1]
+        return self._anchors[self._latest[name]]
 
 
     def add_anchor(self, anchor):
+        # the names each definition sees are kept, so the dict is not changed
+        self._bindings.append(self._latest)
+        self._latest = dict(self._latest)
+        self._latest[anchor.name] = len(self._anchors)
         self._anchors.append(anchor)
 
 
+    @property
+    def anchors(self):
+        """
+        The anchors definitions, in the order they are defined.
+        """
+        return list(self._anchors)
+
+
+    def binding(self, name, index=None):
+        """
+        Returns the index of the definition of 'name' seen by definition
+        'index' or, if None, by the terms; None if there is no such definition.
+        """
+        if index is None:
+            return self._latest.get(name)
+        else:
+            return self._bindings[index].get(name)
+
+
+    def prune(self, terms):
+        """
+        Drops the definitions that the terms don't depend on: unused anchors
+        and definitions shadowed by later ones before being used.
+        """
+        used = set()
+        pending = [self.binding(name) for t in terms for name in referenced_anchors(t)]
+
+        while len(pending) > 0:
+            index = pending.pop()
+
+            if index is None or index in used:
+                continue
+
+            used.add(index)
+
+            pending.extend(self.binding(name, index) for name in referenced_anchors(self._anchors[index].term))
+
+        anchors = [a for (i, a) in enumerate(self._anchors) if i in used]
+
+        # the definitions kept see the same definitions as before
+        self._anchors = []
+        self._latest = {}
+        self._bindings = []
+
+        for a in anchors:
+            self.add_anchor(a)
+
+
     def make_context(self, primary_anchors_values):
         context = AnchorContext(primary_anchors_values)
 
@@ -0,0 +1,147 @@
+"""
+The index of the document being scraped: the last results of the selectors,
+and the elements having a tag, a class or an id, in document order.
+
+Many records share the elements some terms start from (the root for
+'@.fdesc("h1")', the same parent for '$.parent.fdesc(".price")'), and their
+selectors are then evaluated once. Since the primary elements are in document
+order, so are the elements above them, and each selector gets the elements
+the records share one after the other: remembering the last element and
+result of each selector is enough, and keeps the index small.
+
+Everything is computed on first use; the index lives while the document is
+being scraped (see indexed_document) and is dropped with it.
+"""
+import threading
+from contextlib import contextmanager
+
+from lxml.etree import (
+        XPath,
+        Element,
+        )
+
+
+class IndexStack(threading.local):
+    # the indexes of the documents being scraped in the thread, the last
+    # one being current
+    indexes = ()
+
+
+_stack = IndexStack()
+
+# elements having an id, in document order
+find_ids = XPath('//*[@id]')
+
+
+class DocumentIndex(object):
+    def __init__(self, root):
+        self.root = root
+        # selector -> (element, result), the last one computed
+        self.results = {}
+
+        # (kind, name) -> list of elements, kind being 'tag', 'class' or 'id'
+        self._elements = {}
+        self._ids_built = False
+
+
+    def contains(self, element):
+        return element.getroottree().getroot() is self.root
+
+
+    def memoize(self, selector, element, select):
+        """
+        Returns select(element), the result of selector on element, unless it
+        is the last one computed.
+        """
+        last = self.results.get(selector)
+
+        if last is not None and last[0] is element:
+            return last[1]
+
+        result = select(element)
+        self.results[selector] = (element, result)
+
+        return result
+
+
+    def _build_ids(self):
+        for e in find_ids(self.root):
+            self._elements.setdefault(('id', e.get('id')), []).append(e)
+
+        self._ids_built = True
+
+
+    def elements(self, kind, name):
+        """
+        Returns the elements of the document with the tag, having the class,
+        or having the id 'name', in document order.
+        """
+        key = (kind, name)
+        elements = self._elements.get(key)
+
+        if elements is not None:
+            return elements
+
+        if kind == 'id':
+            if not self._ids_built:
+                self._build_ids()
+
+            return self._elements.get(key, [])
+
+        if kind == 'tag':
+            elements = list(self.root.iter(name))
+        elif kind == 'class':
+            from .selectors import make_class_test
+
+            elements = filter(make_class_test((name,)), self.root.iter(Element))
+        else:
+            raise ValueError('Unknown kind of index: %s!' % (kind,))
+
+        self._elements[key] = elements
+
+        return elements
+
+
+def current_index():
+    """
+    Returns the index of the document being scraped in this thread, or None.
+
+    The results of selectors on the elements of other documents are correct
+    in any index, so the elements are not checked to be in its document,
+    which would cost more than most selectors.
+    """
+    indexes = _stack.indexes
+
+    if indexes:
+        return indexes[-1]
+    else:
+        return None
+
+
+@contextmanager
+def indexed_document(root):
+    """
+    Indexes the document of root, in this thread, within the block.
+    """
+    index = DocumentIndex(root.getroottree().getroot())
+
+    _stack.indexes = _stack.indexes + (index,)
+
+    try:
+        yield index
+    finally:
+        # the blocks of generators do not always end in reverse order
+        _stack.indexes = tuple(i for i in _stack.indexes if i is not index)
+
+
+def memoized(selector, element, select):
+    """
+    Returns select(element), the result of selector on element, unless it is
+    the last one computed in the document being indexed.
+    """
+    index = current_index()
+
+    if index is None:
+        return select(element)
+    else:
+        return index.memoize(selector, element, select)
@@ -0,0 +1,143 @@
+import sys
+import threading
+import Queue
+from collections import deque
+
+from .source import BaseDataSource
+
+
+# how many sources, per job, may be fetched ahead of the one being consumed
+DEFAULT_WINDOW_FACTOR = 2
+
+
+class PrefetchedDataSource(BaseDataSource):
+    """
+    Wraps a data source whose data was already read by a fetcher thread.
+
+    Reading it returns that data or raises again the error encountered while
+    fetching it.
+    """
+    def __init__(self, source, data=None, exc_info=None):
+        self.name = source.name
+        self._data = data
+        self._exc_info = exc_info
+
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+
+        # tracebacks cannot be pickled, to be sent to a worker process
+        if self._exc_info is not None:
+            from .workers import portable_exception
+
+            e = portable_exception(self._exc_info[1])
+            state['_exc_info'] = (type(e), e, None)
+
+        return state
+
+
+    def read_data(self):
+        if self._exc_info is not None:
+            (t, v, tb) = self._exc_info
+            self._exc_info = None
+            raise t, v, tb
+
+        (data, self._data) = (self._data, None)
+
+        return data
+
+
+class FetchSlot(object):
+    def __init__(self, source):
+        self._source = source
+        self._done = threading.Event()
+        self._result = None
+
+
+    def fetch(self):
+        try:
+            self._result = PrefetchedDataSource(self._source, data=self._source.read_data())
+        except Exception:
+            self._result = PrefetchedDataSource(self._source, exc_info=sys.exc_info())
+        finally:
+            self._done.set()
+
+
+    def wait(self):
+        # waiting with a timeout keeps the main thread responsive to signals
+        while not self._done.wait(1.0):
+            pass
+
+        return self._result
+
+
+def fetch_worker(tasks):
+    while True:
+        slot = tasks.get()
+
+        if slot is None:
+            return
+
+        slot.fetch()
+
+
+def resolve(item):
+    if isinstance(item, FetchSlot):
+        return item.wait()
+    else:
+        return item
+
+
+def prefetch_sources(sources, jobs, window=None):
+    """
+    Generates the sources in their input order, while reading the prefetchable
+    ones (URLs) concurrently, using a pool of 'jobs' threads.
+
+    At most 'window' sources are fetched ahead of the one being consumed, so
+    parsing the current document overlaps with downloading the next ones.
+    """
+    if jobs < 1:
+        raise ValueError("The number of jobs must be at least 1!")
+
+    if window is None:
+        window = jobs * DEFAULT_WINDOW_FACTOR
+
+    tasks = Queue.Queue()
+
+    workers = []
+
+    for _ in xrange(jobs):
+        w = threading.Thread(target=fetch_worker, args=(tasks,))
+        w.daemon = True
+        w.start()
+        workers.append(w)
+
+    pending = deque()
+
+    try:
+        for source in sources:
+            if getattr(source, 'prefetchable', False):
+                slot = FetchSlot(source)
+                tasks.put(slot)
+                pending.append(slot)
+            else:
+                pending.append(source)
+
+            while len(pending) > window:
+                yield resolve(pending.popleft())
+
+        while len(pending) > 0:
+            yield resolve(pending.popleft())
+    finally:
+        # drop the fetches that did not start yet, if we were interrupted
+        try:
+            while True:
+                tasks.get_nowait()
+        except Queue.Empty:
+            pass
+
+        for _ in workers:
+            tasks.put(None)
+
+        for w in workers:
+            w.join()
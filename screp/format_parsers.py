@@ -6,6 +6,7 @@ from pyparsing import (
         SkipTo,
         )
 import re
+from functools import partial
 
 from .term_parser import (
         term_parser,
@@ -14,14 +15,15 @@ from .term_parser import (
         location_factory_context,
         identifier_parser,
         )
-from .term import make_term
 from .anchor import make_anchor
+from .parsed import ParsedFormat
 from .idloc import (
         LocationFactory,
         )
 from .formatter import (
         CSVFormatter,
         JSONFormatter,
+        JSONLinesFormatter,
         GeneralFormatter,
         )
 from .utils import raise_again
@@ -39,44 +41,80 @@ json_format_parser = json_assignement_parser + ZeroOrMore(comma + json_assigneme
 general_format_parser = ZeroOrMore(SkipTo(curly_term_parser).leaveWhitespace() + curly_term_parser) + SkipTo(StringEnd()).leaveWhitespace() + StringEnd()
 
 
-def parse_csv_formatter(value, anchors_factory, header=None):
+def read_csv_format(value, header=None):
     with location_factory_context(LocationFactory('csv_format')):
-        result = csv_format_parser.parseString(value)
-
-        terms = map(lambda pterm: make_term(pterm, anchors_factory, required_out_type='string'), result)
+        pterms = list(csv_format_parser.parseString(value))
 
-        return (CSVFormatter(len(terms), header=header), terms)
+        return ParsedFormat(partial(CSVFormatter, len(pterms), header=header), pterms)
 
 
-def parse_json_formatter(value, anchors_factory, **kwoptions):
-    with location_factory_context(LocationFactory('json_format')):
+def read_json_format(value, formatter_class=JSONFormatter, location='json_format', **kwoptions):
+    with location_factory_context(LocationFactory(location)):
         result = json_format_parser.parseString(value)
 
         keys = [x[0] for x in result]
 
-        terms = map(lambda pterm: make_term(pterm, anchors_factory, required_out_type='string'), [x[1] for x in result])
+        return ParsedFormat(partial(formatter_class, keys, **kwoptions), [x[1] for x in result])
 
-        return (JSONFormatter(keys, **kwoptions), terms)
 
+def read_json_lines_format(value):
+    return read_json_format(value, JSONLinesFormatter, location='json_lines_format')
 
-def parse_general_formatter(value, anchors_factory, escaped):
+
+def read_general_format(value, escaped):
     with location_factory_context(LocationFactory('general_format')):
         result = list(general_format_parser.parseString(value))
 
-        terms = map(lambda pterm: make_term(pterm, anchors_factory, required_out_type='string'), result[1::2])
-
         if escaped:
             inter_strings = map(lambda x: x.decode('string_escape'), result[0::2])
         else:
             inter_strings = result[0::2]
 
-        return (GeneralFormatter(inter_strings), terms)
+        return ParsedFormat(partial(GeneralFormatter, inter_strings), result[1::2])
+
+
+# the start of a named term, as in the JSON formats
+named_term_re = re.compile(r'^\s*[_A-Za-z][_A-Za-z0-9]*\s*=')
+
+
+def read_record_format(value):
+    """
+    Parses the terms of the records of a Scraper (see api.py): named, as in
+    the JSON formats, or not, as in the CSV format. Returns (keys, parsed
+    terms), keys being None for terms without names.
+    """
+    with location_factory_context(LocationFactory('record_format')):
+        if named_term_re.match(value):
+            result = json_format_parser.parseString(value)
+
+            return ([x[0] for x in result], [x[1] for x in result])
+        else:
+            return (None, list(csv_format_parser.parseString(value)))
+
+
+def parse_csv_formatter(value, anchors_factory, header=None):
+    return read_csv_format(value, header=header).build(anchors_factory)
+
+
+def parse_json_formatter(value, anchors_factory, **kwoptions):
+    return read_json_format(value, **kwoptions).build(anchors_factory)
+
+
+def parse_json_lines_formatter(value, anchors_factory):
+    return read_json_lines_format(value).build(anchors_factory)
+
+
+def parse_general_formatter(value, anchors_factory, escaped):
+    return read_general_format(value, escaped).build(anchors_factory)
 
 
 anchor_re = re.compile('^(?P<name>[_A-Za-z][_A-Za-z0-9]*)\s*=(?P<term_spec>.*)$')
 
 
-def parse_anchor(string, anchors_factory):
+def read_anchor(string):
+    """
+    Parses an anchor definition; returns (name, parsed term).
+    """
     m = anchor_re.match(string)
     if m is None:
         raise ValueError('Invalid anchor format')
@@ -89,6 +127,12 @@ def parse_anchor(string, anchors_factory):
     except Exception as e:
         raise_again("Anchor '%s': %s" % (name, e))
 
+    return (name, pterm)
+
+
+def parse_anchor(string, anchors_factory):
+    (name, pterm) = read_anchor(string)
+
     return make_anchor(name, pterm, anchors_factory)
 
 
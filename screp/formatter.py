@@ -1,9 +1,31 @@
-import csv
-import json
-import StringIO
+from operator import methodcaller
+
+from .output import LineBuffer
+
+# csv and json are imported by the formatters using them, so that a run only
+# imports the one it needs
 
 DEFAULT_JSON_INDENT_LEVEL = 4
 
+encode_utf8 = methodcaller('encode', 'utf-8')
+
+
+def make_json_value_encoder():
+    """
+    Returns a function returning what json.dumps outputs for a value.
+    """
+    import json
+    from json.encoder import encode_basestring_ascii
+
+    def encode_json_value(value):
+        # values are nearly always strings
+        try:
+            return encode_basestring_ascii(value)
+        except TypeError:
+            return json.dumps(value)
+
+    return encode_json_value
+
 
 class BaseFormatter(object):
     def start_format(self):
@@ -11,15 +33,41 @@ class BaseFormatter(object):
 
 
     def format_record(self, record):
+        return self.frame_record(self.render_record(record))
+
+
+    def write_record(self, record, out):
+        """
+        Formats a record and writes it to the file-like 'out'.
+        """
+        out.write(self.format_record(record))
+
+
+    def render_record(self, record):
+        """
+        Formats a record on its own; doesn't depend on the formatter state, so
+        records can be rendered in any order, or by other processes.
+        """
         pass
 
 
+    def frame_record(self, rendered):
+        """
+        Places a rendered record in the output, adding any separator needed
+        between records.
+        """
+        return rendered
+
+
     def end_format(self):
         return ''
 
 
 class CSVFormatter(BaseFormatter):
     def __init__(self, nvalues, header=None):
+        import csv
+
+        self._csv_writer = csv.writer
         self._nvalues = nvalues
 
         if header is not None:
@@ -30,6 +78,14 @@ class CSVFormatter(BaseFormatter):
         else:
             self._hvalues = None
 
+        # rendered rows are written here, then taken back
+        self._line = LineBuffer()
+        self._line_writer = self._csv_writer(self._line)
+
+        # the writer of the last output written to
+        self._out = None
+        self._out_writer = None
+
 
     def start_format(self):
         if self._hvalues is not None:
@@ -38,28 +94,37 @@ class CSVFormatter(BaseFormatter):
             return ''
 
 
-    def format_record(self, strings):
+    def _check_values(self, strings):
         if len(strings) != self._nvalues:
             raise ValueError("The number of values to be formatted doesn't match the number of parsed values")
 
+
+    def render_record(self, strings):
+        self._check_values(strings)
+
         return self._format_line(strings)
 
 
-    def _format_line(self, values):
-        out = StringIO.StringIO()
+    def write_record(self, strings, out):
+        self._check_values(strings)
 
-        writer = csv.writer(out)
+        if out is not self._out:
+            self._out = out
+            self._out_writer = self._csv_writer(out)
 
-        writer.writerow(map(lambda v: v.encode('utf-8'), values))
+        self._out_writer.writerow(map(encode_utf8, strings))
 
-        line = out.getvalue()
 
-        out.close()
+    def _format_line(self, values):
+        self._line_writer.writerow(map(encode_utf8, values))
 
-        return line
+        return self._line.pop()
 
 
     def _read_line(self, line):
+        import csv
+        import StringIO
+
         io = StringIO.StringIO(line)
 
         return csv.reader(io).next()
@@ -74,6 +139,9 @@ class CSVFormatter(BaseFormatter):
 
 class JSONFormatter(BaseFormatter):
     def __init__(self, keys, indent=False):
+        import json
+
+        self._dumps = json.dumps
         self._keys = keys
         self._at_first = True
         if indent:
@@ -82,23 +150,21 @@ class JSONFormatter(BaseFormatter):
             self._indent = None
 
 
-    def format_record(self, strings):
+    def render_record(self, strings):
         if len(strings) != len(self._keys):
             raise ValueError("The number of values to be formatted doesn't match the number of parsed values")
 
-        string = ''
+        d = dict(zip(self._keys, strings))
+
+        return self._dumps(d, indent=self._indent)
 
+
+    def frame_record(self, rendered):
         if self._at_first:
             self._at_first = False
-            string += '\n'
+            return '\n' + rendered
         else:
-            string += ',\n'
-
-        d = dict(zip(self._keys, strings))
-
-        string += json.dumps(d, indent=self._indent)
-
-        return string
+            return ',\n' + rendered
 
 
     def start_format(self):
@@ -118,6 +184,32 @@ class JSONFormatter(BaseFormatter):
         return 'JSONFormatter(%s)' % (', '.join(self._keys),)
 
 
+class JSONLinesFormatter(BaseFormatter):
+    """
+    Formats each record as a JSON object on its own line (NDJSON), so that
+    the output can be read record by record, as it is written.
+    """
+    def __init__(self, keys):
+        self._keys = keys
+        self._encode_value = make_json_value_encoder()
+
+        # the keys are encoded once: '{"key1": %s, "key2": %s}\n'
+        encoded_keys = [self._encode_value(k).replace('%', '%%') for k in keys]
+
+        self._format = '{%s}\n' % (', '.join('%s: %%s' % (k,) for k in encoded_keys),)
+
+
+    def render_record(self, strings):
+        if len(strings) != len(self._keys):
+            raise ValueError("The number of values to be formatted doesn't match the number of parsed values")
+
+        return self._format % tuple(map(self._encode_value, strings))
+
+
+    def __str__(self):
+        return 'JSONLinesFormatter(%s)' % (', '.join(self._keys),)
+
+
 class GeneralFormatter(BaseFormatter):
     def __init__(self, inter_strings):
         self._nformats = len(inter_strings) - 1
@@ -125,7 +217,7 @@ class GeneralFormatter(BaseFormatter):
         self._format = ''.join([x for pair in zip(inter_strings, ['%s'] * self._nformats + ['']) for x in pair])
 
 
-    def format_record(self, values):
+    def render_record(self, values):
         if len(values) != self._nformats:
             raise ValueError("Invalid number of values. Expected %s, got %s" % (self._nformats, len(values)))
 
@@ -0,0 +1,243 @@
+import re
+
+from lxml.etree import XPath
+
+from .utils import (
+        translate_css,
+        cached_translation,
+        preprocess_selector,
+        register_functions,
+        )
+
+
+# Chains of accessors expressible in XPath are evaluated as a single XPath
+# expression, built step by step from the context element. An expression
+# either selects at most one element ('element') or a node-set ('set').
+
+# selector actions -> axis prefix used to translate their selector
+selector_axes = {
+        'desc': 'descendant-or-self::',
+        'fdesc': 'descendant-or-self::',
+        'children': 'child::',
+        'ancestors': 'ancestor::',
+        'fsiblings': 'following-sibling::',
+        'psiblings': 'preceding-sibling::',
+        }
+
+# selector actions -> translator of their selector, the one their unfused
+# selectors use (see make_css_selector and make_axis_selector), since
+# translators differ, for instance on :contains()
+selector_translators = {
+        'desc': 'lxml',
+        'fdesc': 'lxml',
+        'children': 'generic',
+        'ancestors': 'generic',
+        'fsiblings': 'generic',
+        'psiblings': 'generic',
+        }
+
+# actions reading an attribute, applied to the selected element in Python
+attr_actions = {
+        'class': 'class',
+        'id': 'id',
+        }
+
+attr_name_re = re.compile(r'^[A-Za-z_][-A-Za-z0-9_.]*$')
+
+
+def translate_single_selector(selector, axis, translator):
+    from cssselect import parse as parse_css
+
+    # a group of selectors translates to a union, which cannot be followed
+    # by other steps in XPath 1.0
+    if len(parse_css(selector)) != 1:
+        return None
+
+    return translate_css(selector, prefix=axis, translator=translator)
+
+
+def translate_selector(selector, axis, translator='generic'):
+    selector = preprocess_selector(selector)
+
+    # the translation may be cached, without translate_css being called
+    register_functions(translator)
+
+    return cached_translation(('single', selector, axis, translator),
+            lambda: translate_single_selector(selector, axis, translator))
+
+
+def join_path(path, step):
+    if path is None:
+        return step
+    else:
+        return '%s/%s' % (path, step)
+
+
+def select_one(path, index):
+    # parenthesized, so that the position is in document order for every axis
+    return '(%s)[%s]' % (path, index)
+
+
+def xpath_step(path, name, args):
+    """
+    Returns the expression selecting the result of action 'name' applied to
+    the result of 'path' (the context element if None), and its kind, or None
+    if the action cannot be expressed.
+    """
+    if name == 'parent' and len(args) == 0:
+        return (join_path(path, 'parent::*'), 'element')
+
+    if name in selector_axes and len(args) == 1:
+        step = translate_selector(args[0], selector_axes[name], selector_translators[name])
+
+        if step is None:
+            return None
+        elif name == 'fdesc':
+            return (select_one(join_path(path, step), 1), 'element')
+        else:
+            return (join_path(path, step), 'set')
+
+    if path is None:
+        return None
+
+    if name == 'first' and len(args) == 0:
+        return (select_one(path, 1), 'element')
+
+    if name == 'last' and len(args) == 0:
+        return (select_one(path, 'last()'), 'element')
+
+    if name == 'nth' and len(args) == 1:
+        try:
+            i = int(args[0])
+        except ValueError:
+            return None
+
+        if i >= 0:
+            return (select_one(path, i + 1), 'element')
+        else:
+            return (select_one(path, 'last() + %d' % (i + 1,)), 'element')
+
+    return None
+
+
+def finishing_step(name, args):
+    """
+    Returns a function computing the value of a last action reading the
+    selected element, or None.
+    """
+    if name == 'text' and len(args) == 0:
+        return lambda e: e.text
+
+    if name == 'tag' and len(args) == 0:
+        return lambda e: e.tag
+
+    if name in attr_actions and len(args) == 0:
+        attr = attr_actions[name]
+    elif name == 'attr' and len(args) == 1 and attr_name_re.match(args[0]):
+        attr = args[0]
+    else:
+        return None
+
+    return lambda e: e.get(attr)
+
+
+def can_fuse(action):
+    """
+    Whether an action may be part of a fused chain.
+    """
+    if action.key is None:
+        return False
+
+    (name, args) = (action.key[0], action.key[1:])
+
+    return xpath_step('.', name, args) is not None or finishing_step(name, args) is not None
+
+
+def fuse_actions(actions, unfused):
+    """
+    Returns a function computing the value of a chain of actions, applied to
+    an element, with one XPath evaluation; or None if the chain cannot be
+    expressed in XPath.
+
+    Chains with less than two selector actions are not worth fusing.
+
+    When nothing is selected, the chain is computed again by 'unfused', which
+    raises the error of the failing action, or computes the value if none
+    fails (when the chain ends with a set, an empty set may be its value).
+    """
+    path = None
+    kind = None
+    # whether some step must select an element
+    strict = False
+    finish = None
+
+    for (i, action) in enumerate(actions):
+        if action.key is None:
+            return None
+
+        (name, args) = (action.key[0], action.key[1:])
+
+        step = xpath_step(path, name, args)
+
+        if step is not None:
+            if kind == 'element':
+                strict = True
+
+            (path, kind) = step
+            continue
+
+        if i == len(actions) - 1 and kind == 'element':
+            finish = finishing_step(name, args)
+
+        if finish is None:
+            return None
+
+    # evaluating an XPath expression costs more than getting a parent or an
+    # item in Python, so fusing pays only if it saves selector evaluations
+    if len([a for a in actions if a.key[0] in selector_axes]) < 2:
+        return None
+
+    if kind == 'element':
+        strict = True
+
+    xpath = XPath(path, smart_strings=False)
+
+    if kind == 'set':
+        if not strict:
+            return xpath
+
+        def fused(element):
+            result = xpath(element)
+
+            if result:
+                return result
+
+            return unfused(element)
+
+    elif finish is None:
+        def fused(element):
+            result = xpath(element)
+
+            if result:
+                return result[0]
+
+            return unfused(element)
+
+    else:
+        # None is a text value, but a missing attribute is an error
+        accept_none = actions[-1].key[0] == 'text'
+
+        def fused(element):
+            result = xpath(element)
+
+            if result:
+                value = finish(result[0])
+
+                if value is not None or accept_none:
+                    return value
+
+            return unfused(element)
+
+    fused.path = path
+
+    return fused
@@ -0,0 +1,481 @@
+import email.utils
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib2
+
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+# once over its maximum size, the cache is evicted down to this fraction of
+# it, so that the entries are not all scanned again on every store
+EVICTION_TARGET = 0.9
+# fraction of the time since the last modification used as freshness lifetime,
+# when the server gives no explicit expiration (RFC 7234, section 4.2.2)
+HEURISTIC_FRACTION = 0.1
+MAX_HEURISTIC_LIFETIME = 24 * 3600
+
+# the response headers kept in the cache entries
+stored_headers = frozenset([
+        'age',
+        'cache-control',
+        'content-type',
+        'date',
+        'etag',
+        'expires',
+        'last-modified',
+        ])
+
+
+def select_headers(headers):
+    return dict((k, v) for (k, v) in headers.items() if k in stored_headers)
+
+
+def parse_http_date(value):
+    if value is None:
+        return None
+
+    t = email.utils.parsedate_tz(value)
+
+    if t is None:
+        return None
+
+    return email.utils.mktime_tz(t)
+
+
+def parse_cache_control(value):
+    """
+    Returns a dict mapping the (lowercase) directives in a Cache-Control header
+    to their values, or to None for directives without value.
+    """
+    directives = {}
+
+    if value is None:
+        return directives
+
+    for part in value.split(','):
+        part = part.strip()
+
+        if part == '':
+            continue
+
+        if '=' in part:
+            (k, v) = part.split('=', 1)
+            directives[k.strip().lower()] = v.strip().strip('"')
+        else:
+            directives[part.lower()] = None
+
+    return directives
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_storable(response):
+    if response.status != 200:
+        return False
+
+    if 'no-store' in parse_cache_control(response.headers.get('cache-control')):
+        return False
+
+    if response.headers.get('vary', '').strip() == '*':
+        return False
+
+    return True
+
+
+def freshness_lifetime(headers, now):
+    """
+    Returns for how many seconds a response with the given headers is fresh.
+    """
+    cc = parse_cache_control(headers.get('cache-control'))
+
+    if 'no-cache' in cc:
+        return 0
+
+    max_age = parse_int(cc.get('max-age'))
+    if max_age is not None:
+        return max_age
+
+    date = parse_http_date(headers.get('date'))
+    if date is None:
+        date = now
+
+    expires = headers.get('expires')
+    if expires is not None:
+        expires = parse_http_date(expires)
+        # invalid dates, like "0", mean already expired
+        if expires is None:
+            return 0
+        return max(0, expires - date)
+
+    last_modified = parse_http_date(headers.get('last-modified'))
+    if last_modified is not None and last_modified < date:
+        return min(int((date - last_modified) * HEURISTIC_FRACTION), MAX_HEURISTIC_LIFETIME)
+
+    return 0
+
+
+class CacheEntry(object):
+    def __init__(self, url, digest, size, headers, stored, path=None):
+        self.url = url
+        # digest of the body, which is also the name of the stored object
+        self.digest = digest
+        self.size = size
+        self.headers = headers
+        self.stored = stored
+        self.path = path
+
+
+    def is_fresh(self, now=None):
+        if now is None:
+            now = time.time()
+
+        age = max(0, now - self.stored) + (parse_int(self.headers.get('age')) or 0)
+
+        return age < freshness_lifetime(self.headers, self.stored)
+
+
+    def validators(self):
+        """
+        Returns the headers that make a request conditional on this entry.
+        """
+        headers = {}
+
+        etag = self.headers.get('etag')
+        if etag is not None:
+            headers['If-None-Match'] = etag
+
+        last_modified = self.headers.get('last-modified')
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+
+        return headers
+
+
+    def to_json(self):
+        return {
+                'url': self.url,
+                'digest': self.digest,
+                'size': self.size,
+                'headers': self.headers,
+                'stored': self.stored,
+                }
+
+
+    @staticmethod
+    def from_json(d, path=None):
+        return CacheEntry(d['url'], d['digest'], d['size'], d['headers'], d['stored'], path=path)
+
+
+    def __str__(self):
+        return 'CacheEntry(%s, %s)' % (self.url, self.digest)
+
+
+    __repr__ = __str__
+
+
+class HTTPCache(object):
+    """
+    An on-disk, content-addressed HTTP response cache.
+
+    Bodies are stored once per distinct content under 'objects/', named after
+    their SHA-1 digest; 'entries/' maps each URL to a body and to the response
+    headers needed to decide its freshness and to revalidate it. When the
+    total size of the stored bodies exceeds 'max_size', the least recently
+    used entries are evicted, down to EVICTION_TARGET of 'max_size'.
+    """
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self._directory = directory
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        # total size of the stored objects; computed on first use
+        self._size = None
+
+        for d in (self._objects_dir(), self._entries_dir()):
+            try:
+                os.makedirs(d)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+
+    def _objects_dir(self):
+        return os.path.join(self._directory, 'objects')
+
+
+    def _entries_dir(self):
+        return os.path.join(self._directory, 'entries')
+
+
+    @staticmethod
+    def _fan_out(directory, digest):
+        return os.path.join(directory, digest[:2], digest[2:])
+
+
+    def _object_path(self, digest):
+        return self._fan_out(self._objects_dir(), digest)
+
+
+    def _entry_path(self, url):
+        return self._fan_out(self._entries_dir(), hashlib.sha1(url).hexdigest())
+
+
+    @staticmethod
+    def _write_atomically(path, data):
+        directory = os.path.dirname(path)
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, prefix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_path, path)
+        except:
+            os.unlink(tmp_path)
+            raise
+
+
+    def lookup(self, url):
+        path = self._entry_path(url)
+
+        try:
+            with open(path, 'rb') as f:
+                entry = CacheEntry.from_json(json.load(f), path=path)
+        except (IOError, ValueError, KeyError):
+            return None
+
+        # another URL may share the file name only if SHA-1 collides, but be safe
+        if entry.url != url or not os.path.exists(self._object_path(entry.digest)):
+            return None
+
+        return entry
+
+
+    def read_body(self, entry):
+        with open(self._object_path(entry.digest), 'rb') as f:
+            body = f.read()
+
+        # marks the entry as recently used, for eviction
+        try:
+            os.utime(entry.path, None)
+        except OSError:
+            pass
+
+        return body
+
+
+    def store(self, url, headers, body, stored=None):
+        if stored is None:
+            stored = time.time()
+
+        digest = hashlib.sha1(body).hexdigest()
+        object_path = self._object_path(digest)
+
+        entry = CacheEntry(url, digest, len(body), select_headers(headers), stored, path=self._entry_path(url))
+
+        with self._lock:
+            if not os.path.exists(object_path):
+                self._write_atomically(object_path, body)
+
+                if self._size is not None:
+                    self._size += len(body)
+
+            self._write_atomically(entry.path, json.dumps(entry.to_json()))
+
+            self._evict()
+
+        return entry
+
+
+    def refresh(self, entry, headers, stored=None):
+        """
+        Updates an entry with the headers of a 304 (Not Modified) response.
+        """
+        if stored is None:
+            stored = time.time()
+
+        new_headers = dict(entry.headers)
+        new_headers.update(select_headers(headers))
+
+        entry = CacheEntry(entry.url, entry.digest, entry.size, new_headers, stored, path=entry.path)
+
+        with self._lock:
+            self._write_atomically(entry.path, json.dumps(entry.to_json()))
+
+        return entry
+
+
+    def _walk(self, directory):
+        for sub in os.listdir(directory):
+            subdir = os.path.join(directory, sub)
+
+            if not os.path.isdir(subdir):
+                continue
+
+            for name in os.listdir(subdir):
+                if not name.startswith('.tmp'):
+                    yield (sub + name, os.path.join(subdir, name))
+
+
+    def _compute_size(self):
+        return sum(os.path.getsize(path) for (_, path) in self._walk(self._objects_dir()))
+
+
+    def _evict(self):
+        if self._size is None:
+            self._size = self._compute_size()
+
+        if self._size <= self._max_size:
+            return
+
+        entries = []
+
+        for (_, path) in self._walk(self._entries_dir()):
+            try:
+                with open(path, 'rb') as f:
+                    d = json.load(f)
+                entries.append((os.path.getmtime(path), path, d['digest']))
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+
+        # least recently used first
+        entries.sort()
+
+        sizes = dict((digest, os.path.getsize(path)) for (digest, path) in self._walk(self._objects_dir()))
+
+        refcounts = {}
+        for (_, _, digest) in entries:
+            refcounts[digest] = refcounts.get(digest, 0) + 1
+
+        size = sum(sizes.values())
+
+        # objects no entry refers to go first
+        for (digest, s) in sizes.items():
+            if digest not in refcounts:
+                self._remove_object(digest)
+                size -= s
+
+        target = self._max_size * EVICTION_TARGET
+
+        for (_, path, digest) in entries:
+            if size <= target:
+                break
+
+            self._remove_file(path)
+
+            refcounts[digest] -= 1
+
+            if refcounts[digest] == 0 and digest in sizes:
+                self._remove_object(digest)
+                size -= sizes[digest]
+
+        self._size = size
+
+
+    def _remove_object(self, digest):
+        self._remove_file(self._object_path(digest))
+
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+class CachingHTTPClient(object):
+    """
+    Wraps an HTTPClient, answering from an HTTPCache while the cached responses
+    are fresh and revalidating them with conditional requests (ETag and
+    Last-Modified) otherwise.
+
+    In offline mode cached responses are always used, fresh or not, and only
+    URLs missing from the cache are requested.
+    """
+    def __init__(self, client, cache, offline=False):
+        self._client = client
+        self._cache = cache
+        self._offline = offline
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+
+    @property
+    def pool(self):
+        return self._client.pool
+
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+    def counters(self):
+        counters = self._client.counters()
+
+        with self._lock:
+            counters.update({
+                'cache_hits': self.hits,
+                'cache_revalidated': self.revalidated,
+                'cache_misses': self.misses,
+                })
+
+        return counters
+
+
+    def fetch(self, url, headers=None, proxy=True):
+        if headers is None:
+            headers = {}
+
+        entry = self._cache.lookup(url)
+
+        if entry is not None and (self._offline or entry.is_fresh()):
+            try:
+                body = self._cache.read_body(entry)
+            except IOError:
+                # evicted meanwhile
+                entry = None
+            else:
+                self._count('hits')
+                return body
+
+        request_headers = dict(headers)
+
+        if entry is not None:
+            request_headers.update(entry.validators())
+
+        response = self._client.get(url, headers=request_headers, proxy=proxy)
+
+        if response.status == 304 and entry is not None:
+            self._count('revalidated')
+            entry = self._cache.refresh(entry, response.headers)
+            return self._cache.read_body(entry)
+
+        if response.status < 200 or response.status >= 300:
+            raise urllib2.HTTPError(response.url, response.status, response.reason, response.headers, None)
+
+        self._count('misses')
+
+        if is_storable(response):
+            self._cache.store(url, response.headers, response.body)
+
+        return response.body
@@ -0,0 +1,385 @@
+import base64
+import httplib
+import socket
+import threading
+import urllib
+import urllib2
+import urlparse
+
+
+DEFAULT_POOL_SIZE = 10
+MAX_REDIRECTS = 10
+DEFAULT_USER_AGENT = 'Python-urllib/%s' % (urllib2.__version__,)
+
+# the content codings of the responses decoded by decode_body
+ACCEPT_ENCODING = 'gzip'
+
+redirect_codes = frozenset([301, 302, 303, 307, 308])
+
+# the schemes of the URLs requested by HTTPClient itself; others are left to
+# urllib2
+http_schemes = frozenset(['http', 'https'])
+
+# errors that show a kept-alive connection was closed by the server meanwhile
+stale_connection_errors = (
+        httplib.BadStatusLine,
+        httplib.CannotSendRequest,
+        httplib.ResponseNotReady,
+        socket.error,
+        )
+
+
+def decode_body(body, headers):
+    """
+    Returns the body of a response decoded according to its Content-Encoding
+    header, which is then removed from the headers.
+    """
+    encoding = headers.pop('content-encoding', None)
+
+    if encoding is None:
+        return body
+
+    from .compression import decode_content
+
+    return decode_content(encoding, body)
+
+
+class Response(object):
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        # header names are lowercase
+        self.headers = headers
+        self.body = body
+
+
+    def __str__(self):
+        return 'Response(%s, %s)' % (self.url, self.status)
+
+
+    __repr__ = __str__
+
+
+class ConnectionKey(object):
+    """
+    Identifies the connections that can be reused for a request: the host we
+    connect to (the target or a proxy) and, for HTTPS through a proxy, the
+    tunneled host.
+    """
+    def __init__(self, scheme, host, port, tunnel=None, proxy_headers=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.tunnel = tunnel
+        self.proxy_headers = proxy_headers
+
+
+    def _tuple(self):
+        return (self.scheme, self.host, self.port, self.tunnel)
+
+
+    def __eq__(self, other):
+        return self._tuple() == other._tuple()
+
+
+    def __ne__(self, other):
+        return not (self == other)
+
+
+    def __hash__(self):
+        return hash(self._tuple())
+
+
+    def __str__(self):
+        return '%s://%s:%s' % (self.scheme, self.host, self.port)
+
+
+    __repr__ = __str__
+
+
+class ConnectionPool(object):
+    """
+    Keeps up to 'pool_size' idle keep-alive connections per host, to be reused
+    by later requests to the same host. Safe to use from multiple threads.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+        if pool_size < 0:
+            raise ValueError("The connection pool size cannot be negative!")
+
+        self.pool_size = pool_size
+        self._timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.requests = 0
+
+
+    def _make_connection(self, key):
+        if key.scheme == 'https':
+            conn = httplib.HTTPSConnection(key.host, key.port, timeout=self._timeout)
+        else:
+            conn = httplib.HTTPConnection(key.host, key.port, timeout=self._timeout)
+
+        if key.tunnel is not None:
+            conn.set_tunnel(key.tunnel[0], key.tunnel[1], headers=key.proxy_headers)
+
+        return conn
+
+
+    def acquire(self, key, fresh=False):
+        """
+        Returns a tuple (connection, reused). A fresh connection is only asked
+        for to retry a request, which is not counted again.
+        """
+        with self._lock:
+            if not fresh:
+                self.requests += 1
+
+            idle = self._idle.get(key)
+
+            if not fresh and idle:
+                self.connections_reused += 1
+                return (idle.pop(), True)
+
+            self.connections_created += 1
+
+        return (self._make_connection(key), False)
+
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+
+        conn.close()
+
+
+    def close(self):
+        with self._lock:
+            (idle, self._idle) = (self._idle, {})
+
+        for conns in idle.values():
+            for c in conns:
+                c.close()
+
+
+    def counters(self):
+        with self._lock:
+            return {
+                    'requests': self.requests,
+                    'connections_created': self.connections_created,
+                    'connections_reused': self.connections_reused,
+                    }
+
+
+class HTTPClient(object):
+    """
+    A minimal HTTP client that reuses connections through a ConnectionPool and
+    follows redirects.
+    """
+    def __init__(self, pool=None, max_redirects=MAX_REDIRECTS):
+        if pool is None:
+            pool = ConnectionPool()
+
+        self.pool = pool
+        self._max_redirects = max_redirects
+
+
+    def counters(self):
+        return self.pool.counters()
+
+
+    def _get_proxy(self, scheme, host):
+        proxy = urllib.getproxies().get(scheme)
+
+        if proxy is None or urllib.proxy_bypass(host):
+            return None
+
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+
+        return urlparse.urlparse(proxy)
+
+
+    def _route(self, url, proxy):
+        """
+        Returns the connection key, the path to request and the extra headers
+        needed to reach an URL.
+        """
+        parts = urlparse.urlparse(url)
+
+        if parts.scheme not in http_schemes:
+            raise ValueError("Unsupported URL scheme '%s'!" % (parts.scheme,))
+
+        if parts.hostname is None:
+            raise ValueError("Invalid URL '%s'!" % (url,))
+
+        port = parts.port
+        if port is None:
+            port = 443 if parts.scheme == 'https' else 80
+
+        path = urlparse.urlunparse(('', '', parts.path or '/', parts.params, parts.query, ''))
+
+        proxy_url = self._get_proxy(parts.scheme, parts.hostname) if proxy else None
+
+        if proxy_url is None:
+            return (ConnectionKey(parts.scheme, parts.hostname, port), path, {})
+
+        proxy_headers = {}
+
+        if proxy_url.username is not None:
+            credentials = '%s:%s' % (urllib.unquote(proxy_url.username), urllib.unquote(proxy_url.password or ''))
+            proxy_headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials)
+
+        proxy_port = proxy_url.port or 80
+
+        if parts.scheme == 'https':
+            # an HTTPS connection to the proxy, tunnelled to the host with
+            # CONNECT, so that TLS is negotiated with the host
+            key = ConnectionKey('https', proxy_url.hostname, proxy_port,
+                    tunnel=(parts.hostname, port), proxy_headers=proxy_headers)
+            return (key, path, {})
+        else:
+            # plain HTTP proxies receive the absolute URL
+            return (ConnectionKey('http', proxy_url.hostname, proxy_port),
+                    urlparse.urlunparse(parts[:5] + ('',)), proxy_headers)
+
+
+    def _send(self, conn, key, path, headers):
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.release(key, conn)
+
+        return (response, body)
+
+
+    def _request(self, url, headers, proxy):
+        (key, path, extra_headers) = self._route(url, proxy)
+
+        all_headers = {'User-Agent': DEFAULT_USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING}
+        all_headers.update(extra_headers)
+        all_headers.update(headers)
+
+        (conn, reused) = self.pool.acquire(key)
+
+        try:
+            (response, body) = self._send(conn, key, path, all_headers)
+        except stale_connection_errors:
+            if not reused:
+                raise
+
+            # the server closed the idle connection meanwhile; retry on a new one
+            (conn, _) = self.pool.acquire(key, fresh=True)
+            (response, body) = self._send(conn, key, path, all_headers)
+
+        response_headers = dict(response.getheaders())
+        body = decode_body(body, response_headers)
+
+        return Response(url, response.status, response.reason, response_headers, body)
+
+
+    def _open_with_urllib(self, url, headers, proxy):
+        # URLs of other schemes (file, ftp...) are opened by urllib2, without
+        # reusing connections
+        if proxy:
+            proxy_handler = urllib2.ProxyHandler()
+        else:
+            proxy_handler = urllib2.ProxyHandler({})
+
+        f = urllib2.build_opener(proxy_handler).open(urllib2.Request(url, headers=headers))
+
+        try:
+            body = f.read()
+        finally:
+            f.close()
+
+        # the header names of the message are lowercase
+        return Response(f.geturl(), 200, 'OK', dict(f.info().items()), body)
+
+
+    def get(self, url, headers=None, proxy=True):
+        """
+        Performs a GET request, following redirects, and returns the final
+        Response, whatever its status.
+        """
+        if headers is None:
+            headers = {}
+
+        if urlparse.urlparse(url).scheme not in http_schemes:
+            return self._open_with_urllib(url, headers, proxy)
+
+        for _ in xrange(self._max_redirects + 1):
+            response = self._request(url, headers, proxy)
+
+            location = response.headers.get('location')
+
+            if response.status not in redirect_codes or location is None:
+                return response
+
+            url = urlparse.urljoin(url, location)
+
+        raise urllib2.HTTPError(url, response.status, 'Too many redirects', response.headers, None)
+
+
+    def fetch(self, url, headers=None, proxy=True):
+        """
+        Returns the body of the document at 'url'; raises urllib2.HTTPError if
+        the server does not respond with a success status.
+        """
+        response = self.get(url, headers=headers, proxy=proxy)
+
+        if response.status < 200 or response.status >= 300:
+            raise urllib2.HTTPError(response.url, response.status, response.reason, response.headers, None)
+
+        return response.body
+
+
+default_client = None
+default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    Returns the HTTP client shared by all URL data sources.
+    """
+    global default_client
+
+    with default_client_lock:
+        if default_client is None:
+            default_client = HTTPClient()
+
+        return default_client
+
+
+def set_default_client(client):
+    global default_client
+
+    with default_client_lock:
+        default_client = client
+
+
+def configure_default_client(pool_size=DEFAULT_POOL_SIZE):
+    global default_client
+
+    with default_client_lock:
+        if default_client is not None:
+            default_client.pool.close()
+
+        default_client = HTTPClient(pool=ConnectionPool(pool_size=pool_size))
+
+        return default_client
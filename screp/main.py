@@ -1,27 +1,44 @@
 import sys
 from optparse import OptionParser
 import lxml.etree as etree
-import lxml.html as html
-from lxml.cssselect import CSSSelector
-import urlparse
-
-from .format_parsers import (
-        parse_csv_formatter,
-        parse_json_formatter,
-        parse_general_formatter,
-        parse_anchor,
+
+# the modules needed only by some modes (URLs, workers, streaming, the
+# instrumentation, the program cache...) and the grammar, which is not needed
+# when the program is loaded from the cache, are imported when used
+
+from .parsed import (
+        CompiledProgram,
+        build_anchors_factory,
         )
-from .context import (
-        AnchorContextFactory,
+from .utils import (
+        raise_again,
+        css_translations,
         )
-from .utils import raise_again
 from .source import (
         URLDataSource,
         OpenedFileDataSource,
         FileDataSource,
+        is_url,
+        )
+from .selectors import make_css_selector
+from .docindex import indexed_document
+from .planner import make_plan
+from .output import (
+        OutputSink,
+        DEFAULT_FLUSH_SIZE,
         )
 
 
+# where records are written, once the options are known
+output = None
+
+# the Stats of the run with --stats, None otherwise
+stats = None
+
+# whether the HTTP client was set up, which is done for the first URL
+http_client_ready = False
+
+
 def report_error(e):
     print >>sys.stderr, "ERROR: %s" % (e,)
 
@@ -30,49 +47,191 @@ def report_warning(e):
     print >>sys.stderr, "WARNING: %s" % (e,)
 
 
+def report_info(s):
+    print >>sys.stderr, "INFO: %s" % (s,)
+
+
+def report_http_counters():
+    from .httpclient import get_default_client
+
+    counters = get_default_client().counters()
+
+    if counters['requests'] > 0:
+        report_info("HTTP: %(requests)s requests, %(connections_created)s connections opened, "
+                "%(connections_reused)s reused" % counters)
+
+    if 'cache_hits' in counters:
+        report_info("HTTP cache: %(cache_hits)s hits, %(cache_revalidated)s revalidated, "
+                "%(cache_misses)s misses" % counters)
+
+
+def setup_http_client():
+    global http_client_ready
+
+    from .httpclient import (
+            configure_default_client,
+            set_default_client,
+            )
+    from .httpcache import (
+            HTTPCache,
+            CachingHTTPClient,
+            )
+
+    client = configure_default_client(pool_size=options.pool_size)
+
+    http_client_ready = True
+
+    if options.cache_dir is not None:
+        cache = HTTPCache(options.cache_dir, max_size=options.cache_size * 1024 * 1024)
+        set_default_client(CachingHTTPClient(client, cache, offline=options.cache_offline))
+
+
+def timed(stage, f, *args):
+    if stats is None:
+        return f(*args)
+    else:
+        return stats.time(stage, f, *args)
+
+
+def count(counter, n=1):
+    if stats is not None:
+        stats.count(counter, n)
+
+
+def make_stats():
+    if options.stats or options.stats_file is not None:
+        from .stats import Stats
+
+        return Stats()
+    else:
+        return None
+
+
+def report_stats():
+    if options.stats_file is not None:
+        with open(options.stats_file, 'w') as f:
+            stats.write_report(f)
+    else:
+        stats.write_report(sys.stderr)
+
+
 def print_record(string):
-    sys.stdout.write(string)
+    output.write(string)
 
 
-def get_formatter(anchors_factory):
+def make_output():
+    flush_size = options.flush_size
+
+    if flush_size is None:
+        # records show up as they are computed on a terminal
+        if sys.stdout.isatty():
+            flush_size = 0
+        else:
+            flush_size = DEFAULT_FLUSH_SIZE
+
+    if stats is None:
+        stream = sys.stdout
+    else:
+        from .stats import TimedStream
+
+        stream = TimedStream(sys.stdout, stats, stage='output', counter='bytes_out')
+
+    return OutputSink(stream, flush_size=flush_size)
+
+
+def read_format():
+    from .format_parsers import (
+            read_csv_format,
+            read_json_format,
+            read_json_lines_format,
+            read_general_format,
+            )
+
     try:
-        if [options.csv, options.json, options.general_format].count(None) != 2:
-            raise ValueError("Only one of (--csv, --json, --format) may be specified!")
+        if [options.csv, options.json, options.json_lines, options.general_format].count(None) != 3:
+            raise ValueError("Only one of (--csv, --json, --json-lines, --format) may be specified!")
 
         if options.csv is not None:
-            return parse_csv_formatter(options.csv, anchors_factory, header=options.csv_header)
+            return read_csv_format(options.csv, header=options.csv_header)
         elif options.json is not None:
-            return parse_json_formatter(options.json, anchors_factory, indent=options.json_indent)
+            return read_json_format(options.json, indent=options.json_indent)
+        elif options.json_lines is not None:
+            return read_json_lines_format(options.json_lines)
         elif options.general_format is not None:
-            return parse_general_formatter(options.general_format, anchors_factory, options.escaped)
+            return read_general_format(options.general_format, options.escaped)
 
         raise ValueError('No format defined!')
     except Exception as e:
         raise_again('Parsing format specification: %s' % (e,))
 
 
+def build_format(parsed_format, anchors_factory):
+    try:
+        return parsed_format.build(anchors_factory)
+    except Exception as e:
+        raise_again('Parsing format specification: %s' % (e,))
+
+
+def get_formatter(anchors_factory):
+    return build_format(read_format(), anchors_factory)
+
+
 def get_selector(selector):
     try:
-        return CSSSelector(selector)
+        return make_css_selector(selector)
     except Exception as e:
         raise_again('Parsing selector: %s' % (e,))
 
 
-def get_anchor(string, anchors_factory):
+def read_anchor_definition(string):
+    from .format_parsers import read_anchor
+
     try:
-        return parse_anchor(string, anchors_factory)
+        return read_anchor(string)
     except Exception as e:
         raise_again('Parsing anchor: %s' % (e,))
 
 
 def make_anchors_factory(strings):
-    factory = AnchorContextFactory((('$', 'element'), ('@', 'element')))
+    return build_anchors_factory(map(read_anchor_definition, strings))
+
+
+def get_program_key():
+    from .programcache import program_key
+
+    return program_key(options.anchors, options.csv, options.csv_header, options.json, options.json_indent,
+            options.json_lines, options.general_format, options.escaped)
+
 
-    for s in strings:
-        a = get_anchor(s, factory)
-        factory.add_anchor(a)
+def load_program(cache):
+    """
+    Returns the program compiled from the options, from the cache if given
+    and if it is there, or parsed.
+    """
+    if cache is not None:
+        program = cache.load(get_program_key())
 
-    return factory
+        if program is not None:
+            css_translations.update(program.translations)
+            return program
+
+    return CompiledProgram(read_format(), map(read_anchor_definition, options.anchors))
+
+
+def save_program(cache, program):
+    """
+    Saves the program if it is new, or if selectors were translated while
+    running it; since they are cached too.
+    """
+    if cache is None or program.translations == css_translations:
+        return
+
+    program.translations = dict(css_translations)
+
+    try:
+        cache.store(get_program_key(), program)
+    except Exception as e:
+        report_warning('Saving the compiled program: %s' % (e,))
 
 
 def parse_xml_data(data):
@@ -84,7 +243,43 @@ def parse_xml_data(data):
         raise_again('Parsing document: %s' % (e,))
 
 
+def parse_xml_stream(stream):
+    try:
+        parser = etree.HTMLParser(remove_blank_text=True)
+
+        return etree.parse(stream, parser).getroot()
+    except Exception as e:
+        raise_again('Parsing document: %s' % (e,))
+
+
+def read_document(source):
+    """
+    Reads and parses the document of a source; streamable sources are parsed
+    as they are read.
+    """
+    if not source.streamable:
+        data = timed('read_data', source.read_data)
+        dom = timed('parse_xml_data', parse_xml_data, data)
+        count('bytes_in', len(data))
+
+        return dom
+
+    stream = timed('read_data', source.open_data)
+
+    try:
+        if stats is not None:
+            from .stats import TimedStream
+
+            stream = TimedStream(stream, stats, stage='read_data', counter='bytes_in')
+
+        return timed('parse_xml_data', parse_xml_stream, stream)
+    finally:
+        stream.close()
+
+
 def handle_value_exception(e):
+    count('errors')
+
     if options.stop_on_error:
         raise
     elif options.show_warnings:
@@ -117,49 +312,262 @@ def get_context(root, element, anchors):
     return context
 
 
-def screp_source(formatter, terms, anchors_factory, selector, source):
+def parse_matches(selector, source):
+    """
+    Generates tuples (dom, element), for the elements matching the selector.
+    """
     try:
-        data = source.read_data()
-        dom = parse_xml_data(data)
+        dom = read_document(source)
     except Exception as e:
+        count('file_errors')
+
         if options.continue_on_file_errors:
             return
         else:
             raise
 
-    for e in selector(dom):
-        context = anchors_factory.make_context({'$': e, '@': dom})
+    count('documents')
+
+    # the terms of all the records share the index of the document
+    with indexed_document(dom):
+        for e in timed('selector', selector, dom):
+            yield (dom, e)
+
+
+def stream_matches(selector, reach, source):
+    from .streaming import iter_stream_matches
+
+    stream = None
+
+    try:
+        stream = source.open_data()
+
+        if stats is None:
+            matches = iter_stream_matches(stream, selector.css, reach)
+        else:
+            from .stats import TimedStream
 
-        print_record(formatter.format_record(map(lambda t: compute_value(t, context), terms)))
+            stream = TimedStream(stream, stats, stage='read_data', counter='bytes_in')
+            matches = stats.timed_iter('parse_xml_data', iter_stream_matches(stream, selector.css, reach))
 
+        for match in matches:
+            yield match
 
-def screp_all(formatter, terms, anchors_factory, selector, sources):
+        count('documents')
+    except Exception as e:
+        count('file_errors')
+
+        if not options.continue_on_file_errors:
+            raise_again('Parsing document: %s' % (e,))
+    finally:
+        if stream is not None:
+            stream.close()
+
+
+def compute_values(plan, values):
+    return map(lambda t: compute_value(t, values), plan.outputs)
+
+
+def scrape_source(plan, selector, source):
+    """
+    Generates the values of the records of a source.
+    """
+    if options.stream:
+        from .streaming import program_reach
+
+        matches = stream_matches(selector, program_reach(plan.terms, plan.anchors_factory), source)
+    else:
+        matches = parse_matches(selector, source)
+
+    for (dom, e) in matches:
+        count('records')
+
+        yield compute_values(plan, timed('evaluate', plan.evaluate, {'$': e, '@': dom}))
+
+
+def screp_source(formatter, plan, selector, source):
+    write_record = formatter.write_record
+
+    if stats is not None:
+        write_record = stats.timed('format', write_record)
+
+    for values in scrape_source(plan, selector, source):
+        write_record(values, output)
+
+
+def make_portable(source):
+    from .fetcher import PrefetchedDataSource
+
+    if source.portable:
+        return source
+    else:
+        return PrefetchedDataSource(source, data=timed('read_data', source.read_data))
+
+
+def screp_in_workers(formatter, plan, selector, sources):
+    from .workers import map_in_workers
+
+    # the workers inherit the compiled program when forked, with this closure
+    def render_source(source):
+        return [formatter.render_record(values) for values in scrape_source(plan, selector, source)]
+
+    chunks = map_in_workers(render_source, sources, options.workers, ordered=not options.unordered)
+
+    if stats is not None:
+        # only the time spent waiting is known from the workers
+        chunks = stats.timed_iter('workers', chunks)
+
+    for chunk in chunks:
+        count('documents')
+        count('records', len(chunk))
+
+        for rendered in chunk:
+            print_record(formatter.frame_record(rendered))
+
+
+def screp_all(formatter, plan, selector, sources):
     print_record(formatter.start_format())
 
-    for source in sources:
-        screp_source(formatter, terms, anchors_factory, selector, source)
+    if options.workers > 0:
+        sources = (make_portable(s) for s in sources)
+
+    if options.jobs > 1:
+        from .fetcher import prefetch_sources
+
+        sources = prefetch_sources(sources, options.jobs)
+
+    if options.workers > 0:
+        screp_in_workers(formatter, plan, selector, sources)
+    else:
+        for source in sources:
+            screp_source(formatter, plan, selector, source)
 
     print_record(formatter.end_format())
 
 
 def make_url_data_source(source):
+    if not http_client_ready:
+        setup_http_client()
+
     return URLDataSource(source, user_agent=options.user_agent, proxy=options.use_proxy)
 
 
 def make_data_source(source):
-    url = urlparse.urlparse(source)
-
-    if url.scheme != '':
+    if is_url(source):
         return make_url_data_source(source)
     else:
         return FileDataSource(source)
 
 
+def handle_archive_error(path, e):
+    count('file_errors')
+
+    if not options.continue_on_file_errors:
+        raise_again('Reading archive %s: %s' % (path, e))
+
+
+def handle_walk_error(e):
+    count('file_errors')
+
+    if not options.continue_on_file_errors:
+        raise e
+
+
+def iter_listed_names(path):
+    """
+    Generates the names listed in the file 'path' (or the standard input, if
+    '-'), separated by NUL characters.
+    """
+    from .paths import iter_names
+
+    if path == '-':
+        f = sys.stdin
+    else:
+        f = open(path, 'rb')
+
+    try:
+        for name in iter_names(f):
+            yield name
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def iter_source_names(sources):
+    """
+    Generates the sources given on the command line, then those listed in the
+    file given with --files-from, with directories walked and glob patterns
+    (on the command line only) expanded.
+    """
+    from .paths import expand_path
+
+    listed = ()
+
+    if options.files_from is not None:
+        listed = iter_listed_names(options.files_from)
+
+    for (names, patterns) in [(sources, True), (listed, False)]:
+        for source in names:
+            if is_url(source):
+                yield source
+            else:
+                for name in expand_path(source, patterns, onerror=handle_walk_error):
+                    yield name
+
+
 def make_data_sources(sources):
-    if len(sources) == 0:
+    if len(sources) == 0 and options.files_from is None:
         return [OpenedFileDataSource('STDIN', sys.stdin)]
     else:
-        return map(make_data_source, sources)
+        from .archives import iter_data_sources
+
+        return iter_data_sources(iter_source_names(sources), make_data_source, onerror=handle_archive_error)
+
+
+def serve(program, plan, selector):
+    """
+    Scrapes the documents sent to the socket at options.serve, until
+    stopped by SIGTERM or SIGINT.
+    """
+    from .server import ScrepServer
+
+    if options.flush_size is None:
+        flush_size = DEFAULT_FLUSH_SIZE
+    else:
+        flush_size = options.flush_size
+
+    # runs in the process serving the connection, forked from the server
+    def scrape(source, stream):
+        global output
+
+        output = OutputSink(stream, flush_size)
+
+        # the formatters keep the state of an output, so each request has
+        # its own
+        formatter = program.parsed_format.formatter_factory()
+
+        try:
+            screp_all(formatter, plan, selector, [source])
+        finally:
+            output.flush()
+
+    server = ScrepServer(options.serve, scrape, options.max_connections)
+
+    if options.verbose:
+        report_info('Serving on %s' % (options.serve,))
+
+    server.serve_until_stopped()
+
+
+def check_serve_options(sources):
+    if len(sources) > 0 or options.files_from is not None:
+        raise ValueError('--serve takes no data sources!')
+
+    if options.stats or options.stats_file is not None or options.profile_terms:
+        raise ValueError('--serve cannot be used with --stats, --stats-file or --profile-terms!')
+
+    if options.max_connections < 1:
+        raise ValueError('--max-connections must be at least 1!')
 
 
 def parse_cli_options(argv):
@@ -187,10 +595,46 @@ def parse_cli_options(argv):
             help='user agent to use when retrieving URLs')
     parser.add_option('-j', '--json', dest='json', action='store',
             default=None, help='print record as json object')
+    parser.add_option('-J', '--json-lines', dest='json_lines', action='store',
+            default=None, help='print each record as a json object on its own line')
     parser.add_option('--indent-json', dest='json_indent', action='store_true', default=False,
             help='indent json objects')
     parser.add_option('--no-proxy', dest='use_proxy', action='store_false', default=True,
             help="don't use proxy, even if environment variables are set")
+    parser.add_option('--jobs', dest='jobs', action='store', type='int', default=1,
+            help='number of URLs to fetch concurrently; records are still output in input order')
+    parser.add_option('--pool-size', dest='pool_size', action='store', type='int', default=10,
+            help='number of idle keep-alive connections kept per host')
+    parser.add_option('--cache-dir', dest='cache_dir', action='store', default=None,
+            help='cache fetched URLs in this directory, revalidating them when they expire')
+    parser.add_option('--cache-size', dest='cache_size', action='store', type='int', default=1024,
+            help='maximum size of the URL cache, in MB')
+    parser.add_option('--cache-offline', dest='cache_offline', action='store_true', default=False,
+            help="use cached documents even if they expired; only fetch URLs missing from the cache")
+    parser.add_option('--workers', dest='workers', action='store', type='int', default=0,
+            help='process documents in this many worker processes')
+    parser.add_option('--unordered', dest='unordered', action='store_true', default=False,
+            help='with --workers, output the records of each document as soon as it is processed')
+    parser.add_option('--flush-size', dest='flush_size', action='store', type='int',
+            default=None, help='write the output in chunks of this many bytes; by default 64KB, or every record on a terminal')
+    parser.add_option('--stats', dest='stats', action='store_true', default=False,
+            help='report the time spent in each stage of the run, and counters, as json on the standard error')
+    parser.add_option('--stats-file', dest='stats_file', action='store', default=None,
+            help='write the --stats report to this file instead; implies --stats')
+    parser.add_option('--profile-terms', dest='profile_terms', action='store_true', default=False,
+            help='report the time spent computing each action of the terms and anchors, by location, on the standard error')
+    parser.add_option('--program-cache', dest='program_cache', action='store', default=None,
+            help='save the parsed format specification and anchors in this directory, and reuse them in later runs with the same options')
+    parser.add_option('--serve', dest='serve', action='store', default=None,
+            help='compile the program once, then scrape the documents sent over the Unix socket at this path')
+    parser.add_option('--max-connections', dest='max_connections', action='store', type='int', default=8,
+            help='with --serve, maximum number of connections served at once')
+    parser.add_option('--files-from', dest='files_from', action='store', default=None,
+            help="scrape the files listed in this file, or the standard input if '-', "
+            "separated by NUL characters (as written by find -print0)")
+    parser.add_option('--stream', dest='stream', action='store_true', default=False,
+            help='parse documents incrementally, outputting records as soon as possible and '
+            'releasing the parts of the documents that are no longer needed')
     parser.add_option('-f', '--format', dest='general_format', action='store',
             default=None, help='print record as custom format')
     parser.add_option('-S', '--not-escaped', dest='escaped', action='store_false', default=True,
@@ -212,20 +656,71 @@ def parse_cli_options(argv):
 
 
 def main():
-    global options
+    global options, output, stats
 
     try:
         (options, selector, sources_raw) = parse_cli_options(sys.argv[1:])
 
-        sources = make_data_sources(sources_raw)
+        if options.serve is not None:
+            check_serve_options(sources_raw)
+
+        stats = make_stats()
 
-        anchors_factory = make_anchors_factory(options.anchors)
+        output = make_output()
+
+        if options.program_cache is not None:
+            from .programcache import ProgramCache
+
+            cache = ProgramCache(options.program_cache)
+        else:
+            cache = None
 
-        (formatter, terms) = get_formatter(anchors_factory)
+        program = load_program(cache)
+
+        anchors_factory = build_anchors_factory(program.parsed_anchors)
+
+        (formatter, terms) = build_format(program.parsed_format, anchors_factory)
+
+        anchors_factory.prune(terms)
+
+        if options.profile_terms:
+            from .profiler import ActionProfile
+
+            profile = ActionProfile()
+        else:
+            profile = None
+
+        plan = make_plan(terms, anchors_factory, profile=profile)
 
         selector = get_selector(selector)
 
-        screp_all(formatter, terms, anchors_factory, selector, sources)
+        if options.serve is not None:
+            save_program(cache, program)
+            serve(program, plan, selector)
+            sys.exit(0)
+
+        sources = make_data_sources(sources_raw)
+
+        try:
+            screp_all(formatter, plan, selector, sources)
+        finally:
+            # the records before an error are still output
+            output.flush()
+
+            if stats is not None:
+                # the time of the 'evaluate' stage, by term and anchor action
+                if profile is not None:
+                    stats.add_section('actions', profile.report())
+
+                report_stats()
+
+            if profile is not None:
+                profile.write_report(sys.stderr)
+
+        save_program(cache, program)
+
+        if options.verbose and http_client_ready:
+            report_http_counters()
 
     except Exception as e:
         if options.debug:
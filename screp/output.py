@@ -0,0 +1,52 @@
+DEFAULT_FLUSH_SIZE = 64 * 1024
+
+
+class OutputSink(object):
+    """
+    Collects the output written to it and writes it to a stream in chunks of
+    at least 'flush_size' bytes; with a flush_size of 0, every write goes to
+    the stream immediately.
+
+    Like a file, it can be the output of a csv.writer.
+    """
+    def __init__(self, stream, flush_size=DEFAULT_FLUSH_SIZE):
+        self._stream = stream
+        self._flush_size = flush_size
+        self._chunks = []
+        self._size = 0
+
+
+    def write(self, s):
+        self._chunks.append(s)
+        self._size += len(s)
+
+        if self._size >= self._flush_size:
+            self.flush()
+
+
+    def flush(self):
+        if len(self._chunks) > 0:
+            self._stream.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+
+        self._stream.flush()
+
+
+class LineBuffer(object):
+    """
+    A reusable file-like object holding what was written since the last call
+    to pop.
+    """
+    def __init__(self):
+        self._chunks = []
+
+
+    def write(self, s):
+        self._chunks.append(s)
+
+
+    def pop(self):
+        s = ''.join(self._chunks)
+        self._chunks = []
+        return s
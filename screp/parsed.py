@@ -0,0 +1,97 @@
+"""
+The results of parsing format specifications and anchor definitions, before
+their actions are built. They hold only plain data, so they can be saved and
+built again without parsing (see programcache).
+"""
+from .term import make_term
+from .anchor import make_anchor
+from .context import AnchorContextFactory
+from .utils import raise_again
+
+
+class ParsedTerm(object):
+    def __init__(self, anchor, accessors, filters):
+        self.anchor = anchor
+        self.accessors = accessors
+        self.filters = filters
+
+
+class ParsedTermAction(object):
+    def __init__(self, name, identification, args=None):
+        self.name = name
+        if args is None:
+            args = ()
+
+        self.args = args
+
+        self.identification = identification
+
+
+    def __str__(self):
+        return "ParsedTermAction<%s>" % (self.identification,)
+
+
+    __repr__ = __str__
+
+
+class ParsedAnchor(object):
+    def __init__(self, name, identification=None):
+        self.name = name
+        self.identification = identification
+
+
+    def __str__(self):
+        return "ParsedAnchor<%s>" % (self.identification,)
+
+
+    __repr__ = __str__
+
+
+class ParsedFormat(object):
+    """
+    A parsed format specification: the parsed terms, and the formatter
+    factory, called with no arguments.
+    """
+    def __init__(self, formatter_factory, pterms):
+        self.formatter_factory = formatter_factory
+        self.pterms = pterms
+
+
+    def build(self, anchors_factory):
+        """
+        Returns (formatter, terms).
+        """
+        terms = map(lambda pterm: make_term(pterm, anchors_factory, required_out_type='string'), self.pterms)
+
+        return (self.formatter_factory(), terms)
+
+
+def build_anchors_factory(parsed_anchors):
+    """
+    Returns the factory of the primary anchors and of the anchors defined by
+    parsed_anchors, a list of (name, parsed term).
+    """
+    factory = AnchorContextFactory((('$', 'element'), ('@', 'element')))
+
+    for (name, pterm) in parsed_anchors:
+        try:
+            a = make_anchor(name, pterm, factory)
+        except Exception as e:
+            raise_again('Parsing anchor: %s' % (e,))
+
+        factory.add_anchor(a)
+
+    return factory
+
+
+class CompiledProgram(object):
+    """
+    A format specification and anchor definitions, parsed, with the
+    translations of the CSS selectors used while running it.
+    """
+    def __init__(self, parsed_format, parsed_anchors, translations=None):
+        self.parsed_format = parsed_format
+        # (name, parsed term) of each anchor, in order
+        self.parsed_anchors = parsed_anchors
+        # None until the program is saved
+        self.translations = translations
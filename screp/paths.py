@@ -0,0 +1,83 @@
+"""
+The file names of the data sources: directories are walked recursively, glob
+patterns are expanded, and lists of names are read from files (as written by
+'find -print0'), all as the names are needed, so that any number of files can
+be scraped in one run.
+"""
+import os
+
+
+# how much of a list of names is read at a time
+CHUNK_SIZE = 64 * 1024
+
+
+def is_pattern(path):
+    return '*' in path or '?' in path or '[' in path
+
+
+def iter_directory(path, onerror=None):
+    """
+    Generates the names of the files under the directory 'path', recursively,
+    in sorted order. onerror is called with the OSError of a directory that
+    cannot be listed, which is otherwise skipped.
+    """
+    for (dirpath, dirnames, filenames) in os.walk(path, onerror=onerror):
+        # os.walk then visits the subdirectories in this order
+        dirnames.sort()
+
+        for name in sorted(filenames):
+            yield os.path.join(dirpath, name)
+
+
+def iter_matches(pattern, onerror=None):
+    """
+    Generates the names of the files matching the glob pattern, in sorted
+    order, with the files under the matching directories.
+    """
+    import glob
+
+    # like in a shell, a pattern matching nothing is taken as a name
+    for name in sorted(glob.glob(pattern)) or [pattern]:
+        if os.path.isdir(name):
+            for n in iter_directory(name, onerror):
+                yield n
+        else:
+            yield name
+
+
+def expand_path(path, patterns=True, onerror=None):
+    """
+    Returns the names of the files 'path' stands for, as an iterable: the
+    files under it if it is a directory, the files matching it if it is a
+    glob pattern (and 'patterns'), or else itself.
+    """
+    if os.path.isdir(path):
+        return iter_directory(path, onerror)
+    elif patterns and is_pattern(path) and not os.path.exists(path):
+        return iter_matches(path, onerror)
+    else:
+        return [path]
+
+
+def iter_names(f):
+    """
+    Generates the names of a list separated by NUL characters, read from the
+    file-like object f.
+    """
+    rest = ''
+
+    while True:
+        data = f.read(CHUNK_SIZE)
+
+        if not data:
+            break
+
+        names = (rest + data).split('\0')
+        rest = names.pop()
+
+        for name in names:
+            if name:
+                yield name
+
+    if rest:
+        yield rest
@@ -0,0 +1,409 @@
+import sys
+
+from .termactions import AnchorTermAction
+from .fusion import (
+        can_fuse,
+        fuse_actions,
+        )
+
+
+# the profile entry of the records computed again because some term failed
+FAILED_RECORDS_LABEL = '(records with errors, computed again)'
+
+
+class Failure(object):
+    """
+    The error raised while computing a node, kept to be raised again for the
+    terms depending on it.
+    """
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+
+    def raise_again(self):
+        (t, v, tb) = self.exc_info
+        raise t, v, tb
+
+
+class PlanNode(object):
+    """
+    A value computed once per record: a primary anchor (no parent and no
+    action) or the output of an action applied to the value of the parent node.
+    """
+    def __init__(self, index, parent=None, action=None, name=None):
+        self.index = index
+        self.parent = parent
+        self.action = action
+        # the primary anchor's name, for primary anchor nodes
+        self.name = name
+
+
+    @property
+    def is_primary(self):
+        return self.parent is None
+
+
+class PlannedTerm(object):
+    """
+    A term whose value is taken from the values computed by a Plan.
+    """
+    def __init__(self, term, index):
+        self.term = term
+        self._index = index
+
+
+    @property
+    def out_type(self):
+        return self.term.out_type
+
+
+    def execute(self, values):
+        value = values[self._index]
+
+        if isinstance(value, Failure):
+            value.raise_again()
+
+        return value
+
+
+class Chain(object):
+    """
+    The actions of a term or anchor after the anchor reference, from the node
+    of the referenced anchor's value to the node of the chain's value.
+    """
+    def __init__(self, start, actions, end, source=None):
+        self.start = start
+        self.actions = actions
+        self.end = end
+        # the chain of the referenced anchor, if not a primary anchor
+        self.source = source
+
+
+    def execute(self, value):
+        for action in self.actions:
+            value = action.execute(value)
+
+        return value
+
+
+class Plan(object):
+    """
+    Computes the values of a set of terms, and of the secondary anchors they
+    depend on, for a record.
+
+    The actions of the terms and anchors form a DAG: an anchor reference is
+    replaced by the action chain of the definition it refers to, and chains
+    starting with the same actions (with the same arguments) share their
+    nodes, so that every distinct prefix is computed only once per record.
+    Anchors no term depends on are not computed.
+
+    With an ActionProfile, the time spent computing each node is added to
+    the profile, at the location of its action(s).
+    """
+    def __init__(self, terms, anchors_factory, profile=None):
+        self.terms = list(terms)
+        self.anchors_factory = anchors_factory
+        self._profile = profile
+
+        self._nodes = []
+        # (parent index, action key) -> node
+        self._shared = {}
+        # definition index -> chain
+        self._definitions = {}
+
+        self._term_chains = [self._add_chain(t.actions) for t in self.terms]
+
+        self.outputs = [PlannedTerm(t, i) for (i, t) in enumerate(self.terms)]
+
+        self._steps = self._make_steps()
+
+        if profile is None:
+            self._compiled = self._compile()
+        else:
+            self._labels = dict((node.index, self._step_label(node, source)) for (node, source, _) in self._steps if not node.is_primary)
+            self._compiled = self._evaluate_profiled
+
+
+    @property
+    def nodes(self):
+        return list(self._nodes)
+
+
+    def _make_node(self, key, **kwargs):
+        if key is not None and key in self._shared:
+            return self._shared[key]
+
+        node = PlanNode(len(self._nodes), **kwargs)
+        self._nodes.append(node)
+
+        if key is not None:
+            self._shared[key] = node
+
+        return node
+
+
+    def _definition_chain(self, index):
+        if index not in self._definitions:
+            anchor = self.anchors_factory.anchors[index]
+            self._definitions[index] = self._add_chain(anchor.term.actions, index)
+
+        return self._definitions[index]
+
+
+    def _add_chain(self, actions, definition=None):
+        """
+        Adds the nodes computing a chain of actions, for the definition of
+        index 'definition' or, if None, for a term.
+        """
+        if len(actions) == 0:
+            raise ValueError("No actions defined!")
+
+        (first, rest) = (actions[0], actions[1:])
+
+        if not isinstance(first, AnchorTermAction):
+            raise ValueError("Terms must start with an anchor!")
+
+        index = self.anchors_factory.binding(first.anchor, definition)
+
+        if index is None:
+            source = None
+            start = self._make_node(('primary', first.anchor), name=first.anchor)
+        else:
+            source = self._definition_chain(index)
+            start = source.end
+
+        node = start
+
+        for action in rest:
+            if action.key is None:
+                key = None
+            else:
+                key = (node.index, action.key)
+
+            node = self._make_node(key, parent=node, action=action)
+
+        return Chain(start, rest, node, source=source)
+
+
+    def _fused_segments(self):
+        """
+        Finds the chains of nodes computing XPath-expressible actions whose
+        intermediate values are used by nothing else, and fuses them.
+
+        Returns a dict mapping the index of the last node of each fused chain
+        to (node the chain is applied to, fused function), and sets
+        self._inner_nodes to the indexes of the other nodes of the chains.
+        """
+        consumers = [0] * len(self._nodes)
+
+        for node in self._nodes:
+            if not node.is_primary:
+                consumers[node.parent.index] += 1
+
+        for chain in self._term_chains:
+            consumers[chain.end.index] += 1
+
+        fusable = [not n.is_primary and can_fuse(n.action) for n in self._nodes]
+
+        segments = {}
+        self._inner_nodes = set()
+
+        for node in self._nodes:
+            if not fusable[node.index]:
+                continue
+
+            # continued by its only consumer
+            if consumers[node.index] == 1 and any(n.parent is node and fusable[n.index] for n in self._nodes):
+                continue
+
+            chain = [node]
+
+            while fusable[chain[0].parent.index] and consumers[chain[0].parent.index] == 1:
+                chain.insert(0, chain[0].parent)
+
+            # the chain may have to start later, for its first action to be
+            # applied to an element
+            while len(chain) > 1:
+                f = fuse_actions([n.action for n in chain], compose([n.action.compile() for n in chain]))
+
+                if f is not None:
+                    segments[node.index] = (chain[0].parent, f)
+                    self._inner_nodes.update(n.index for n in chain[:-1])
+                    break
+
+                chain.pop(0)
+
+        return segments
+
+
+    def _make_steps(self):
+        """
+        Returns the computation of the nodes, as a list of tuples (node, input
+        node, function), in order; primary anchor nodes have no input and no
+        function, and the inner nodes of fused segments are left out.
+        """
+        segments = self._fused_segments()
+
+        steps = []
+
+        for node in self._nodes:
+            if node.is_primary:
+                steps.append((node, None, None))
+            elif node.index in segments:
+                (start, f) = segments[node.index]
+                steps.append((node, start, f))
+            elif node.index not in self._inner_nodes:
+                steps.append((node, node.parent, node.action.compile()))
+
+        return steps
+
+
+    def _step_label(self, node, source):
+        from .profiler import describe_actions
+
+        actions = []
+
+        while node is not source:
+            actions.insert(0, node.action)
+            node = node.parent
+
+        return describe_actions(actions)
+
+
+    def _compile(self):
+        """
+        Generates a function computing all nodes in order, or calling
+        evaluate_slowly if any of them raises.
+        """
+        namespace = {'evaluate_slowly': self.evaluate_slowly}
+
+        lines = [
+                'def evaluate(primary):',
+                '    try:',
+                ]
+
+        for (node, source, f) in self._steps:
+            if node.is_primary:
+                lines.append('        v%d = primary[%r]' % (node.index, node.name))
+            else:
+                namespace['f%d' % (node.index,)] = f
+                lines.append('        v%d = f%d(v%d)' % (node.index, node.index, source.index))
+
+        lines.extend([
+                '    except Exception:',
+                '        return evaluate_slowly(primary)',
+                '    return [%s]' % (', '.join('v%d' % (c.end.index,) for c in self._term_chains),),
+                ])
+
+        exec compile('\n'.join(lines), '<plan>', 'exec') in namespace
+
+        return namespace['evaluate']
+
+
+    def evaluate(self, primary_values):
+        """
+        Returns the values of the terms for the record with the given primary
+        anchors values, as a list to be passed to the execute method of the
+        planned terms.
+        """
+        return self._compiled(primary_values)
+
+
+    def _evaluate_profiled(self, primary_values):
+        values = [None] * len(self._nodes)
+        # indexes of the nodes that could not be computed
+        failed = set()
+
+        for (node, source, f) in self._steps:
+            if node.is_primary:
+                if node.name in primary_values:
+                    values[node.index] = primary_values[node.name]
+                else:
+                    failed.add(node.index)
+            elif source.index in failed:
+                failed.add(node.index)
+            else:
+                try:
+                    values[node.index] = self._profile.time(self._labels[node.index], 1, f, values[source.index])
+                except Exception:
+                    failed.add(node.index)
+
+        if len(failed) > 0:
+            return self._profile.time(FAILED_RECORDS_LABEL, 1, self.evaluate_slowly, primary_values)
+
+        return [values[c.end.index] for c in self._term_chains]
+
+
+    def evaluate_slowly(self, primary_values):
+        """
+        Like evaluate, but executing the actions one by one; the terms whose
+        value cannot be computed, or which depend on an anchor whose value
+        cannot be computed, get a Failure.
+
+        Since a node computes the shared prefix of several chains, the chains
+        which fail are executed again on their own, so that errors are
+        reported with the identification of their own failing action.
+        """
+        values = [None] * len(self._nodes)
+
+        for node in self._nodes:
+            if node.is_primary:
+                try:
+                    value = primary_values[node.name]
+                except KeyError:
+                    value = Failure(sys.exc_info())
+            else:
+                value = values[node.parent.index]
+
+                if not isinstance(value, Failure):
+                    try:
+                        value = node.action.execute(value)
+                    except Exception:
+                        value = Failure(sys.exc_info())
+
+            values[node.index] = value
+
+        failures = {}
+
+        return [self._execute_chain(c, values, failures) for c in self._term_chains]
+
+
+    def _execute_chain(self, chain, values, failures):
+        value = values[chain.end.index]
+
+        if not isinstance(value, Failure):
+            return value
+
+        if chain in failures:
+            return failures[chain]
+
+        start = values[chain.start.index]
+
+        if isinstance(start, Failure):
+            if chain.source is not None:
+                value = self._execute_chain(chain.source, values, failures)
+            else:
+                value = start
+        else:
+            try:
+                value = chain.execute(start)
+            except Exception:
+                value = Failure(sys.exc_info())
+
+        failures[chain] = value
+
+        return value
+
+
+def compose(functions):
+    def composed(value):
+        for f in functions:
+            value = f(value)
+
+        return value
+
+    return composed
+
+
+def make_plan(terms, anchors_factory, profile=None):
+    return Plan(terms, anchors_factory, profile=profile)
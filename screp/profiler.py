@@ -0,0 +1,117 @@
+import re
+import time
+
+
+# integer arguments, written without quotes
+integer_arg_re = re.compile(r'^-?[0-9]+$')
+
+
+def describe_arg(arg):
+    if integer_arg_re.match(arg):
+        return arg
+    else:
+        return '"%s"' % (arg,)
+
+
+def describe_action(action):
+    """
+    Returns the action as written in the specification, like 'desc(".price")'.
+    """
+    if action.identification is not None:
+        name = action.identification.name
+    else:
+        name = action.name
+
+    if action.key is None or len(action.key) == 1:
+        return str(name)
+    else:
+        return '%s(%s)' % (name, ', '.join(describe_arg(a) for a in action.key[1:]))
+
+
+def describe_actions(actions):
+    """
+    Returns the location of a chain of actions and the chain as written in
+    the specification, like 'csv_format:17 desc(".price").first'.
+    """
+    identification = actions[0].identification
+
+    if identification is not None:
+        location = str(identification.location)
+    else:
+        location = '?'
+
+    return '%s %s' % (location, '.'.join(describe_action(a) for a in actions))
+
+
+class ProfileEntry(object):
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+        self.time = 0.0
+
+
+class ActionProfile(object):
+    """
+    Collects the time spent computing each action (or chain of actions
+    computed together), with the number of values computed.
+    """
+    def __init__(self):
+        # label -> entry
+        self._entries = {}
+
+
+    def time(self, label, calls, f, *args):
+        """
+        Calls f with args, adding its time to the entry 'label', which
+        computes 'calls' values.
+        """
+        start = time.time()
+
+        try:
+            return f(*args)
+        finally:
+            elapsed = time.time() - start
+
+            try:
+                entry = self._entries[label]
+            except KeyError:
+                entry = self._entries[label] = ProfileEntry(label)
+
+            entry.calls += calls
+            entry.time += elapsed
+
+
+    def entries(self):
+        """
+        Returns the entries, by decreasing time.
+        """
+        return sorted(self._entries.values(), key=lambda e: e.time, reverse=True)
+
+
+    def report(self):
+        """
+        Returns the calls and time of each entry, by label, for the --stats
+        report.
+        """
+        return dict((e.label, {'calls': e.calls, 'wall': round(e.time, 6)}) for e in self.entries())
+
+
+    def write_report(self, stream):
+        entries = self.entries()
+
+        total = sum(e.time for e in entries)
+
+        stream.write('%7s %10s %10s %10s  %s\n' % ('%time', 'seconds', 'calls', 'us/call', 'action'))
+
+        for e in entries:
+            if total > 0:
+                share = 100.0 * e.time / total
+            else:
+                share = 0.0
+
+            if e.calls > 0:
+                per_call = 1e6 * e.time / e.calls
+            else:
+                per_call = 0.0
+
+            stream.write('%6.2f%% %10.4f %10d %10.2f  %s\n' % (share, e.time, e.calls, per_call, e.label))
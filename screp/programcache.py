@@ -0,0 +1,94 @@
+import errno
+import hashlib
+import os
+import cPickle as pickle
+
+from .parsed import CompiledProgram
+
+
+# changed whenever the saved programs change meaning
+CACHE_VERSION = 2
+
+# the modules defining the saved programs (the classes pickled, the parsing of
+# the formats and the translations of the selectors); the programs saved with
+# other versions of them are not loaded
+PROGRAM_MODULES = ['parsed.py', 'term_parser.py', 'format_parsers.py', 'translators.py']
+
+# the hash of the sources of PROGRAM_MODULES, once computed
+_sources_hash = None
+
+
+def sources_hash():
+    global _sources_hash
+
+    if _sources_hash is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        h = hashlib.sha1()
+
+        for name in PROGRAM_MODULES:
+            try:
+                with open(os.path.join(directory, name), 'rb') as f:
+                    h.update(f.read())
+            except IOError:
+                # installed without its sources: only CACHE_VERSION tells
+                pass
+
+        _sources_hash = h.hexdigest()
+
+    return _sources_hash
+
+
+def program_key(*parts):
+    """
+    Returns the key of the program compiled from the given options.
+    """
+    return hashlib.sha1(repr((CACHE_VERSION, sources_hash()) + parts)).hexdigest()
+
+
+class ProgramCache(object):
+    """
+    An on-disk cache of compiled programs, one pickle file per key.
+
+    Unreadable entries are ignored, as if missing: the program is then
+    compiled and saved again.
+    """
+    def __init__(self, directory):
+        self._directory = directory
+
+
+    def _path(self, key):
+        return os.path.join(self._directory, key + '.pickle')
+
+
+    def load(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                program = pickle.load(f)
+        except Exception:
+            return None
+
+        if not isinstance(program, CompiledProgram):
+            return None
+
+        return program
+
+
+    def store(self, key, program):
+        import tempfile
+
+        try:
+            os.makedirs(self._directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        (fd, tmp_path) = tempfile.mkstemp(dir=self._directory, prefix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(program, f, pickle.HIGHEST_PROTOCOL)
+
+            os.rename(tmp_path, self._path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
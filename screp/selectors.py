@@ -0,0 +1,470 @@
+"""
+Selectors made of tag names, ids and classes, with descendant and child
+combinators ('tr.row', 'div#main', 'ul > li.item a'), are common and are cheaper
+to evaluate with lxml's iterators than with the XPath expressions cssselect
+translates them to, which test classes with string functions. Those are
+evaluated here; the others are translated to XPath as usual.
+
+While a document is indexed (see docindex.py), the selectors don't compute
+again the result they just did, and those whose target has an id look it up
+in the index.
+"""
+import re
+
+from lxml.etree import (
+        XPath,
+        Element,
+        )
+
+from .utils import (
+        translate_css,
+        CachedCSSSelector,
+        )
+from .docindex import (
+        current_index,
+        memoized,
+        )
+
+
+# cssselect identifiers, without escapes nor non-ASCII characters
+tag_re = re.compile(r'\*|[A-Za-z][A-Za-z0-9_-]*')
+qualifier_re = re.compile(r'([#.])(-?[A-Za-z_][A-Za-z0-9_-]*)')
+combinator_re = re.compile(r'\s*>\s*|\s+')
+
+# the whitespace normalize-space separates classes on
+class_split_re = re.compile(r'[ \t\r\n]+')
+
+
+def make_class_test(classes):
+    """
+    Returns a function testing whether an element has all the classes.
+    """
+    split = class_split_re.split
+
+    # the substring tests come first, since they are cheaper
+    if len(classes) == 1:
+        (c,) = classes
+
+        def test(element):
+            value = element.get('class')
+
+            return value is not None and c in value and c in split(value)
+    else:
+        def test(element):
+            value = element.get('class')
+
+            if value is None:
+                return False
+
+            for c in classes:
+                if c not in value:
+                    return False
+
+            tokens = split(value)
+
+            for c in classes:
+                if c not in tokens:
+                    return False
+
+            return True
+
+    return test
+
+
+def make_id_test(ids):
+    if len(set(ids)) > 1:
+        return lambda element: False
+
+    i = ids[0]
+
+    return lambda element: element.get('id') == i
+
+
+class Compound(object):
+    """
+    A sequence of simple selectors: a tag name or *, ids and classes.
+    """
+    def __init__(self, tag, ids, classes):
+        self.tag = tag
+        self.ids = ids
+        self.classes = classes
+
+        # what iterators are given to select elements with the tag
+        if tag is None:
+            self.iter_tag = Element
+        else:
+            self.iter_tag = tag
+
+        # tests whether an element having the tag matches; None if all do
+        if ids and classes:
+            id_test = make_id_test(ids)
+            class_test = make_class_test(classes)
+
+            self.test = lambda element: id_test(element) and class_test(element)
+        elif ids:
+            self.test = make_id_test(ids)
+        elif classes:
+            self.test = make_class_test(classes)
+        else:
+            self.test = None
+
+
+    def matches(self, element):
+        """
+        Whether any element matches.
+        """
+        if self.tag is not None and element.tag != self.tag:
+            return False
+
+        return self.test is None or self.test(element)
+
+
+def parse_compound(css, pos):
+    """
+    Returns (Compound, end position), or None if there is no compound at pos.
+    """
+    tag = None
+    ids = []
+    classes = []
+
+    m = tag_re.match(css, pos)
+
+    if m is not None:
+        if m.group() != '*':
+            tag = m.group()
+
+        pos = m.end()
+    elif qualifier_re.match(css, pos) is None:
+        return None
+
+    while True:
+        m = qualifier_re.match(css, pos)
+
+        if m is None:
+            break
+
+        if m.group(1) == '#':
+            ids.append(m.group(2))
+        else:
+            classes.append(m.group(2))
+
+        pos = m.end()
+
+    return (Compound(tag, tuple(ids), tuple(classes)), pos)
+
+
+def parse_simple_selector(css):
+    """
+    Returns (compounds, combinators) if css is a simple selector, None
+    otherwise. The combinators (' ' or '>') are between the compounds.
+    """
+    css = css.strip()
+
+    compounds = []
+    combinators = []
+    pos = 0
+
+    while True:
+        parsed = parse_compound(css, pos)
+
+        if parsed is None:
+            return None
+
+        (compound, pos) = parsed
+        compounds.append(compound)
+
+        if pos == len(css):
+            return (compounds, combinators)
+
+        m = combinator_re.match(css, pos)
+
+        if m is None:
+            return None
+
+        combinators.append(m.group().strip() or ' ')
+        pos = m.end()
+
+
+class SimpleSelector(object):
+    """
+    Selects the elements matching a simple selector among the descendants of
+    an element and the element itself, in document order, like the
+    translation of the selector would.
+    """
+    def __init__(self, css, compounds, combinators):
+        self.css = css
+
+        self._target = compounds[-1]
+        # the compounds and combinators left of the target, right to left
+        self._left = zip(reversed(compounds[:-1]), reversed(combinators))
+
+        # identifies the results of first in the index
+        self._first_key = (self, 'first')
+
+
+    def _matches_left(self, element, context, i):
+        # whether element, which matches the compound right of self._left[i],
+        # has the ancestors matching the rest; they must be the context
+        # element or its descendants
+        if i == len(self._left):
+            return True
+
+        (compound, combinator) = self._left[i]
+
+        while element is not context:
+            element = element.getparent()
+
+            if compound.matches(element) and self._matches_left(element, context, i + 1):
+                return True
+
+            if combinator == '>':
+                break
+
+        return False
+
+
+    def _make_test(self, context, test):
+        """
+        Returns the test of the elements passing 'test' (a test of the target
+        compound, or None if they all do), or None if they all match.
+        """
+        if not self._left:
+            return test
+
+        if self._left == [(self._left[0][0], '>')]:
+            # the parent of a strict descendant of the context is always the
+            # context or one of its descendants
+            parent_matches = self._left[0][0].matches
+
+            matches_left = lambda e: parent_matches(e.getparent())
+        else:
+            matches_left = lambda e: self._matches_left(e, context, 0)
+
+        # the target is a strict descendant of the context
+        if test is None:
+            return lambda e: e is not context and matches_left(e)
+        else:
+            return lambda e: test(e) and e is not context and matches_left(e)
+
+
+    def _select(self, element):
+        test = self._make_test(element, self._target.test)
+        elements = element.iter(self._target.iter_tag)
+
+        if test is None:
+            return list(elements)
+        else:
+            return filter(test, elements)
+
+
+    def _first(self, element):
+        # the first selected element, or None
+        test = self._make_test(element, self._target.test)
+
+        for e in element.iter(self._target.iter_tag):
+            if test is None or test(e):
+                return e
+
+        return None
+
+
+    def _candidates(self, index, element):
+        """
+        Returns the elements of the document among which the selected ones are,
+        in document order, or None if the descendants of the element are to be
+        searched instead.
+        """
+        target = self._target
+
+        if target.ids:
+            if index.contains(element):
+                return index.elements('id', target.ids[0])
+            else:
+                return None
+
+        # the other lists span the whole document, which only the root
+        # searches anyway
+        if element is not index.root:
+            return None
+
+        if target.tag is not None:
+            return index.elements('tag', target.tag)
+        elif target.classes:
+            return index.elements('class', target.classes[0])
+        else:
+            return None
+
+
+    def _select_indexed(self, index, element):
+        candidates = self._candidates(index, element)
+
+        if candidates is None:
+            return self._select(element)
+
+        if element is not index.root:
+            candidates = [c for c in candidates if c is element or element in c.iterancestors()]
+
+        return filter(self._make_test(element, self._target.matches), candidates)
+
+
+    def __call__(self, element):
+        index = current_index()
+
+        if index is None:
+            return self._select(element)
+
+        # as index.memoize does, without making a function
+        last = index.results.get(self)
+
+        if last is not None and last[0] is element:
+            return last[1]
+
+        result = self._select_indexed(index, element)
+        index.results[self] = (element, result)
+
+        return result
+
+
+    def first(self, element):
+        index = current_index()
+
+        if index is None:
+            e = self._first(element)
+        elif self._target.ids or element is index.root:
+            # from the lists of the index
+            result = self(element)
+            e = result[0] if result else None
+        else:
+            e = index.memoize(self._first_key, element, self._first)
+
+        if e is None:
+            raise IndexError('list index out of range')
+
+        return e
+
+
+    def __repr__(self):
+        return '<%s for %r>' % (self.__class__.__name__, self.css)
+
+
+class IdSelector(SimpleSelector):
+    """
+    A SimpleSelector whose target has an id but no tag. Outside indexed
+    documents, every element would be tested in Python, which costs more than
+    testing the id in XPath.
+    """
+    def __init__(self, css, compounds, combinators):
+        SimpleSelector.__init__(self, css, compounds, combinators)
+
+        self._xpath = CachedCSSSelector(css)
+
+
+    def _select(self, element):
+        return self._xpath(element)
+
+
+    def _first(self, element):
+        result = self._xpath(element)
+
+        if result:
+            return result[0]
+        else:
+            return None
+
+
+class AxisSelector(object):
+    """
+    Selects the elements matching a compound on an axis of an element, in
+    document order.
+    """
+    # axis -> (method of the element, arguments, whether in reverse
+    # document order)
+    axes = {
+            'child::': ('iterchildren', {}, False),
+            'ancestor::': ('iterancestors', {}, True),
+            'following-sibling::': ('itersiblings', {}, False),
+            'preceding-sibling::': ('itersiblings', {'preceding': True}, True),
+            }
+
+    def __init__(self, css, compound, axis):
+        self.css = css
+
+        self._compound = compound
+        (self._method, self._kwargs, self._reverse) = self.axes[axis]
+
+
+    def _select(self, element):
+        test = self._compound.test
+
+        elements = getattr(element, self._method)(self._compound.iter_tag, **self._kwargs)
+
+        if test is None:
+            result = list(elements)
+        else:
+            result = filter(test, elements)
+
+        if self._reverse:
+            result.reverse()
+
+        return result
+
+
+    def __call__(self, element):
+        return memoized(self, element, self._select)
+
+
+    def __repr__(self):
+        return '<%s for %r>' % (self.__class__.__name__, self.css)
+
+
+class SelfSelector(object):
+    """
+    Selects an element if it matches a compound.
+    """
+    def __init__(self, css, compound):
+        self.css = css
+
+        self._compound = compound
+
+
+    def __call__(self, element):
+        if isinstance(element.tag, basestring) and self._compound.matches(element):
+            return [element]
+        else:
+            return []
+
+
+def make_css_selector(css):
+    """
+    Returns a selector of the elements matching css among the descendants of
+    an element and the element itself.
+    """
+    parsed = parse_simple_selector(css)
+
+    if parsed is None:
+        return CachedCSSSelector(css)
+
+    (compounds, combinators) = parsed
+
+    if compounds[-1].tag is None and compounds[-1].ids:
+        return IdSelector(css, compounds, combinators)
+
+    return SimpleSelector(css, compounds, combinators)
+
+
+def make_axis_selector(css, axis):
+    """
+    Returns a selector of the elements matching css on an axis (given as an
+    XPath axis prefix, like 'child::') of an element.
+    """
+    parsed = parse_simple_selector(css)
+
+    if parsed is not None and len(parsed[0]) == 1:
+        compound = parsed[0][0]
+
+        if axis in AxisSelector.axes:
+            return AxisSelector(css, compound, axis)
+        elif axis == 'self::':
+            return SelfSelector(css, compound)
+
+    return XPath(translate_css(css, prefix=axis))
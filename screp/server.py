@@ -0,0 +1,363 @@
+"""
+The daemon mode (--serve): the program is compiled once, then documents sent
+over a Unix socket are scraped with it.
+
+Each connection is served by a process forked from the server, which reads
+requests until the client closes the connection. A request is either:
+
+    FILE <path>\\n                   a file, read by the server
+    DATA <size>\\n<size bytes>        the document itself
+
+The response is the output of screp for the document, in chunks, followed by
+the status of the request:
+
+    DATA <size>\\n<size bytes>        a part of the output
+    OK\\n                             the end of the output
+    ERROR <message>\\n                the error that stopped the request
+"""
+import errno
+import os
+import signal
+import socket
+import stat
+import SocketServer
+
+from .source import (
+        DataSource,
+        FileDataSource,
+        )
+
+
+# the name of the documents sent in DATA requests
+DATA_SOURCE_NAME = 'DATA'
+
+# seconds a connection may stay idle before it is closed
+IDLE_TIMEOUT = 300
+
+# seconds between checks for a shutdown request
+POLL_INTERVAL = 0.5
+
+# the longest request line read
+MAX_LINE_SIZE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ServerError(Exception):
+    """
+    The error response to a request.
+    """
+    pass
+
+
+def read_line(rfile):
+    """
+    Returns a line without its end, or None at the end of the stream.
+    """
+    line = rfile.readline(MAX_LINE_SIZE + 1)
+
+    if line == '':
+        return None
+
+    if not line.endswith('\n'):
+        raise ProtocolError('Line too long or truncated!')
+
+    return line[:-1]
+
+
+def read_chunk(rfile, argument):
+    try:
+        size = int(argument)
+    except ValueError:
+        raise ProtocolError('Invalid size: %s!' % (argument,))
+
+    if size < 0:
+        raise ProtocolError('Invalid size: %s!' % (argument,))
+
+    data = rfile.read(size)
+
+    if len(data) != size:
+        raise ProtocolError('Truncated data!')
+
+    return data
+
+
+def split_line(line):
+    parts = line.split(' ', 1)
+
+    if len(parts) != 2:
+        return (line, None)
+    else:
+        return tuple(parts)
+
+
+def read_request(rfile):
+    """
+    Returns the data source of the next request, or None at the end of the
+    stream.
+    """
+    line = read_line(rfile)
+
+    if line is None:
+        return None
+
+    return read_request_source(line, rfile)
+
+
+def read_request_source(line, rfile):
+    """
+    Returns the data source of a request, given its first line.
+    """
+    (command, argument) = split_line(line)
+
+    if command == 'FILE' and argument:
+        return FileDataSource(argument)
+    elif command == 'DATA' and argument is not None:
+        return DataSource(DATA_SOURCE_NAME, read_chunk(rfile, argument))
+    else:
+        raise ProtocolError('Invalid request: %r!' % (line[:80],))
+
+
+def write_error(wfile, e):
+    # the message must fit on one line
+    wfile.write('ERROR %s\n' % (' '.join(str(e).split()),))
+
+
+class ChunkedStream(object):
+    """
+    Writes what is written to it as DATA chunks of a response.
+    """
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+
+    def write(self, s):
+        if len(s) > 0:
+            self._wfile.write('DATA %d\n' % (len(s),))
+            self._wfile.write(s)
+
+
+    def flush(self):
+        self._wfile.flush()
+
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    timeout = IDLE_TIMEOUT
+
+
+    def handle(self):
+        # after a shutdown request, the current request is finished, then
+        # the connection is closed
+        while True:
+            self.server.idle_connection = self.connection
+
+            if self.server.stopping:
+                return
+
+            try:
+                line = read_line(self.rfile)
+                self.server.idle_connection = None
+
+                if line is None:
+                    return
+
+                source = read_request_source(line, self.rfile)
+            except ProtocolError as e:
+                write_error(self.wfile, e)
+                return
+            except socket.error:
+                # idle for too long, or closed by the client
+                return
+
+            try:
+                self.server.scrape(source, ChunkedStream(self.wfile))
+            except socket.error:
+                return
+            except Exception as e:
+                write_error(self.wfile, e)
+            else:
+                self.wfile.write('OK\n')
+
+
+def remove_stale_socket(path):
+    """
+    Removes the socket file at path if no server listens on it anymore.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise ValueError('Not a socket: %s!' % (path,))
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        s.connect(path)
+    except socket.error as e:
+        if e.errno != errno.ECONNREFUSED:
+            raise
+
+        os.unlink(path)
+    else:
+        raise ValueError('A server already listens on %s!' % (path,))
+    finally:
+        s.close()
+
+
+class ScrepServer(SocketServer.ForkingMixIn, SocketServer.UnixStreamServer):
+    """
+    Serves requests with scrape(source, stream), which writes the output for
+    the source to stream. At most max_connections connections are served at
+    once; the others wait to be accepted.
+
+    SIGTERM and SIGINT stop the server: it stops accepting connections, lets
+    the requests being served finish, closing the connections, then removes
+    its socket.
+    """
+    def __init__(self, path, scrape, max_connections):
+        self.scrape = scrape
+        self.max_children = max_connections
+        self.stopping = False
+        # in the process serving a connection, the connection while waiting
+        # for a request
+        self.idle_connection = None
+        self.timeout = POLL_INTERVAL
+
+        remove_stale_socket(path)
+
+        SocketServer.UnixStreamServer.__init__(self, path, RequestHandler)
+
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+        if self.idle_connection is not None:
+            # ends the wait for a request
+            try:
+                self.idle_connection.shutdown(socket.SHUT_RD)
+            except socket.error:
+                pass
+
+
+    def serve_until_stopped(self):
+        handlers = dict((s, signal.signal(s, self.stop)) for s in [signal.SIGTERM, signal.SIGINT])
+
+        try:
+            while not self.stopping:
+                self.handle_request()
+
+            self.wait_children()
+        finally:
+            for (s, handler) in handlers.items():
+                signal.signal(s, handler)
+
+            self.server_close()
+
+
+    def collect_children(self):
+        # like ForkingMixIn.collect_children, but the wait for a connection to
+        # be closed, at max_children, ends when the server is stopped
+        while (self.active_children and len(self.active_children) >= self.max_children
+                and not self.stopping):
+            try:
+                (pid, _) = os.waitpid(-1, 0)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                elif e.errno == errno.ECHILD:
+                    self.active_children.clear()
+
+                break
+
+            self.active_children.discard(pid)
+
+        for pid in list(self.active_children or []):
+            try:
+                (pid, _) = os.waitpid(pid, os.WNOHANG)
+            except OSError as e:
+                if e.errno != errno.ECHILD:
+                    raise
+
+                self.active_children.discard(pid)
+                continue
+
+            if pid:
+                self.active_children.discard(pid)
+
+
+    def wait_children(self):
+        children = list(self.active_children or [])
+
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+        for pid in children:
+            while True:
+                try:
+                    os.waitpid(pid, 0)
+                except OSError as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    elif e.errno != errno.ECHILD:
+                        raise
+
+                break
+
+            self.active_children.discard(pid)
+
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def request(path, source=None, data=None):
+    """
+    Sends a request for a file (source) or a document (data) to the server
+    listening on path; returns the output, or raises ServerError.
+    """
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        s.connect(path)
+
+        if data is not None:
+            s.sendall('DATA %d\n%s' % (len(data), data))
+        else:
+            s.sendall('FILE %s\n' % (source,))
+
+        return read_response(s.makefile('rb'))
+    finally:
+        s.close()
+
+
+def read_response(rfile):
+    chunks = []
+
+    while True:
+        line = read_line(rfile)
+
+        if line is None:
+            raise ServerError('Connection closed!')
+
+        (status, argument) = split_line(line)
+
+        if status == 'DATA':
+            chunks.append(read_chunk(rfile, argument))
+        elif status == 'OK':
+            return ''.join(chunks)
+        elif status == 'ERROR':
+            raise ServerError(argument)
+        else:
+            raise ProtocolError('Invalid response: %r!' % (line[:80],))
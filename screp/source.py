@@ -1,63 +1,124 @@
-import urllib2
+import StringIO
+
+
+def is_url(source):
+    """
+    Returns whether a source given on the command line is a URL rather than a
+    file name.
+    """
+    # most sources are file names, which need no parsing
+    if ':' not in source:
+        return False
+
+    import urlparse
+
+    return urlparse.urlparse(source).scheme != ''
 
 
 class BaseDataSource(object):
     name = 'Unknown'
+    # whether reading the data can be done ahead of time, by a fetcher thread
+    prefetchable = False
+    # whether the source can be passed to, and read by, another process
+    portable = True
+    # whether the data is better parsed as it is read from open_data, than
+    # read as a whole first
+    streamable = False
 
     def read_data(self):
         pass
 
 
-class OpenedFileDataSource(object):
+    def open_data(self):
+        """
+        Returns a file-like object from which the data can be read
+        incrementally.
+        """
+        return StringIO.StringIO(self.read_data())
+
+
+class OpenedFileDataSource(BaseDataSource):
+    portable = False
+
     def __init__(self, name, ofile):
         self._file = ofile
         self.name = name
 
 
     def read_data(self):
-        return self._file.read()
+        return self.open_data().read()
+
+
+    def open_data(self):
+        from .compression import open_decompressed
+
+        return open_decompressed(self._file)
+
 
+class URLDataSource(BaseDataSource):
+    prefetchable = True
 
-class URLDataSource(object):
-    def __init__(self, url, user_agent=None, proxy=True):
+    def __init__(self, url, user_agent=None, proxy=True, client=None):
         self._url = url
         self.name = url
         self._user_agent = user_agent
         self._proxy = proxy
+        self._client = client
 
 
-    def _make_request(self):
-        request = urllib2.Request(self._url)
+    def _make_headers(self):
+        headers = {}
         if self._user_agent is not None:
-            request.add_header('User-Agent', self._user_agent)
+            headers['User-Agent'] = self._user_agent
 
-        return request
+        return headers
 
 
-    def _setup_urllib(self):
-        if self._proxy:
-            proxy_opener = urllib2.ProxyHandler()
-        else:
-            proxy_opener = urllib2.ProxyHandler({})
-        urllib2.install_opener(urllib2.build_opener(proxy_opener))
-        
+    def read_data(self):
+        client = self._client
+        if client is None:
+            from .httpclient import get_default_client
+
+            client = get_default_client()
+
+        return client.fetch(self._url, headers=self._make_headers(), proxy=self._proxy)
+
+
+class DataSource(BaseDataSource):
+    """
+    A document given as a string.
+    """
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
 
     def read_data(self):
-        self._setup_urllib()
-        request = self._make_request()
-        data = urllib2.urlopen(request).read()
+        return self._data
 
-        return data
 
+class FileDataSource(BaseDataSource):
+    # lxml reads files in small chunks, so that large files are never held
+    # whole in memory next to their tree
+    streamable = True
 
-class FileDataSource(object):
     def __init__(self, fname):
         self._fname = fname
         self.name = fname
 
 
     def read_data(self):
-        with open(self._fname, 'r') as f:
+        f = self.open_data()
+
+        try:
             return f.read()
+        finally:
+            f.close()
+
+
+    def open_data(self):
+        from .compression import open_decompressed
+
+        return open_decompressed(open(self._fname, 'rb'))
 
 
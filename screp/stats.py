@@ -0,0 +1,158 @@
+import time
+
+
+class StageTimes(object):
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+
+    def report(self):
+        return {
+                'calls': self.calls,
+                'wall': round(self.wall, 6),
+                'cpu': round(self.cpu, 6),
+                }
+
+
+class Stats(object):
+    """
+    Collects the wall and CPU times spent in the stages of a run, and
+    counters.
+
+    The time of a stage doesn't include the time of the stages timed while it
+    runs, so that the times of all stages add up to at most the time of the
+    run.
+    """
+    def __init__(self):
+        self._stages = {}
+        self._counters = {}
+        # the (wall, cpu) time of the stages nested in each running stage
+        self._nested = []
+        self._start = (time.time(), time.clock())
+        # name -> report of a part of the run, added as it is
+        self._sections = {}
+
+
+    def _stage(self, stage):
+        try:
+            return self._stages[stage]
+        except KeyError:
+            times = self._stages[stage] = StageTimes()
+            return times
+
+
+    def time(self, stage, f, *args):
+        """
+        Calls f with args, timing the call as part of 'stage'.
+        """
+        self._nested.append([0.0, 0.0])
+
+        (wall, cpu) = (time.time(), time.clock())
+
+        try:
+            return f(*args)
+        finally:
+            (wall, cpu) = (time.time() - wall, time.clock() - cpu)
+
+            nested = self._nested.pop()
+
+            times = self._stage(stage)
+            times.calls += 1
+            times.wall += wall - nested[0]
+            times.cpu += cpu - nested[1]
+
+            if len(self._nested) > 0:
+                self._nested[-1][0] += wall
+                self._nested[-1][1] += cpu
+
+
+    def timed(self, stage, f):
+        """
+        Returns a function calling f, timed as part of 'stage'.
+        """
+        def timed_f(*args):
+            return self.time(stage, f, *args)
+
+        return timed_f
+
+
+    def timed_iter(self, stage, iterable):
+        """
+        Generates the items of an iterable, timing the computation of each
+        item as part of 'stage'.
+        """
+        iterator = iter(iterable)
+
+        while True:
+            try:
+                item = self.time(stage, iterator.next)
+            except StopIteration:
+                return
+
+            yield item
+
+
+    def count(self, counter, n=1):
+        self._counters[counter] = self._counters.get(counter, 0) + n
+
+
+    def add_section(self, name, report):
+        self._sections[name] = report
+
+
+    def report(self):
+        (wall, cpu) = (time.time() - self._start[0], time.clock() - self._start[1])
+
+        report = {
+                'wall': round(wall, 6),
+                'cpu': round(cpu, 6),
+                'stages': dict((name, times.report()) for (name, times) in self._stages.items()),
+                'counters': dict(self._counters),
+                }
+        report.update(self._sections)
+
+        return report
+
+
+    def write_report(self, stream):
+        import json
+
+        json.dump(self.report(), stream, indent=4, sort_keys=True, separators=(',', ': '))
+        stream.write('\n')
+
+
+class TimedStream(object):
+    """
+    A file-like object reading from or writing to a stream, timing the reads
+    and writes as stage 'stage' and counting the bytes in counter 'counter'.
+    """
+    def __init__(self, stream, stats, stage='output', counter='bytes_out'):
+        self._stream = stream
+        self._stats = stats
+        self._stage = stage
+        self._counter = counter
+
+
+    def read(self, size=-1):
+        data = self._stats.time(self._stage, self._stream.read, size)
+        self._stats.count(self._counter, len(data))
+        return data
+
+
+    def write(self, s):
+        self._stats.count(self._counter, len(s))
+        self._stats.time(self._stage, self._stream.write, s)
+
+
+    def flush(self):
+        self._stats.time(self._stage, self._stream.flush)
+
+
+    def isatty(self):
+        return self._stream.isatty()
+
+
+    def close(self):
+        self._stream.close()
@@ -0,0 +1,306 @@
+from bisect import insort
+
+import lxml.etree as etree
+from lxml.etree import XPath
+
+from .termactions import AnchorTermAction
+from .utils import (
+        translate_css,
+        preprocess_selector,
+        )
+
+
+# How far above the primary anchor the terms can look determines how much of
+# a document must be kept while streaming it. Heights are counted in levels
+# above the primary anchor: the value of a term at height h lies in the
+# subtree of the h-th ancestor of the primary anchor; None means anywhere in
+# the document.
+
+# actions whose value may lie one level higher than their input
+climbing_actions = frozenset(['parent', 'siblings', 'fsiblings', 'psiblings'])
+
+# actions whose value may lie anywhere above their input
+unbounded_actions = frozenset(['ancestors'])
+
+# how much of a document is read at a time
+CHUNK_SIZE = 64 * 1024
+# feed data even without a tag boundary in it, beyond this size
+MAX_UNCUT_SIZE = 16 * CHUNK_SIZE
+
+# primary anchors heights; '@' is the document root
+primary_anchors_heights = {
+        '$': 0,
+        '@': None,
+        }
+
+
+def max_height(h1, h2):
+    if h1 is None or h2 is None:
+        return None
+    else:
+        return max(h1, h2)
+
+
+def term_reach(term, anchors_heights):
+    """
+    Returns a tuple (reach, height), where 'reach' is the highest level the
+    term looks at and 'height' the level of its value.
+    """
+    height = 0
+    reach = 0
+
+    for action in term.actions:
+        if isinstance(action, AnchorTermAction):
+            # getting an anchor's value doesn't look at the document
+            height = anchors_heights.get(action.anchor)
+            continue
+
+        # an action looks at its input and at its output
+        reach = max_height(reach, height)
+
+        if height is None:
+            continue
+
+        if action.name in climbing_actions:
+            height += 1
+        elif action.name in unbounded_actions:
+            height = None
+
+        reach = max_height(reach, height)
+
+    return (reach, height)
+
+
+def program_reach(terms, anchors_factory):
+    """
+    Returns how many levels above the primary anchor the terms and the
+    secondary anchors can look, or None if they can look anywhere.
+    """
+    heights = dict(primary_anchors_heights)
+
+    reach = 0
+
+    for anchor in anchors_factory.anchors:
+        (anchor_reach, height) = term_reach(anchor.term, heights)
+
+        reach = max_height(reach, anchor_reach)
+
+        if anchor.name in heights:
+            # a redefined anchor may still be referenced through an earlier definition
+            heights[anchor.name] = max_height(heights[anchor.name], height)
+        else:
+            heights[anchor.name] = height
+
+    for term in terms:
+        reach = max_height(reach, term_reach(term, heights)[0])
+
+    return reach
+
+
+def iter_parse_events(stream, chunk_size=CHUNK_SIZE):
+    """
+    Parses an HTML document from a file-like object in chunks, generating the
+    ('start', element) and ('end', element) events.
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'), remove_blank_text=True)
+
+    rest = ''
+
+    while True:
+        data = stream.read(chunk_size)
+
+        if not data:
+            break
+
+        data = rest + data
+
+        # libxml2's HTML push parser may stall when a chunk ends inside a
+        # tag, so chunks are cut after the last tag end
+        cut = data.rfind('>') + 1
+
+        if cut == 0 and len(data) < MAX_UNCUT_SIZE:
+            rest = data
+            continue
+
+        if cut == 0:
+            cut = len(data)
+
+        (data, rest) = (data[:cut], data[cut:])
+
+        parser.feed(data)
+
+        for event in parser.read_events():
+            yield event
+
+    if rest:
+        parser.feed(rest)
+
+    parser.close()
+
+    for event in parser.read_events():
+        yield event
+
+
+# parts of translated selectors that depend on the content of the element,
+# which is not parsed yet when the element starts
+content_tests = ('string(', 'string-length(', 'text()', 'not(*)')
+
+
+def make_matcher(selector):
+    """
+    Returns an XPath testing whether an element matches a CSS selector.
+    """
+    return XPath(translate_css(preprocess_selector(selector), prefix='self::', translator='matching'))
+
+
+def get_ancestor(element, levels):
+    for _ in xrange(levels):
+        if element is None:
+            return None
+
+        element = element.getparent()
+
+    return element
+
+
+class PendingMatch(object):
+    def __init__(self, seq, element, reach_root):
+        # order of the element's start tag in the document
+        self.seq = seq
+        self.element = element
+        # the element whose end makes this match ready; None for the document end
+        self.reach_root = reach_root
+        self.ready = reach_root is element
+
+
+    def __lt__(self, other):
+        return self.seq < other.seq
+
+
+def release_element(element, keep_siblings):
+    """
+    Drops the content of an element that was completely parsed and, unless
+    'keep_siblings', its preceding siblings.
+    """
+    del element[:]
+    element.text = None
+    element.tail = None
+
+    if not keep_siblings:
+        parent = element.getparent()
+
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def iter_stream_matches(stream, selector, reach, chunk_size=CHUNK_SIZE):
+    """
+    Parses an HTML document incrementally from a file-like object and generates
+    tuples (root, element) for the elements matching the CSS selector, in
+    document order, as soon as the part of the document that the terms can
+    look at (as given by 'reach', see program_reach) is completely parsed.
+
+    Afterwards, parts of the document that no later match can look at are
+    released, so memory stays bounded when the matches are at the same depth.
+    When the terms can look anywhere (reach is None), matches are generated at
+    the end of the document and nothing is released.
+    """
+    matcher = make_matcher(selector)
+
+    # whether matching depends on siblings that were not parsed yet
+    needs_following = 'following-sibling' in matcher.path
+
+    if needs_following:
+        reach = None
+
+    keep_siblings = 'preceding-sibling' in matcher.path
+
+    # otherwise, whether an element matches is known when it starts
+    needs_content = any(t in matcher.path for t in content_tests)
+
+    root = None
+    # (seq, pinned) for the elements being parsed: the current element and its
+    # ancestors; an element is pinned if it matched when started
+    open_elements = []
+    # number of pinned open elements
+    open_pins = 0
+    pending = []
+    # reach root -> the matches waiting for its end
+    waiting = {}
+    # depth of the shallowest reach root seen
+    release_depth = None
+    seq = 0
+
+    for (event, element) in iter_parse_events(stream, chunk_size):
+        if event == 'start':
+            if root is None:
+                root = element
+
+            pinned = not needs_following and bool(matcher(element))
+
+            open_elements.append((seq, pinned))
+            seq += 1
+
+            if pinned:
+                open_pins += 1
+
+            continue
+
+        (element_seq, pinned) = open_elements.pop()
+
+        if pinned:
+            open_pins -= 1
+
+        is_reach_root = False
+
+        if needs_content:
+            matched = not needs_following and bool(matcher(element))
+        else:
+            matched = pinned
+
+        if matched:
+            if reach is None:
+                reach_root = None
+            else:
+                reach_root = get_ancestor(element, reach)
+
+            match = PendingMatch(element_seq, element, reach_root)
+
+            insort(pending, match)
+
+            if match.ready:
+                is_reach_root = True
+            elif reach_root is not None:
+                waiting.setdefault(reach_root, []).append(match)
+
+        if element in waiting:
+            for match in waiting.pop(element):
+                match.ready = True
+
+            is_reach_root = True
+
+        if is_reach_root and (release_depth is None or len(open_elements) < release_depth):
+            release_depth = len(open_elements)
+
+        # a pinned open element will match and must be generated first
+        first_pin = None
+        if open_pins > 0:
+            first_pin = (s for (s, p) in open_elements if p).next()
+
+        while len(pending) > 0 and pending[0].ready and (first_pin is None or pending[0].seq < first_pin):
+            yield (root, pending.pop(0).element)
+
+        if reach is None or len(pending) > 0 or open_pins > 0:
+            continue
+
+        if reach == 0 or (release_depth is not None and len(open_elements) <= release_depth):
+            release_element(element, keep_siblings)
+
+    if needs_following and root is not None:
+        for element in XPath(translate_css(preprocess_selector(selector)))(root):
+            yield (root, element)
+        return
+
+    for m in pending:
+        yield (root, m.element)
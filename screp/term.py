@@ -19,6 +19,11 @@ class Term(object):
         self._actions.append(action)
 
 
+    @property
+    def actions(self):
+        return list(self._actions)
+
+
     @property
     def last_action(self):
         return self._actions[-1]
@@ -17,6 +17,11 @@ from .idloc import (
         LocationFactory,
         Identification,
         )
+from .parsed import (
+        ParsedTerm,
+        ParsedTermAction,
+        ParsedAnchor,
+        )
 
 location_factory = LocationFactory('Unknown')
 
@@ -63,44 +68,6 @@ def any_of_keywords(kws):
 
 anchor_kws = ['$', '@']
 
-class ParsedTerm(object):
-    def __init__(self, anchor, accessors, filters):
-        self.anchor = anchor
-        self.accessors = accessors
-        self.filters = filters
-
-
-class ParsedTermAction(object):
-    def __init__(self, name, identification, args=None):
-        self.name = name
-        if args is None:
-            args = ()
-
-        self.args = args
-
-        self.identification = identification
-
-
-    def __str__(self):
-        return "ParsedTermAction<%s>" % (self.identification,)
-
-
-    __repr__ = __str__
-
-
-class ParsedAnchor(object):
-    def __init__(self, name, identification=None):
-        self.name = name
-        self.identification = identification
-
-
-    def __str__(self):
-        return "ParsedAnchor<%s>" % (self.identification,)
-
-
-    __repr__ = __str__
-
-
 digits = '0123456789'
 uppers = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
 lowers = uppers.lower()
@@ -121,7 +88,7 @@ argument_list_parser = Literal('(').suppress() + argument_parser + ZeroOrMore(Li
 action_parser = identifier_parser + Optional(Group(argument_list_parser), default=[])
 
 action_parser.setParseAction(lambda s, l, t: set_parser_results(t, 
-    ParsedTermAction(t[0], Identification(t[0], 'action', make_location(l)), args=t[1])))
+    ParsedTermAction(t[0], Identification(t[0], 'action', make_location(l)), args=list(t[1]))))
 
 filter_parser = Literal('|').suppress() + action_parser
 
@@ -1,20 +1,32 @@
+from functools import partial
+from operator import methodcaller
 import lxml
-from lxml.etree import (
-        XPath,
-        )
-from lxml.cssselect import CSSSelector
 import re
 
 from .utils import (
         raise_again,
-        generic_translator,
         preprocess_selector,
         )
+from .selectors import (
+        make_css_selector,
+        make_axis_selector,
+        )
 
 
 class BaseTermAction(object):
     in_type = None
     out_type = None
+    # the (first) name of the action in the actions directory, if any
+    name = None
+    # equal for actions computing the same function, if not None
+    key = None
+    # where the action is in the format specification or anchor definition
+    _id = None
+
+    @property
+    def identification(self):
+        return self._id
+
 
     @staticmethod
     def _check_types_match(t1, t2):
@@ -33,6 +45,14 @@ class BaseTermAction(object):
         pass
 
 
+    def compile(self):
+        """
+        Returns a function computing the same value as execute, for use in
+        compiled plans; it may raise errors without identification.
+        """
+        return self.execute
+
+
 class GenericTermAction(BaseTermAction):
     def __init__(self, f, in_type=None, out_type=None, args=None, identification=None):
         self._f = f
@@ -55,6 +75,25 @@ class GenericTermAction(BaseTermAction):
             raise_again('%s: %s' % (self._id, e))
 
 
+    @staticmethod
+    def _bind(f, args):
+        # specialized for the common arities, avoiding *args unpacking
+        if len(args) == 0:
+            return f
+        elif len(args) == 1:
+            (a1,) = args
+            return lambda value: f(value, a1)
+        elif len(args) == 2:
+            (a1, a2) = args
+            return lambda value: f(value, a1, a2)
+        else:
+            return lambda value: f(value, *args)
+
+
+    def compile(self):
+        return self._bind(self._f, tuple(self._args))
+
+
 class GenericSelectorTermAction(GenericTermAction):
     def __init__(self, f, selector, in_type=None, out_type=None, identification=None, args=None):
         super(GenericSelectorTermAction, self).__init__(f, in_type=in_type, out_type=out_type, identification=identification, args=args)
@@ -66,6 +105,10 @@ class GenericSelectorTermAction(GenericTermAction):
         return self._f(value, self._selector, *self._args)
 
 
+    def compile(self):
+        return self._bind(self._f, (self._selector,) + tuple(self._args))
+
+
 class AnchorTermAction(BaseTermAction):
     in_type = 'context'
     # out_type is set at instantiation, since it can vary
@@ -76,11 +119,20 @@ class AnchorTermAction(BaseTermAction):
         self.out_type = out_type
 
 
+    @property
+    def anchor(self):
+        return self._anchor
+
+
     def execute(self, context):
         # value must be a context
         return context.get_anchor(self._anchor)
 
 
+    def compile(self):
+        return methodcaller('get_anchor', self._anchor)
+
+
 class RegexTermAction(BaseTermAction):
     in_type = 'string'
     out_type = 'string'
@@ -140,6 +192,10 @@ class RegexTermAction(BaseTermAction):
         return self._re.sub(self._replace, value, count=self._count)
 
 
+    def compile(self):
+        return partial(self._re.sub, self._replace, count=self._count)
+
+
 def make_action_of_class(cls, f, in_type, out_type):
     def builder(identification, args):
         return cls(f, in_type=in_type, out_type=out_type, identification=identification, args=args)
@@ -161,8 +217,8 @@ def make_custom_selector_action(f, selector_ctor, in_type, out_type):
 
 
 def make_selector_action(f, in_type, out_type):
-    return make_custom_selector_action(f, CSSSelector, in_type, out_type)
+    return make_custom_selector_action(f, make_css_selector, in_type, out_type)
 
 
 def make_axis_selector_action(f, axis, in_type, out_type):
-    return make_custom_selector_action(f, lambda spec: XPath(generic_translator.css_to_xpath(spec, prefix=axis)), in_type, out_type)
+    return make_custom_selector_action(f, lambda spec: make_axis_selector(spec, axis), in_type, out_type)
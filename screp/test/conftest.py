@@ -0,0 +1,95 @@
+import pytest
+import threading
+import time
+import BaseHTTPServer
+import SocketServer
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class CountingHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # keep connections alive between requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+        with self.server.lock:
+            self.server.connections += 1
+
+
+    def do_GET(self):
+        server = self.server
+
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.requests.append((self.path, dict(self.headers)))
+
+        try:
+            time.sleep(server.delays.get(self.path, 0.0))
+
+            if self.path.startswith('/missing'):
+                self.send_error(404)
+                return
+
+            if self.path.startswith('/redirect'):
+                self.send_response(302)
+                self.send_header('Location', '/target')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            headers = server.headers.get(self.path, {})
+
+            if 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = server.bodies.get(self.path, '<html><body><p>%s</p></body></html>' % (self.path,))
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            for (k, v) in headers.items():
+                self.send_header(k, v)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    server.lock = threading.Lock()
+    server.active = 0
+    server.max_active = 0
+    server.connections = 0
+    server.requests = []
+    # path -> seconds to wait before answering
+    server.delays = {}
+    # path -> extra response headers; an ETag makes matching requests get a 304
+    server.headers = {}
+    # path -> response body
+    server.bodies = {}
+    server.url = lambda path: 'http://127.0.0.1:%s%s' % (server.server_address[1], path)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
@@ -0,0 +1,174 @@
+import pytest
+
+
+document = '''
+<table id="t">
+  <tr class="a"><td><a href="/1">one</a></td><td>1</td></tr>
+  <tr class="b"><td><a href="/2">two</a></td><td>2</td></tr>
+  <tr class="c"><td>three</td><td>3</td></tr>
+</table>
+'''
+
+expected = [('one', '/1'), ('two', '/2'), ('NULL', 'NULL')]
+
+
+def make_scraper(**kwargs):
+    import screp
+
+    return screp.compile('tr', '$.fdesc("a").text, $.fdesc("a").attr("href")', null_value='NULL', **kwargs)
+
+
+class TestScraper(object):
+    def test_scrapes_data(self):
+        scraper = make_scraper()
+
+        assert list(scraper.scrape(document)) == expected
+        # and again
+        assert list(scraper.scrape(document)) == expected
+
+
+    def test_scrapes_trees(self):
+        import lxml.html as html
+
+        scraper = make_scraper()
+
+        assert list(scraper.scrape_tree(html.fromstring(document))) == expected
+        assert list(scraper.scrape_tree(html.fromstring(document).getroottree())) == expected
+
+
+    def test_scrapes_sources(self, tmpdir):
+        from screp.source import DataSource
+
+        path = tmpdir.join('page.html')
+        path.write(document)
+
+        records = list(make_scraper().scrape_sources([str(path), DataSource('data', document)]))
+
+        assert records == expected * 2
+
+
+    def test_streams_files(self, tmpdir):
+        import gzip
+        from screp.source import FileDataSource
+
+        assert FileDataSource.streamable
+
+        path = str(tmpdir.join('page.html.gz'))
+
+        with gzip.open(path, 'wb') as f:
+            f.write(document)
+
+        scraper = make_scraper()
+
+        assert list(scraper.scrape_sources([path])) == expected
+        # the parser is reused
+        assert list(scraper.scrape_sources([path])) == expected
+
+
+    def test_stream_errors(self):
+        from screp.source import BaseDataSource
+
+        class BrokenStream(object):
+            def read(self, size=-1):
+                raise IOError('Connection lost')
+
+
+            def close(self):
+                pass
+
+        class BrokenSource(BaseDataSource):
+            streamable = True
+
+            def open_data(self):
+                return BrokenStream()
+
+        with pytest.raises(IOError) as e:
+            list(make_scraper().scrape_sources([BrokenSource()]))
+
+        assert str(e.value) == 'Parsing document: Connection lost'
+
+
+    def test_dicts(self):
+        import screp
+
+        scraper = screp.compile('tr', 'class=$.attr("class"), cell=$.children("td").last.text')
+
+        assert scraper.keys == ['class', 'cell']
+        assert list(scraper.scrape(document, as_dict=True)) == [
+                {'class': 'a', 'cell': '1'},
+                {'class': 'b', 'cell': '2'},
+                {'class': 'c', 'cell': '3'},
+                ]
+        assert list(scraper.scrape(document))[0] == ('a', '1')
+
+
+    def test_no_dicts_without_keys(self):
+        with pytest.raises(ValueError):
+            make_scraper().scrape(document, as_dict=True)
+
+
+    def test_anchors(self):
+        import screp
+
+        scraper = screp.compile('td:first-child', 'row.attr("class"), row.children("td").last.text', anchors=['row=$.parent'])
+
+        assert list(scraper.scrape(document)) == [('a', '1'), ('b', '2'), ('c', '3')]
+
+
+    def test_null_value_and_errors(self):
+        import screp
+
+        scraper = screp.compile('tr', '$.fdesc("a").text')
+
+        assert list(scraper.scrape(document)) == [('one',), ('two',), (None,)]
+
+        scraper = make_scraper(stop_on_error=True)
+
+        with pytest.raises(Exception):
+            list(scraper.scrape(document))
+
+
+    @pytest.mark.parametrize('args', [
+        ('tr', '$.text |'),
+        ('tr', '$.nosuchaction'),
+        ('tr[', '$.text'),
+        ])
+    def test_compile_errors(self, args):
+        import screp
+
+        with pytest.raises(Exception):
+            screp.compile(*args)
+
+
+    def test_threads(self, monkeypatch):
+        import threading
+        import screp.format_parsers as format_parsers
+
+        scraper = make_scraper()
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Called!')
+
+        # the threads don't parse the format again
+        monkeypatch.setattr(format_parsers, 'read_record_format', fail)
+
+        results = []
+        errors = []
+
+        def run():
+            try:
+                for _ in xrange(50):
+                    results.append(list(scraper.scrape(document)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in xrange(4)]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert results == [expected] * 200
@@ -0,0 +1,241 @@
+import pytest
+
+
+PAGES = [
+        ('a.html', '<html><body><p>first</p></body></html>'),
+        ('dir/b.html', '<html><body><p>second</p></body></html>'),
+        ]
+
+
+def write_tar(path, mode):
+    import tarfile
+    import StringIO
+
+    with tarfile.open(path, mode) as archive:
+        # directories are not documents
+        directory = tarfile.TarInfo('dir')
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+
+        for (name, data) in PAGES:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, StringIO.StringIO(data))
+
+
+def write_zip(path):
+    import zipfile
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('dir/', '')
+
+        for (name, data) in PAGES:
+            archive.writestr(name, data)
+
+
+def gzip_data(data):
+    import gzip
+    import StringIO
+
+    out = StringIO.StringIO()
+
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        f.write(data)
+
+    return out.getvalue()
+
+
+def warc_record(record_type, uri, block, content_type):
+    headers = [
+            'WARC/1.0',
+            'WARC-Type: %s' % (record_type,),
+            'WARC-Target-URI: %s' % (uri,),
+            'WARC-Record-ID: <urn:uuid:%s>' % (uri,),
+            'Content-Type: %s' % (content_type,),
+            'Content-Length: %d' % (len(block),),
+            ]
+
+    return '\r\n'.join(headers) + '\r\n\r\n' + block + '\r\n\r\n'
+
+
+def http_response(body, headers, status='200 OK'):
+    return 'HTTP/1.1 %s\r\n' % (status,) + ''.join('%s: %s\r\n' % h for h in headers) + '\r\n' + body
+
+
+def warc_records():
+    (first, second) = [data for (_, data) in PAGES]
+    chunked = '%x\r\n%s\r\n%x\r\n%s\r\n0\r\n\r\n' % (10, second[:10], len(second) - 10, second[10:])
+
+    return [
+            warc_record('warcinfo', '', 'software: test\r\n', 'application/warc-fields'),
+            warc_record('request', 'http://example.com/a', 'GET /a HTTP/1.1\r\n\r\n', 'application/http; msgtype=request'),
+            warc_record('response', 'http://example.com/a', http_response(first, [('Content-Type', 'text/html')]),
+                'application/http; msgtype=response'),
+            warc_record('response', 'http://example.com/logo.png', http_response('\x89PNG', [('Content-Type', 'image/png')]),
+                'application/http; msgtype=response'),
+            # neither error pages nor redirections are documents
+            warc_record('response', 'http://example.com/missing',
+                http_response('<p>Not found</p>', [('Content-Type', 'text/html')], status='404 Not Found'),
+                'application/http; msgtype=response'),
+            warc_record('response', 'http://example.com/moved',
+                http_response('<p>Moved</p>', [('Content-Type', 'text/html'), ('Location', '/b')], status='301 Moved Permanently'),
+                'application/http; msgtype=response'),
+            warc_record('response', 'http://example.com/b',
+                http_response(chunked, [('Content-Type', 'text/html'), ('Transfer-Encoding', 'chunked')]),
+                'application/http; msgtype=response'),
+            ]
+
+
+class TestArchives(object):
+    @pytest.mark.parametrize(('name', 'kind'), [
+        ('pages.tar', 'tar'),
+        ('pages.TAR.GZ', 'tar'),
+        ('pages.tgz', 'tar'),
+        ('pages.tar.xz', 'tar'),
+        ('pages.zip', 'zip'),
+        ('crawl.warc', 'warc'),
+        ('crawl.warc.gz', 'warc'),
+        ('page.html', None),
+        ('page.html.gz', None),
+        ])
+    def test_archive_kind(self, name, kind):
+        from screp.archives import archive_kind
+
+        assert archive_kind(name) == kind
+
+
+    @pytest.mark.parametrize(('name', 'mode'), [
+        ('pages.tar', 'w'),
+        ('pages.tar.gz', 'w:gz'),
+        ('pages.tar.bz2', 'w:bz2'),
+        ])
+    def test_tar(self, tmpdir, name, mode):
+        from screp.archives import iter_archive_sources
+
+        path = str(tmpdir.join(name))
+        write_tar(path, mode)
+
+        sources = [(s.name, s.read_data()) for s in iter_archive_sources(path)]
+
+        assert sources == [('%s!%s' % (path, n), data) for (n, data) in PAGES]
+
+
+    def test_zip(self, tmpdir):
+        from screp.archives import iter_archive_sources
+
+        path = str(tmpdir.join('pages.zip'))
+        write_zip(path)
+
+        sources = [(s.name, s.read_data()) for s in iter_archive_sources(path)]
+
+        assert sources == [('%s!%s' % (path, n), data) for (n, data) in PAGES]
+
+
+    def test_compressed_members(self, tmpdir):
+        import zipfile
+        from screp.archives import iter_archive_sources
+
+        path = str(tmpdir.join('pages.zip'))
+
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('a.html.gz', gzip_data(PAGES[0][1]))
+
+        assert [s.read_data() for s in iter_archive_sources(path)] == [PAGES[0][1]]
+
+
+    @pytest.mark.parametrize('compress', [
+        lambda records: ''.join(records),
+        # compressed record by record, like most WARC files
+        lambda records: ''.join(map(gzip_data, records)),
+        ])
+    def test_warc(self, tmpdir, compress):
+        from screp.archives import iter_archive_sources
+
+        path = tmpdir.join('crawl.warc.gz')
+        path.write(compress(warc_records()), mode='wb')
+
+        sources = [(s.name, s.read_data()) for s in iter_archive_sources(str(path))]
+
+        assert sources == [
+                ('%s!http://example.com/a' % (path,), PAGES[0][1]),
+                ('%s!http://example.com/b' % (path,), PAGES[1][1]),
+                ]
+
+
+    def test_warc_gzip_content_encoding(self, tmpdir):
+        from screp.archives import iter_archive_sources
+
+        body = PAGES[0][1]
+        record = warc_record('response', 'http://example.com/a',
+                http_response(gzip_data(body), [('Content-Type', 'text/html'), ('Content-Encoding', 'gzip')]),
+                'application/http; msgtype=response')
+
+        path = tmpdir.join('crawl.warc')
+        path.write(record, mode='wb')
+
+        assert [s.read_data() for s in iter_archive_sources(str(path))] == [body]
+
+
+    def test_not_a_warc(self, tmpdir):
+        from screp.archives import iter_archive_sources
+
+        path = tmpdir.join('crawl.warc')
+        path.write('<html></html>')
+
+        with pytest.raises(ValueError):
+            list(iter_archive_sources(str(path)))
+
+
+    def test_truncated_warc(self, tmpdir):
+        from screp.archives import iter_archive_sources
+
+        path = tmpdir.join('crawl.warc')
+        path.write(''.join(warc_records())[:-100], mode='wb')
+
+        with pytest.raises(ValueError):
+            list(iter_archive_sources(str(path)))
+
+
+    def test_scraper(self, tmpdir):
+        import screp
+
+        path = str(tmpdir.join('pages.tar.gz'))
+        write_tar(path, 'w:gz')
+
+        scraper = screp.compile('p', '$.text')
+
+        assert list(scraper.scrape_sources([path])) == [('first',), ('second',)]
+
+
+    def test_data_sources(self, tmpdir):
+        from screp.source import DataSource
+        from screp.archives import iter_data_sources
+
+        path = str(tmpdir.join('pages.zip'))
+        write_zip(path)
+
+        given = DataSource('given', '<p>given</p>')
+        sources = iter_data_sources([given, path, 'page.html'], lambda name: DataSource(name, ''))
+
+        assert [s.name for s in sources] == ['given', path + '!a.html', path + '!dir/b.html', 'page.html']
+
+
+    def test_data_sources_errors(self, tmpdir):
+        from screp.source import DataSource
+        from screp.archives import iter_data_sources
+
+        path = tmpdir.join('bad.zip')
+        path.write('not a zip')
+
+        names = [str(path), 'page.html']
+        make_source = lambda name: DataSource(name, '')
+
+        with pytest.raises(Exception):
+            list(iter_data_sources(names, make_source))
+
+        errors = []
+        sources = iter_data_sources(names, make_source, onerror=lambda name, e: errors.append(name))
+
+        # the rest of the sources are still generated
+        assert [s.name for s in sources] == ['page.html']
+        assert errors == [str(path)]
@@ -0,0 +1,206 @@
+import pytest
+
+
+DOCUMENT = '<html><body>%s</body></html>' % (''.join('<p>paragraph %d</p>' % (i,) for i in xrange(2000)),)
+
+
+def gzip_data(data):
+    import gzip
+    import StringIO
+
+    out = StringIO.StringIO()
+
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        f.write(data)
+
+    return out.getvalue()
+
+
+def bzip2_data(data):
+    import bz2
+
+    return bz2.compress(data)
+
+
+def xz_data(data):
+    import subprocess
+
+    try:
+        process = subprocess.Popen(['xz', '--compress', '--stdout'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    except OSError:
+        pytest.skip('No xz command')
+
+    return process.communicate(data)[0]
+
+
+class UnseekableFile(object):
+    def __init__(self, data):
+        import StringIO
+
+        self._file = StringIO.StringIO(data)
+
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+
+    def close(self):
+        pass
+
+
+def read_in_chunks(f, size):
+    chunks = []
+
+    while True:
+        chunk = f.read(size)
+
+        if not chunk:
+            return ''.join(chunks)
+
+        chunks.append(chunk)
+
+
+class TestDetectCompression(object):
+    @pytest.mark.parametrize(('compress', 'compression'), [
+        (gzip_data, 'gzip'),
+        (bzip2_data, 'bzip2'),
+        (lambda data: data, None),
+        (lambda data: '', None),
+        ])
+    def test_detect(self, compress, compression):
+        from screp.compression import (
+                detect_compression,
+                MAGIC_SIZE,
+                )
+
+        assert detect_compression(compress(DOCUMENT)[:MAGIC_SIZE]) == compression
+
+
+    def test_xz(self):
+        from screp.compression import detect_compression
+
+        assert detect_compression(xz_data(DOCUMENT)) == 'xz'
+
+
+class TestOpenDecompressed(object):
+    @pytest.mark.parametrize('compress', [gzip_data, bzip2_data, xz_data, lambda data: data])
+    def test_files(self, tmpdir, compress):
+        from screp.compression import open_decompressed
+
+        path = tmpdir.join('page')
+        path.write(compress(DOCUMENT), mode='wb')
+
+        f = open_decompressed(open(str(path), 'rb'))
+
+        assert read_in_chunks(f, 1000) == DOCUMENT
+
+        f.close()
+
+
+    @pytest.mark.parametrize('compress', [gzip_data, bzip2_data, lambda data: data])
+    @pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+    def test_unseekable(self, monkeypatch, compress, chunk_size):
+        import screp.compression as compression
+
+        monkeypatch.setattr(compression, 'CHUNK_SIZE', chunk_size)
+
+        f = compression.open_decompressed(UnseekableFile(compress(DOCUMENT)))
+
+        assert f.read(3) == DOCUMENT[:3]
+        assert f.read() == DOCUMENT[3:]
+        assert f.read() == ''
+
+
+    @pytest.mark.parametrize('compress', [gzip_data, bzip2_data])
+    @pytest.mark.parametrize('chunk_size', [1, 2, 5, 4096])
+    def test_concatenated_streams(self, monkeypatch, compress, chunk_size):
+        import screp.compression as compression
+
+        monkeypatch.setattr(compression, 'CHUNK_SIZE', chunk_size)
+
+        data = compress(DOCUMENT[:1000]) + compress(DOCUMENT[1000:])
+        f = compression.open_decompressed(UnseekableFile(data))
+
+        assert read_in_chunks(f, 333) == DOCUMENT
+
+
+    def test_trailing_garbage(self):
+        from screp.compression import open_decompressed
+
+        f = open_decompressed(UnseekableFile(gzip_data(DOCUMENT) + '\0' * 100))
+
+        assert f.read() == DOCUMENT
+
+
+    @pytest.mark.parametrize('compress', [gzip_data, bzip2_data])
+    @pytest.mark.parametrize('chunk_size', [1, 4096])
+    def test_truncated(self, monkeypatch, compress, chunk_size):
+        import screp.compression as compression
+
+        monkeypatch.setattr(compression, 'CHUNK_SIZE', chunk_size)
+
+        data = compress(DOCUMENT)
+
+        # within the data, within the trailer, and within the second stream
+        for truncated in [data[:len(data) // 2], data[:-1], data + data[:3]]:
+            f = compression.open_decompressed(UnseekableFile(truncated))
+
+            with pytest.raises(IOError) as e:
+                f.read()
+
+            assert 'Unexpected end' in str(e.value)
+
+
+    def test_xz_without_lzma(self, tmpdir, monkeypatch):
+        import screp.compression as compression
+
+        monkeypatch.setattr(compression, 'import_lzma', lambda: None)
+
+        path = tmpdir.join('page.xz')
+        path.write(xz_data(DOCUMENT), mode='wb')
+
+        f = compression.open_decompressed(open(str(path), 'rb'))
+
+        assert isinstance(f, compression.CommandFile)
+        assert f.read() == DOCUMENT
+
+        f.close()
+
+        # which needs a file
+        with pytest.raises(ValueError):
+            compression.open_decompressed(UnseekableFile(xz_data(DOCUMENT))).read()
+
+
+class TestSources(object):
+    def test_file_data_source(self, tmpdir):
+        from screp.source import FileDataSource
+
+        path = tmpdir.join('page.html.gz')
+        path.write(gzip_data(DOCUMENT), mode='wb')
+
+        source = FileDataSource(str(path))
+
+        assert source.read_data() == DOCUMENT
+        assert read_in_chunks(source.open_data(), 100) == DOCUMENT
+
+
+    def test_opened_file_data_source(self):
+        from screp.source import OpenedFileDataSource
+
+        source = OpenedFileDataSource('STDIN', UnseekableFile(bzip2_data(DOCUMENT)))
+
+        assert source.read_data() == DOCUMENT
+
+
+    def test_streaming(self, tmpdir):
+        from screp.source import FileDataSource
+        from screp.streaming import iter_stream_matches
+
+        path = tmpdir.join('page.html.bz2')
+        path.write(bzip2_data(DOCUMENT), mode='wb')
+
+        stream = FileDataSource(str(path)).open_data()
+        matches = [e.text for (_, e) in iter_stream_matches(stream, 'p', 0)]
+
+        assert len(matches) == 2000
+        assert matches[-1] == 'paragraph 1999'
@@ -168,3 +168,48 @@ class TestAnchorContextFactory(object):
         assert action1.out_type == 't1' and action1.execute(AnchorContext({'a1': 'x'})) == 'x'
 
         assert action2.out_type == 't2' and action2.execute(AnchorContext({'a2': 'y'})) == 'y'
+
+
+class TestPruneAnchors(object):
+    @staticmethod
+    def make_factory(calls):
+        from screp.anchor import Anchor
+        from screp.context import AnchorContextFactory
+        from screp.term import Term
+        from screp.termactions import (
+                AnchorTermAction,
+                GenericTermAction,
+                )
+
+        def make_anchor(name, source, suffix):
+            def f(x):
+                calls.append(name + suffix)
+                return x + suffix
+
+            return Anchor(name, Term([
+                AnchorTermAction(source, 't'),
+                GenericTermAction(f, in_type='t', out_type='t'),
+                ]))
+
+        factory = AnchorContextFactory([('a', 't')])
+
+        factory.add_anchor(make_anchor('b', 'a', '1'))
+        factory.add_anchor(make_anchor('c', 'b', '2'))
+        factory.add_anchor(make_anchor('b', 'a', '3'))
+        factory.add_anchor(make_anchor('d', 'a', '4'))
+
+        return factory
+
+
+    def test_prune(self):
+        from screp.term import Term
+        from screp.termactions import AnchorTermAction
+
+        calls = []
+        factory = self.make_factory(calls)
+
+        factory.prune([Term([AnchorTermAction('c', 't')])])
+
+        assert [x.name for x in factory.anchors] == ['a', 'b', 'c']
+
+        assert factory.make_context({'a': 'x'}).get_anchor('c') == 'x12'
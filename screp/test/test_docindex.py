@@ -0,0 +1,165 @@
+import pytest
+
+
+document = '''
+<html><body>
+<h1 id="title">Title</h1>
+<ul id="list">
+  <li class="item first" id="one">one</li>
+  <li class="item">two</li>
+  <li class="item last">three <b id="one">duplicate</b></li>
+</ul>
+</body></html>
+'''
+
+
+def make_dom():
+    import lxml.etree as etree
+
+    return etree.fromstring(document, etree.HTMLParser(remove_blank_text=True))
+
+
+class TestDocumentIndex(object):
+    def test_elements(self):
+        from screp.docindex import DocumentIndex
+
+        dom = make_dom()
+        index = DocumentIndex(dom)
+
+        assert [e.text for e in index.elements('tag', 'li')] == ['one', 'two', 'three ']
+        assert [e.text for e in index.elements('class', 'item')] == ['one', 'two', 'three ']
+        assert [e.tag for e in index.elements('id', 'one')] == ['li', 'b']
+        assert [e.tag for e in index.elements('id', 'title')] == ['h1']
+        assert index.elements('id', 'none') == []
+        assert index.elements('class', 'it') == []
+
+        # built once
+        assert index.elements('tag', 'li') is index.elements('tag', 'li')
+
+
+    def test_unknown_kind(self):
+        from screp.docindex import DocumentIndex
+
+        with pytest.raises(ValueError):
+            DocumentIndex(make_dom()).elements('attr', 'x')
+
+
+    def test_memoize(self):
+        from screp.docindex import DocumentIndex
+
+        dom = make_dom()
+        index = DocumentIndex(dom)
+        calls = []
+
+        def select(e):
+            calls.append(e)
+            return [e]
+
+        assert index.memoize('s', dom, select) == [dom]
+        assert index.memoize('s', dom, select) == [dom]
+        assert index.memoize('t', dom, select) == [dom]
+        assert calls == [dom, dom]
+
+
+class TestIndexedDocument(object):
+    def test_current_within_block(self):
+        from screp.docindex import (
+                indexed_document,
+                current_index,
+                )
+
+        dom = make_dom()
+
+        assert current_index() is None
+
+        with indexed_document(dom.find('.//li')) as index:
+            assert current_index() is index
+            assert index.root is dom
+
+            with indexed_document(make_dom()) as other_index:
+                assert current_index() is other_index
+
+            assert current_index() is index
+
+        assert current_index() is None
+
+
+    def test_generators(self):
+        from screp.docindex import (
+                indexed_document,
+                current_index,
+                )
+
+        def scrape(dom):
+            with indexed_document(dom) as index:
+                yield index
+
+        first = scrape(make_dom())
+        second = scrape(make_dom())
+        next(first)
+        second_index = next(second)
+
+        # ended in the order they started
+        first.close()
+        assert current_index() is second_index
+
+        second.close()
+        assert current_index() is None
+
+
+    def test_per_thread(self):
+        import threading
+        from screp.docindex import (
+                indexed_document,
+                current_index,
+                )
+
+        seen = []
+
+        with indexed_document(make_dom()):
+            thread = threading.Thread(target=lambda: seen.append(current_index()))
+            thread.start()
+            thread.join()
+
+        assert seen == [None]
+
+
+    def test_selectors_memoized(self):
+        from screp.selectors import make_css_selector
+        from screp.docindex import indexed_document
+
+        dom = make_dom()
+        selector = make_css_selector('li.item')
+
+        with indexed_document(dom) as index:
+            result = selector(dom)
+
+            assert selector(dom) is result
+            assert selector.first(dom) is result[0]
+
+        assert selector(dom) is not result
+        assert selector(dom) == result
+
+
+    def test_ids_from_index(self, monkeypatch):
+        from screp.selectors import make_css_selector
+        from screp.docindex import indexed_document
+
+        dom = make_dom()
+        selector = make_css_selector('#one')
+        ul = dom.find('.//ul')
+        last = ul[2]
+
+        # not evaluated with XPath
+        monkeypatch.setattr(selector, '_xpath', None)
+
+        with indexed_document(dom):
+            assert [e.tag for e in selector(dom)] == ['li', 'b']
+            assert [e.tag for e in selector(ul)] == ['li', 'b']
+            assert [e.tag for e in selector(last)] == ['b']
+            assert selector(dom.find('.//h1')) == []
+            assert selector.first(last).tag == 'b'
+
+            # elements of other documents are searched with XPath
+            monkeypatch.undo()
+            assert [e.tag for e in selector(make_dom())] == ['li', 'b']
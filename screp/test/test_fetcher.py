@@ -0,0 +1,130 @@
+import pytest
+import time
+
+
+class StaticDataSource(object):
+    prefetchable = False
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def read_data(self):
+        return self.name
+
+
+class TestPrefetchSources(object):
+    def test_preserves_input_order(self, http_server):
+        from screp.source import URLDataSource
+        from screp.fetcher import prefetch_sources
+
+        paths = ['/p%s' % (i,) for i in range(8)]
+
+        for (i, p) in enumerate(paths):
+            http_server.delays[p] = 0.05 * (len(paths) - i)
+
+        sources = [URLDataSource(http_server.url(p), proxy=False) for p in paths]
+
+        fetched = list(prefetch_sources(sources, 4))
+
+        assert [s.name for s in fetched] == [s.name for s in sources]
+
+        for (s, p) in zip(fetched, paths):
+            assert ('<p>%s</p>' % (p,)) in s.read_data()
+
+
+    def test_fetches_concurrently(self, http_server):
+        from screp.source import URLDataSource
+        from screp.fetcher import prefetch_sources
+
+        paths = ['/c%s' % (i,) for i in range(6)]
+
+        for p in paths:
+            http_server.delays[p] = 0.2
+
+        sources = [URLDataSource(http_server.url(p), proxy=False) for p in paths]
+
+        start = time.time()
+
+        for s in prefetch_sources(sources, 6):
+            s.read_data()
+
+        assert http_server.max_active > 1
+        assert time.time() - start < 0.2 * len(paths)
+
+
+    def test_errors_are_raised_when_read(self, http_server):
+        import urllib2
+        from screp.source import URLDataSource
+        from screp.fetcher import prefetch_sources
+
+        sources = [
+                URLDataSource(http_server.url('/ok1'), proxy=False),
+                URLDataSource(http_server.url('/missing'), proxy=False),
+                URLDataSource(http_server.url('/ok2'), proxy=False),
+                ]
+
+        fetched = list(prefetch_sources(sources, 2))
+
+        assert '/ok1' in fetched[0].read_data()
+
+        with pytest.raises(urllib2.HTTPError):
+            fetched[1].read_data()
+
+        assert '/ok2' in fetched[2].read_data()
+
+
+    def test_non_prefetchable_sources_pass_through(self, http_server):
+        from screp.source import URLDataSource
+        from screp.fetcher import prefetch_sources
+
+        sources = [
+                StaticDataSource('s1'),
+                URLDataSource(http_server.url('/u1'), proxy=False),
+                StaticDataSource('s2'),
+                ]
+
+        fetched = list(prefetch_sources(sources, 2, window=1))
+
+        assert fetched[0] is sources[0]
+        assert fetched[2] is sources[2]
+        assert '/u1' in fetched[1].read_data()
+
+
+    def test_invalid_jobs(self):
+        from screp.fetcher import prefetch_sources
+
+        with pytest.raises(ValueError):
+            list(prefetch_sources([], 0))
+
+
+class TestWorkersAndJobs(object):
+    def run(self, http_server, *args):
+        import os
+        import sys
+        import subprocess
+
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+        urls = [http_server.url(p) for p in ['/ok1', '/missing', '/ok2']]
+
+        process = subprocess.Popen([sys.executable, '-m', 'screp.main', '--workers', '2', '--jobs', '2', '-c', '$.text'] +
+                list(args) + ['p'] + urls, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (out, err) = process.communicate()
+
+        return (process.returncode, out, err)
+
+
+    def test_failing_url(self, http_server):
+        (returncode, out, err) = self.run(http_server, '-F')
+
+        assert returncode == 0
+        assert out.split() == ['/ok1', '/ok2']
+        assert err == ''
+
+
+    def test_failing_url_stops(self, http_server):
+        (returncode, out, err) = self.run(http_server)
+
+        assert returncode != 0
+        assert 'HTTP Error 404' in err
+        assert 'pickle' not in err
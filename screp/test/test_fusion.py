@@ -0,0 +1,125 @@
+import pytest
+
+
+document = '''<html><body>
+<div id="a" class="x"><ul><li>1<a href="u1">l1</a></li><li class="x"><b>b</b>2</li><li>3</li></ul><p>p1</p></div>
+<div id="b"><ul><li>4</li></ul><p>p2<a>l2</a></p><span class="x">s</span></div>
+</body></html>'''
+
+
+def make_actions(spec):
+    from screp.main import make_anchors_factory
+    from screp.term_parser import parse_term
+    from screp.term import make_term
+
+    term = make_term(parse_term(spec), make_anchors_factory([]))
+
+    # without the anchor
+    return term.actions[1:]
+
+
+def run(f, element):
+    try:
+        return ('value', f(element))
+    except Exception:
+        return ('error',)
+
+
+chains = [
+        '$.parent.children("li").first.fdesc("a").attr("href")',
+        '$.parent.children("li").last.children("b").first.text',
+        '$.ancestors("div").first.desc("p").last.text',
+        '$.ancestors("div").last.fdesc("p").id',
+        '$.parent.fsiblings("p").first.fdesc("a").text',
+        '$.parent.psiblings("p").first.desc("a").nth(0).text',
+        '$.fsiblings("li").nth(-1).children("b").first.tag',
+        '$.parent.parent.children("ul").first.children("li").nth(1).class',
+        '$.ancestors("div").first.children("ul").first.children("")',
+        '$.parent.children("li").first.desc("b")',
+        ]
+
+
+class TestFuseActions(object):
+    @pytest.mark.parametrize('spec', chains)
+    def test_same_values(self, spec):
+        import lxml.html as html
+        from screp.fusion import fuse_actions
+        from screp.planner import compose
+
+        actions = make_actions(spec)
+        unfused = compose([a.compile() for a in actions])
+
+        fused = fuse_actions(actions, unfused)
+
+        assert fused is not None
+
+        for e in html.fromstring(document).iter('li'):
+            assert run(fused, e) == run(unfused, e)
+
+
+    @pytest.mark.parametrize('spec', [
+        '$.parent.parent.tag',
+        '$.fdesc("a").text',
+        '$.desc("a, b").first.children("").first.tag',
+        '$.parent.siblings("p").first.children("a").first.tag',
+        '$.parent.children("li").first.fdesc("a").attr("data href")',
+        ])
+    def test_not_fused(self, spec):
+        from screp.fusion import fuse_actions
+
+        assert fuse_actions(make_actions(spec), None) is None
+
+
+    @pytest.mark.parametrize('spec', [
+        '$.ancestors("div").first.fdesc("p:contains(\\"hello\\")").text',
+        '$.ancestors("div").first.desc("p:contains(\\"HELLO\\")").last.text',
+        '$.ancestors("div:contains(\\"hello\\")").first.children("p").first.text',
+        ])
+    def test_same_translations(self, spec):
+        import lxml.html as html
+        from screp.fusion import fuse_actions
+        from screp.planner import compose
+
+        # :contains() is case-insensitive in desc and fdesc only
+        root = html.fromstring('<div><p>Hello World</p><p>hello there</p><b>b</b></div>')
+
+        actions = make_actions(spec)
+        unfused = compose([a.compile() for a in actions])
+
+        fused = fuse_actions(actions, unfused)
+
+        assert fused is not None
+
+        for e in root.iter('b'):
+            assert run(fused, e) == run(unfused, e)
+
+
+    def test_path(self):
+        from screp.fusion import fuse_actions
+
+        fused = fuse_actions(make_actions('$.parent.children("li").first.fdesc("a").text'), None)
+
+        assert fused.path == '((parent::*/child::li)[1]/descendant-or-self::a)[1]'
+
+
+class TestPlanFusion(object):
+    def test_shared_prefixes_are_not_fused(self):
+        import lxml.html as html
+        from screp.main import make_anchors_factory
+        from screp.format_parsers import parse_csv_formatter
+        from screp.planner import make_plan
+
+        factory = make_anchors_factory([])
+
+        (_, terms) = parse_csv_formatter('$.parent.children("li").first.fdesc("a").text, $.parent.tag', factory)
+
+        plan = make_plan(terms, factory)
+
+        dom = html.fromstring(document)
+
+        for e in dom.iter('li'):
+            values = plan.evaluate({'$': e, '@': dom})
+            context = factory.make_context({'$': e, '@': dom})
+
+            for (planned, term) in zip(plan.outputs, terms):
+                assert run(lambda v: planned.execute(v), values) == run(term.execute, context)
@@ -0,0 +1,232 @@
+import pytest
+import time
+
+
+class TestCacheControl(object):
+    cases = [
+            (None, {}),
+            ('', {}),
+            ('no-cache', {'no-cache': None}),
+            ('max-age=60, Private', {'max-age': '60', 'private': None}),
+            ('max-age="10",no-store', {'max-age': '10', 'no-store': None}),
+            ]
+
+    @pytest.mark.parametrize(('value', 'directives'), cases)
+    def test_parse(self, value, directives):
+        from screp.httpcache import parse_cache_control
+
+        assert parse_cache_control(value) == directives
+
+
+class TestFreshnessLifetime(object):
+    now = 1000000000
+
+    @staticmethod
+    def date(t):
+        import email.utils
+        return email.utils.formatdate(t, usegmt=True)
+
+
+    def test_max_age(self):
+        from screp.httpcache import freshness_lifetime
+
+        assert freshness_lifetime({'cache-control': 'max-age=60'}, self.now) == 60
+
+
+    def test_no_cache(self):
+        from screp.httpcache import freshness_lifetime
+
+        assert freshness_lifetime({'cache-control': 'no-cache, max-age=60'}, self.now) == 0
+
+
+    def test_expires(self):
+        from screp.httpcache import freshness_lifetime
+
+        headers = {'date': self.date(self.now), 'expires': self.date(self.now + 300)}
+
+        assert freshness_lifetime(headers, self.now) == 300
+
+
+    def test_invalid_expires(self):
+        from screp.httpcache import freshness_lifetime
+
+        assert freshness_lifetime({'expires': '0'}, self.now) == 0
+
+
+    def test_heuristic(self):
+        from screp.httpcache import freshness_lifetime
+
+        headers = {'date': self.date(self.now), 'last-modified': self.date(self.now - 1000)}
+
+        assert freshness_lifetime(headers, self.now) == 100
+
+
+    def test_no_information(self):
+        from screp.httpcache import freshness_lifetime
+
+        assert freshness_lifetime({}, self.now) == 0
+
+
+class TestHTTPCache(object):
+    def test_store_and_lookup(self, tmpdir):
+        from screp.httpcache import HTTPCache
+
+        cache = HTTPCache(str(tmpdir))
+
+        assert cache.lookup('http://h/a') is None
+
+        cache.store('http://h/a', {'etag': '"x"', 'set-cookie': 'c'}, 'body a')
+
+        entry = cache.lookup('http://h/a')
+
+        assert entry.headers == {'etag': '"x"'}
+        assert cache.read_body(entry) == 'body a'
+        assert entry.validators() == {'If-None-Match': '"x"'}
+
+
+    def test_content_addressed(self, tmpdir):
+        from screp.httpcache import HTTPCache
+
+        cache = HTTPCache(str(tmpdir))
+
+        e1 = cache.store('http://h/a', {}, 'same body')
+        e2 = cache.store('http://h/b', {}, 'same body')
+
+        assert e1.digest == e2.digest
+        assert len(tmpdir.join('objects').listdir()) == 1
+
+
+    def test_freshness(self, tmpdir):
+        from screp.httpcache import HTTPCache
+
+        cache = HTTPCache(str(tmpdir))
+
+        entry = cache.store('http://h/a', {'cache-control': 'max-age=100'}, 'a', stored=time.time() - 50)
+        assert entry.is_fresh()
+
+        entry = cache.store('http://h/a', {'cache-control': 'max-age=100'}, 'a', stored=time.time() - 150)
+        assert not entry.is_fresh()
+
+
+    def test_eviction_is_least_recently_used(self, tmpdir):
+        import os
+        from screp.httpcache import HTTPCache
+
+        cache = HTTPCache(str(tmpdir), max_size=25)
+
+        e1 = cache.store('http://h/1', {}, '1' * 10)
+        os.utime(e1.path, (1, 1))
+        e2 = cache.store('http://h/2', {}, '2' * 10)
+        os.utime(e2.path, (2, 2))
+
+        # reading marks it as recently used
+        cache.read_body(cache.lookup('http://h/1'))
+
+        cache.store('http://h/3', {}, '3' * 10)
+
+        assert cache.lookup('http://h/1') is not None
+        assert cache.lookup('http://h/2') is None
+        assert cache.lookup('http://h/3') is not None
+
+
+    def test_eviction_is_amortized(self, tmpdir):
+        from screp.httpcache import HTTPCache
+
+        cache = HTTPCache(str(tmpdir), max_size=100)
+
+        for i in xrange(10):
+            cache.store('http://h/%d' % (i,), {}, str(i) * 10)
+
+        scans = []
+        walk = cache._walk
+
+        def counting_walk(directory):
+            scans.append(directory)
+            return walk(directory)
+
+        cache._walk = counting_walk
+
+        # over the maximum size: evicted down to 90 bytes
+        cache.store('http://h/10', {}, 'a' * 10)
+
+        assert len(scans) > 0
+        assert len([i for i in xrange(11) if cache.lookup('http://h/%d' % (i,)) is not None]) == 9
+
+        del scans[:]
+
+        # back at the maximum size, without scanning the cache
+        cache.store('http://h/11', {}, 'b' * 10)
+
+        assert scans == []
+
+
+class TestCachingHTTPClient(object):
+    @staticmethod
+    def make_client(directory, offline=False):
+        from screp.httpclient import HTTPClient
+        from screp.httpcache import (
+                HTTPCache,
+                CachingHTTPClient,
+                )
+
+        return CachingHTTPClient(HTTPClient(), HTTPCache(directory), offline=offline)
+
+
+    def test_fresh_responses_skip_network(self, http_server, tmpdir):
+        http_server.headers['/fresh'] = {'Cache-Control': 'max-age=3600'}
+
+        client = self.make_client(str(tmpdir))
+
+        b1 = client.fetch(http_server.url('/fresh'), proxy=False)
+        b2 = client.fetch(http_server.url('/fresh'), proxy=False)
+
+        assert b1 == b2
+        assert len(http_server.requests) == 1
+        assert client.counters()['cache_hits'] == 1
+
+
+    def test_revalidates_with_etag(self, http_server, tmpdir):
+        http_server.headers['/etag'] = {'ETag': '"v1"', 'Cache-Control': 'no-cache'}
+
+        client = self.make_client(str(tmpdir))
+
+        b1 = client.fetch(http_server.url('/etag'), proxy=False)
+        b2 = client.fetch(http_server.url('/etag'), proxy=False)
+
+        assert b1 == b2 and '/etag' in b1
+        assert len(http_server.requests) == 2
+        assert http_server.requests[1][1]['if-none-match'] == '"v1"'
+        assert client.counters()['cache_revalidated'] == 1
+
+
+    def test_no_store(self, http_server, tmpdir):
+        http_server.headers['/nostore'] = {'Cache-Control': 'no-store'}
+
+        client = self.make_client(str(tmpdir))
+
+        client.fetch(http_server.url('/nostore'), proxy=False)
+        client.fetch(http_server.url('/nostore'), proxy=False)
+
+        assert len(http_server.requests) == 2
+        assert 'if-none-match' not in http_server.requests[1][1]
+
+
+    def test_offline_uses_stale_entries(self, http_server, tmpdir):
+        self.make_client(str(tmpdir)).fetch(http_server.url('/stale'), proxy=False)
+
+        client = self.make_client(str(tmpdir), offline=True)
+
+        assert '/stale' in client.fetch(http_server.url('/stale'), proxy=False)
+        assert len(http_server.requests) == 1
+
+
+    def test_errors_are_not_cached(self, http_server, tmpdir):
+        import urllib2
+
+        client = self.make_client(str(tmpdir))
+
+        for _ in range(2):
+            with pytest.raises(urllib2.HTTPError):
+                client.fetch(http_server.url('/missing'), proxy=False)
+
+        assert len(http_server.requests) == 2
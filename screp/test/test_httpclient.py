@@ -0,0 +1,245 @@
+import pytest
+import threading
+
+
+class TestConnectionPool(object):
+    def test_release_keeps_up_to_pool_size(self):
+        from screp.httpclient import (
+                ConnectionPool,
+                ConnectionKey,
+                )
+
+        pool = ConnectionPool(pool_size=1)
+        key = ConnectionKey('http', 'localhost', 80)
+
+        (c1, reused1) = pool.acquire(key)
+        (c2, reused2) = pool.acquire(key)
+
+        assert not reused1 and not reused2
+
+        pool.release(key, c1)
+        pool.release(key, c2)
+
+        (c3, reused3) = pool.acquire(key)
+
+        assert reused3 and c3 is c1
+
+        assert pool.counters() == {
+                'requests': 3,
+                'connections_created': 2,
+                'connections_reused': 1,
+                }
+
+
+    def test_connections_are_kept_per_host(self):
+        from screp.httpclient import (
+                ConnectionPool,
+                ConnectionKey,
+                )
+
+        pool = ConnectionPool()
+        k1 = ConnectionKey('http', 'host1', 80)
+        k2 = ConnectionKey('http', 'host2', 80)
+
+        (c1, _) = pool.acquire(k1)
+        pool.release(k1, c1)
+
+        (c2, reused) = pool.acquire(k2)
+
+        assert not reused and c2 is not c1
+
+
+    def test_invalid_pool_size(self):
+        from screp.httpclient import ConnectionPool
+
+        with pytest.raises(ValueError):
+            ConnectionPool(pool_size=-1)
+
+
+class TestHTTPClient(object):
+    def test_keep_alive_reuses_connection(self, http_server):
+        from screp.httpclient import HTTPClient
+
+        client = HTTPClient()
+
+        for i in range(5):
+            assert ('/page%s' % (i,)) in client.fetch(http_server.url('/page%s' % (i,)), proxy=False)
+
+        assert http_server.connections == 1
+
+        counters = client.pool.counters()
+
+        assert counters['connections_created'] == 1
+        assert counters['connections_reused'] == 4
+
+
+    def test_concurrent_requests(self, http_server):
+        from screp.httpclient import (
+                HTTPClient,
+                ConnectionPool,
+                )
+
+        client = HTTPClient(pool=ConnectionPool(pool_size=2))
+        results = []
+
+        def fetch(i):
+            results.append(client.fetch(http_server.url('/t%s' % (i,)), proxy=False))
+
+        threads = [threading.Thread(target=fetch, args=(i,)) for i in range(8)]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        assert len(results) == 8
+        assert client.pool.counters()['requests'] == 8
+
+
+    def test_follows_redirects(self, http_server):
+        from screp.httpclient import HTTPClient
+
+        response = HTTPClient().get(http_server.url('/redirect'), proxy=False)
+
+        assert response.status == 200
+        assert response.url == http_server.url('/target')
+        assert '/target' in response.body
+
+
+    def test_error_status_raises(self, http_server):
+        import urllib2
+        from screp.httpclient import HTTPClient
+
+        with pytest.raises(urllib2.HTTPError):
+            HTTPClient().fetch(http_server.url('/missing'), proxy=False)
+
+
+    def test_sends_headers(self, http_server):
+        from screp.httpclient import HTTPClient
+
+        HTTPClient().fetch(http_server.url('/h'), headers={'User-Agent': 'agent-x'}, proxy=False)
+
+        (path, headers) = http_server.requests[-1]
+
+        assert headers['user-agent'] == 'agent-x'
+
+
+    def test_other_schemes(self, tmpdir):
+        import urllib2
+        from screp.httpclient import HTTPClient
+
+        path = tmpdir.join('page.html')
+        path.write('<p>file</p>')
+
+        client = HTTPClient()
+
+        # opened by urllib2
+        assert client.fetch('file://' + str(path), proxy=False) == '<p>file</p>'
+        assert client.counters()['requests'] == 0
+
+        with pytest.raises(urllib2.URLError):
+            client.fetch('nosuchscheme://localhost/file')
+
+
+    def test_https_through_proxy(self, monkeypatch):
+        import httplib
+        from screp.httpclient import (
+                HTTPClient,
+                ConnectionPool,
+                )
+
+        for name in ['no_proxy', 'NO_PROXY']:
+            monkeypatch.delenv(name, raising=False)
+
+        monkeypatch.setenv('https_proxy', 'http://proxy.local:3128')
+        monkeypatch.setenv('http_proxy', 'http://proxy.local:3128')
+
+        client = HTTPClient()
+
+        (key, path, _) = client._route('https://example.com/x', True)
+        conn = ConnectionPool()._make_connection(key)
+
+        # TLS with the host, through a CONNECT tunnel opened by the proxy
+        assert isinstance(conn, httplib.HTTPSConnection)
+        assert (conn.host, conn.port) == ('proxy.local', 3128)
+        assert (conn._tunnel_host, conn._tunnel_port) == ('example.com', 443)
+        assert path == '/x'
+
+        (key, path, _) = client._route('http://example.com/x', True)
+        conn = ConnectionPool()._make_connection(key)
+
+        assert not isinstance(conn, httplib.HTTPSConnection)
+        assert path == 'http://example.com/x'
+
+
+    def test_stale_connection_retry(self, http_server):
+        import httplib
+        from screp.httpclient import HTTPClient
+
+        class StaleConnection(object):
+            def request(self, *args, **kwargs):
+                raise httplib.BadStatusLine('')
+
+
+            def close(self):
+                pass
+
+        client = HTTPClient()
+        url = http_server.url('/retried')
+
+        # an idle connection closed by the server meanwhile
+        (key, _, _) = client._route(url, False)
+        client.pool.release(key, StaleConnection())
+
+        assert '/retried' in client.fetch(url, proxy=False)
+        assert client.pool.counters() == {
+                'requests': 1,
+                'connections_created': 1,
+                'connections_reused': 1,
+                }
+
+
+    def test_url_data_source_uses_client(self, http_server):
+        from screp.httpclient import HTTPClient
+        from screp.source import URLDataSource
+
+        client = HTTPClient()
+
+        for i in range(3):
+            URLDataSource(http_server.url('/s%s' % (i,)), proxy=False, client=client).read_data()
+
+        assert client.pool.counters()['connections_reused'] == 2
+
+
+    def test_decodes_gzip_bodies(self, http_server):
+        import gzip
+        import StringIO
+        from screp.httpclient import HTTPClient
+
+        body = '<html><body><p>compressed</p></body></html>'
+        out = StringIO.StringIO()
+
+        with gzip.GzipFile(fileobj=out, mode='wb') as f:
+            f.write(body)
+
+        http_server.bodies['/gz'] = out.getvalue()
+        http_server.headers['/gz'] = {'Content-Encoding': 'gzip'}
+
+        response = HTTPClient().get(http_server.url('/gz'), proxy=False)
+
+        assert response.body == body
+        assert 'content-encoding' not in response.headers
+
+        (path, headers) = http_server.requests[-1]
+
+        assert headers['accept-encoding'] == 'gzip'
+
+
+    def test_unsupported_content_encoding(self, http_server):
+        from screp.httpclient import HTTPClient
+
+        http_server.headers['/br'] = {'Content-Encoding': 'br'}
+
+        with pytest.raises(ValueError):
+            HTTPClient().fetch(http_server.url('/br'), proxy=False)
@@ -0,0 +1,101 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+# runs main in a new interpreter, then writes the imported modules on stderr
+RUNNER = '''
+import sys
+sys.path.insert(0, %(root)r)
+import screp.main
+sys.argv = ['screp'] + %(args)r
+try:
+    screp.main.main()
+except SystemExit:
+    pass
+sys.stderr.write('\\nMODULES ' + ' '.join(m for (m, v) in sys.modules.items() if v is not None) + '\\n')
+'''
+
+DOCUMENT = '<ul><li><a href="/1">one</a></li><li><a href="/2">two</a></li></ul>'
+
+
+def imported_modules(args):
+    runner = RUNNER % {'root': ROOT, 'args': args}
+
+    process = subprocess.Popen([sys.executable, '-c', runner], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (out, err) = process.communicate()
+
+    for line in err.splitlines():
+        if line.startswith('MODULES '):
+            return (out, set(line.split()[1:]))
+
+    raise AssertionError('No modules reported: %s' % (err,))
+
+
+@pytest.fixture
+def page(tmpdir):
+    path = tmpdir.join('page.html')
+    path.write(DOCUMENT)
+
+    return str(path)
+
+
+class TestLazyImports(object):
+    def test_file_input_imports_no_url_machinery(self, page):
+        (out, modules) = imported_modules(['-c', '$.fdesc("a").text', 'li', page])
+
+        assert out == 'one\r\ntwo\r\n'
+
+        for name in ['httplib', 'urllib2', 'ssl', 'urlparse', 'multiprocessing', 'screp.httpclient']:
+            assert name not in modules
+
+
+    def test_main_imports_no_library_interface(self, page):
+        (_, modules) = imported_modules(['-c', '$.text', 'li', page])
+
+        assert 'screp.api' not in modules
+
+
+    @pytest.mark.parametrize('option', ['-j', '-J'])
+    def test_json_output_imports_no_csv(self, page, option):
+        (out, modules) = imported_modules([option, 'a=$.fdesc("a").text', 'li', page])
+
+        assert 'one' in out
+
+        assert 'csv' not in modules
+
+
+    def test_cached_program_imports_no_grammar(self, page, tmpdir):
+        args = ['--program-cache', str(tmpdir.join('programs')), '-c', '$.fdesc("a").attr("href")', 'li', page]
+
+        (_, modules) = imported_modules(args)
+
+        assert 'pyparsing' in modules
+
+        (out, modules) = imported_modules(args)
+
+        assert out == '/1\r\n/2\r\n'
+
+        for name in ['pyparsing', 'screp.format_parsers']:
+            assert name not in modules
+
+
+    @pytest.mark.parametrize(('selector', 'term'), [
+        ('li', '$.fdesc("p:contains(\\"hello\\")").text'),
+        ('p:contains("hello")', '$.text'),
+        ])
+    def test_cached_program_contains(self, tmpdir, selector, term):
+        path = tmpdir.join('page.html')
+        path.write('<ul><li><p>Hello World</p></li></ul>')
+
+        args = ['--program-cache', str(tmpdir.join('programs')), '-c', term, selector, str(path)]
+
+        # :contains() is case-insensitive with lxml's translator
+        for _ in xrange(2):
+            (out, _) = imported_modules(args)
+
+            assert out == 'Hello World\r\n'
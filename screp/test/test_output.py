@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+class FakeStream(object):
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+
+    def write(self, s):
+        self.writes.append(s)
+
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestOutputSink(object):
+    def test_writes_in_chunks(self):
+        from screp.output import OutputSink
+
+        stream = FakeStream()
+        sink = OutputSink(stream, flush_size=10)
+
+        sink.write('abcd')
+        sink.write('efgh')
+
+        assert stream.writes == []
+
+        sink.write('ijkl')
+        sink.write('m')
+
+        assert stream.writes == ['abcdefghijkl']
+
+        sink.flush()
+
+        assert stream.writes == ['abcdefghijkl', 'm']
+
+
+    def test_unbuffered(self):
+        from screp.output import OutputSink
+
+        stream = FakeStream()
+        sink = OutputSink(stream, flush_size=0)
+
+        sink.write('a')
+        sink.write('b')
+
+        assert stream.writes == ['a', 'b']
+        assert stream.flushes == 2
+
+
+    def test_flush_empty(self):
+        from screp.output import OutputSink
+
+        stream = FakeStream()
+        OutputSink(stream).flush()
+
+        assert stream.writes == []
+        assert stream.flushes == 1
+
+
+class TestLineBuffer(object):
+    def test_pop(self):
+        from screp.output import LineBuffer
+
+        b = LineBuffer()
+
+        b.write('a')
+        b.write('b')
+
+        assert b.pop() == 'ab'
+        assert b.pop() == ''
+
+
+class TestCSVOutput(object):
+    @pytest.mark.parametrize('records', [
+        [[u'a', u'b']],
+        [[u'a,b', u'"c"'], [u'', u'd\ne'], [u'ă', u' ']],
+        ])
+    def test_write_same_as_render(self, records):
+        from screp.formatter import CSVFormatter
+        from screp.output import LineBuffer
+
+        f = CSVFormatter(2)
+        out = LineBuffer()
+
+        for r in records:
+            f.write_record(r, out)
+
+        assert out.pop() == ''.join(f.render_record(r) for r in records)
+
+
+    def test_render_quotes(self):
+        from screp.formatter import CSVFormatter
+
+        f = CSVFormatter(2)
+
+        assert f.render_record([u'a,b', u'c']) == '"a,b",c\r\n'
+        assert f.render_record([u'ă', u'x']) == '\xc4\x83,x\r\n'
+
+
+    def test_wrong_number_of_values(self):
+        from screp.formatter import CSVFormatter
+        from screp.output import LineBuffer
+
+        with pytest.raises(ValueError):
+            CSVFormatter(2).write_record([u'a'], LineBuffer())
+
+
+class TestJSONLinesFormatter(object):
+    @pytest.mark.parametrize('record', [
+        [u'a', u'b', u'c'],
+        [u'"q"\\', u'\n\t', u'ă'],
+        [None, u'', u'\x00'],
+        ['bytes', u'x', u'y'],
+        ])
+    def test_same_as_json(self, record):
+        import json
+        from screp.formatter import JSONLinesFormatter
+
+        keys = ['k', 'key "2" %s', u'ț']
+
+        line = JSONLinesFormatter(keys).render_record(record)
+
+        assert line.endswith('}\n')
+        assert '\n' not in line[:-1]
+        assert json.loads(line) == dict(zip(keys, record))
+
+
+    def test_keeps_keys_order(self):
+        from screp.formatter import JSONLinesFormatter
+
+        f = JSONLinesFormatter(['b', 'a'])
+
+        assert f.render_record([u'1', u'2']) == '{"b": "1", "a": "2"}\n'
+
+
+    def test_no_framing(self):
+        from screp.formatter import JSONLinesFormatter
+        from screp.output import LineBuffer
+
+        f = JSONLinesFormatter(['a'])
+        out = LineBuffer()
+
+        out.write(f.start_format())
+        f.write_record([u'1'], out)
+        f.write_record([u'2'], out)
+        out.write(f.end_format())
+
+        assert out.pop() == '{"a": "1"}\n{"a": "2"}\n'
+
+
+    def test_wrong_number_of_values(self):
+        from screp.formatter import JSONLinesFormatter
+
+        with pytest.raises(ValueError):
+            JSONLinesFormatter(['a', 'b']).render_record([u'1'])
+
+
+    def test_read_format(self):
+        from screp.formatter import (
+                JSONFormatter,
+                JSONLinesFormatter,
+                )
+        from screp.format_parsers import (
+                read_json_format,
+                read_json_lines_format,
+                )
+
+        parsed = read_json_lines_format('a=$.text, b=$.tag')
+
+        assert isinstance(parsed.formatter_factory(), JSONLinesFormatter)
+        assert len(parsed.pterms) == 2
+
+        assert isinstance(read_json_format('a=$.text', indent=True).formatter_factory(), JSONFormatter)
@@ -0,0 +1,91 @@
+import pytest
+
+
+def make_tree(tmpdir):
+    for name in ['b.html', 'a.html', 'sub/z.html', 'sub/deeper/c.html', 'other/d.htm', 'empty/']:
+        if name.endswith('/'):
+            tmpdir.join(name).ensure(dir=True)
+        else:
+            tmpdir.join(name).ensure()
+
+
+def relative(tmpdir, names):
+    return [name[len(str(tmpdir)) + 1:] for name in names]
+
+
+class TestExpandPath(object):
+    def test_directory(self, tmpdir):
+        from screp.paths import expand_path
+
+        make_tree(tmpdir)
+
+        assert relative(tmpdir, expand_path(str(tmpdir))) == [
+                'a.html',
+                'b.html',
+                'other/d.htm',
+                'sub/z.html',
+                'sub/deeper/c.html',
+                ]
+
+
+    def test_pattern(self, tmpdir):
+        from screp.paths import expand_path
+
+        make_tree(tmpdir)
+
+        assert relative(tmpdir, expand_path(str(tmpdir.join('*.html')))) == ['a.html', 'b.html']
+        # matching directories are walked
+        assert relative(tmpdir, expand_path(str(tmpdir.join('s?b')))) == ['sub/z.html', 'sub/deeper/c.html']
+
+
+    def test_not_expanded(self, tmpdir):
+        from screp.paths import expand_path
+
+        make_tree(tmpdir)
+
+        for path in [str(tmpdir.join('a.html')), str(tmpdir.join('*.xml')), 'missing.html']:
+            assert list(expand_path(path)) == [path]
+
+        # a file named like a pattern
+        tmpdir.join('[1].html').ensure()
+
+        assert list(expand_path(str(tmpdir.join('[1].html')))) == [str(tmpdir.join('[1].html'))]
+        assert list(expand_path(str(tmpdir.join('*.html')), patterns=False)) == [str(tmpdir.join('*.html'))]
+
+
+    def test_walk_errors(self, tmpdir, monkeypatch):
+        import os
+        from screp.paths import expand_path
+
+        make_tree(tmpdir)
+
+        listdir = os.listdir
+
+        def failing_listdir(path):
+            if path.endswith('sub'):
+                raise OSError(13, 'Permission denied', path)
+
+            return listdir(path)
+
+        monkeypatch.setattr(os, 'listdir', failing_listdir)
+
+        errors = []
+
+        assert relative(tmpdir, expand_path(str(tmpdir), onerror=errors.append)) == ['a.html', 'b.html', 'other/d.htm']
+        assert [e.errno for e in errors] == [13]
+
+
+class TestIterNames(object):
+    @pytest.mark.parametrize('chunk_size', [1, 3, 64 * 1024])
+    def test_names(self, monkeypatch, chunk_size):
+        import StringIO
+        import screp.paths as paths
+
+        monkeypatch.setattr(paths, 'CHUNK_SIZE', chunk_size)
+
+        names = ['a.html', 'dir with spaces/b.html', 'new\nline.html']
+
+        assert list(paths.iter_names(StringIO.StringIO('\0'.join(names) + '\0'))) == names
+        # without the last NUL, or with empty names
+        assert list(paths.iter_names(StringIO.StringIO('\0'.join(names)))) == names
+        assert list(paths.iter_names(StringIO.StringIO('\0\0'.join(names)))) == names
@@ -0,0 +1,100 @@
+import pytest
+
+
+document = '''<html><body>
+<table id="t"><tr class="r1"><td><b>1</b></td><td>a</td></tr><tr class="r2"><td><i>2</i></td><td>b</td></tr></table>
+</body></html>'''
+
+
+def make_plan(spec, anchors=()):
+    from screp.main import make_anchors_factory
+    from screp.format_parsers import parse_csv_formatter
+    from screp.planner import make_plan
+
+    factory = make_anchors_factory(anchors)
+
+    (_, terms) = parse_csv_formatter(spec, factory)
+
+    return make_plan(terms, factory)
+
+
+def records(plan):
+    import lxml.html as html
+
+    dom = html.fromstring(document)
+
+    for e in dom.iter('td'):
+        yield (plan.evaluate({'$': e, '@': dom}), {'$': e, '@': dom})
+
+
+def execute(term, values):
+    try:
+        return term.execute(values)
+    except Exception as e:
+        return 'error: %s' % (e,)
+
+
+class TestPlan(object):
+    @pytest.mark.parametrize(('spec', 'anchors', 'actions'), [
+        ('$.parent.tag, $.parent.attr("class")', [], 3),
+        ('$.parent.parent.tag, $.parent.parent.attr("id"), $.parent.tag', [], 5),
+        ('$.fdesc("b").text, $.fdesc("i").text', [], 4),
+        ('$.parent.tag, $.p.tag', [], 2),
+        ('r.tag, $.parent.attr("class")', ['r=$.parent'], 3),
+        ('r.tag', ['r=$.parent.parent', 'r=$.parent'], 2),
+        ('r.tag', ['r=$.parent', 'r=r.parent'], 3),
+        ('$.parent.tag', ['r=$.parent.parent'], 2),
+        ])
+    def test_shares_prefixes(self, spec, anchors, actions):
+        plan = make_plan(spec, anchors)
+
+        assert len([n for n in plan.nodes if not n.is_primary]) == actions
+
+
+    @pytest.mark.parametrize(('spec', 'anchors'), [
+        ('$.text, $.parent.tag, $.parent.attr("class"), $.fsiblings("td").first.text', []),
+        ('$.fdesc("b").text, $.fdesc("b").text|upper, $.fdesc("i").text', []),
+        ('r.attr("class"), r.tag, $.parent.parent.attr("id")', ['r=$.parent']),
+        ('r.attr("class"), s.attr("id")', ['r=$.parent', 's=r.parent', 'r=$.parent.parent']),
+        ('@.tag, $.ancestors("table").first.attr("id")', []),
+        ])
+    def test_values_match_terms(self, spec, anchors):
+        plan = make_plan(spec, anchors)
+
+        for (values, primary) in records(plan):
+            context = plan.anchors_factory.make_context(primary)
+
+            for (planned, term) in zip(plan.outputs, plan.terms):
+                assert execute(planned, values) == execute(term, context)
+
+
+    def test_errors_are_identified_by_term(self):
+        plan = make_plan('$.fdesc("b").text, $.fdesc("b").text|upper')
+
+        (values, _) = list(records(plan))[2]
+
+        for (planned, position) in zip(plan.outputs, ['csv_format:2)', 'csv_format:21)']):
+            with pytest.raises(Exception) as e:
+                planned.execute(values)
+
+            assert position in str(e.value)
+
+
+    def test_anchor_errors_are_errors_of_terms(self):
+        plan = make_plan('$.text, r.text', ['r=$.fdesc("b")'])
+
+        (values, _) = list(records(plan))[2]
+
+        assert plan.outputs[0].execute(values) is None
+
+        with pytest.raises(Exception) as e:
+            plan.outputs[1].execute(values)
+
+        assert 'anchor[r]' in str(e.value)
+
+
+    def test_unused_anchors_are_not_computed(self):
+        plan = make_plan('$.text', ['r=$.fdesc("b")', 's=r.parent'])
+
+        # only $.text
+        assert len([n for n in plan.nodes if not n.is_primary]) == 1
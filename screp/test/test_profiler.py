@@ -0,0 +1,156 @@
+import pytest
+
+
+document = '''<html><body>
+<table id="t"><tr class="r1"><td><b>1</b></td><td>a</td></tr><tr class="r2"><td><i>2</i></td><td>b</td></tr></table>
+</body></html>'''
+
+
+def make_plan(spec, anchors=(), profile=None):
+    from screp.main import make_anchors_factory
+    from screp.format_parsers import parse_csv_formatter
+    from screp.planner import make_plan
+
+    factory = make_anchors_factory(anchors)
+
+    (_, terms) = parse_csv_formatter(spec, factory)
+
+    return make_plan(terms, factory, profile=profile)
+
+
+def evaluate(plan):
+    import lxml.html as html
+
+    dom = html.fromstring(document)
+    rows = [plan.evaluate({'$': e, '@': dom}) for e in dom.iter('td')]
+
+    return [[execute(t, r) for t in plan.outputs] for r in rows]
+
+
+def execute(term, values):
+    try:
+        return term.execute(values)
+    except Exception as e:
+        return 'error: %s' % (e,)
+
+
+class TestDescribe(object):
+    @pytest.mark.parametrize(('spec', 'description'), [
+        ('$.text', 'csv_format:2 text'),
+        ('$.desc(".price").first.text', 'csv_format:2 desc(".price").first.text'),
+        ('$.desc("td").nth(1).tag', 'csv_format:2 desc("td").nth(1).tag'),
+        ('$.text | resub("a", "b")', 'csv_format:2 text.resub("a", "b")'),
+        ('$.text | resub("a+", "")', 'csv_format:2 text.resub("a+", "")'),
+        ])
+    def test_describe_actions(self, spec, description):
+        from screp.main import make_anchors_factory
+        from screp.format_parsers import parse_csv_formatter
+        from screp.profiler import describe_actions
+
+        (_, terms) = parse_csv_formatter(spec, make_anchors_factory([]))
+
+        assert describe_actions(terms[0].actions[1:]) == description
+
+
+class TestActionProfile(object):
+    def test_sorted_by_time(self):
+        import time
+        from screp.profiler import ActionProfile
+
+        profile = ActionProfile()
+
+        assert profile.time('fast', 1, len, 'x') == 1
+        profile.time('slow', 2, time.sleep, 0.01)
+        profile.time('fast', 3, len, 'x')
+
+        entries = profile.entries()
+
+        assert [e.label for e in entries] == ['slow', 'fast']
+        assert [e.calls for e in entries] == [2, 4]
+        assert entries[0].time >= 0.01
+
+
+    def test_report(self):
+        import StringIO
+        from screp.profiler import ActionProfile
+
+        profile = ActionProfile()
+        profile.time('csv_format:2 text', 10, len, 'x')
+
+        out = StringIO.StringIO()
+        profile.write_report(out)
+
+        lines = out.getvalue().splitlines()
+
+        assert len(lines) == 2
+        assert lines[1].endswith('csv_format:2 text')
+
+
+    def test_stats_report(self):
+        from screp.profiler import ActionProfile
+
+        profile = ActionProfile()
+        profile.time('csv_format:2 text', 10, len, 'x')
+        profile.time('anchor[a]:4 parent', 5, len, 'x')
+
+        report = profile.report()
+
+        assert set(report) == set(['csv_format:2 text', 'anchor[a]:4 parent'])
+        assert report['csv_format:2 text']['calls'] == 10
+
+
+class TestProfiledPlan(object):
+    @pytest.mark.parametrize(('spec', 'anchors'), [
+        ('$.text, $.parent.tag, $.parent.attr("class")', []),
+        ('$.fdesc("b").text, $.fdesc("b").text|upper, $.fdesc("i").text', []),
+        ('r.text, r.tag, $.tag', ['r=$.fdesc("b")']),
+        ])
+    def test_same_values(self, spec, anchors):
+        from screp.profiler import ActionProfile
+
+        assert evaluate(make_plan(spec, anchors, profile=ActionProfile())) == evaluate(make_plan(spec, anchors))
+
+
+    def test_entries_by_location(self):
+        from screp.profiler import ActionProfile
+        from screp.planner import FAILED_RECORDS_LABEL
+
+        profile = ActionProfile()
+
+        evaluate(make_plan('r.tag, $.parent.attr("x"), $.parent.text', ['r=$.parent'], profile=profile))
+
+        labels = dict((e.label, e.calls) for e in profile.entries())
+
+        # shared nodes are reported at the location of their first use
+        assert labels == {
+                'anchor[r]:4 parent': 4,
+                'csv_format:2 tag': 4,
+                'csv_format:16 attr("x")': 4,
+                'csv_format:36 text': 4,
+                FAILED_RECORDS_LABEL: 4,
+                }
+
+
+    def test_fused_chains(self):
+        from screp.profiler import ActionProfile
+
+        profile = ActionProfile()
+
+        evaluate(make_plan('$.ancestors("table").first.fdesc("tr").attr("class")', profile=profile))
+
+        assert [e.label for e in profile.entries()] == ['csv_format:2 ancestors("table").first.fdesc("tr").attr("class")']
+
+
+    def test_evaluate(self):
+        import lxml.html as html
+        from screp.profiler import ActionProfile
+
+        profile = ActionProfile()
+        plan = make_plan('$.tag', profile=profile)
+
+        dom = html.fromstring(document)
+
+        values = plan.evaluate({'$': dom, '@': dom})
+
+        assert plan.outputs[0].execute(values) == 'html'
+        assert [(e.label, e.calls) for e in profile.entries()] == [('csv_format:2 tag', 1)]
@@ -0,0 +1,128 @@
+import pytest
+
+
+document = '''<html><body>
+<table id="t"><tr class="r1"><td><b>1</b></td><td>a</td></tr><tr class="r2"><td><i>2</i></td><td>b</td></tr></table>
+</body></html>'''
+
+
+class TestProgramCache(object):
+    def test_store_and_load(self, tmpdir):
+        from screp.programcache import (
+                ProgramCache,
+                CompiledProgram,
+                program_key,
+                )
+
+        cache = ProgramCache(str(tmpdir.join('cache')))
+        key = program_key('a', 'b')
+
+        assert cache.load(key) is None
+
+        cache.store(key, CompiledProgram('format', [('a', 'term')], {'k': 'v'}))
+
+        program = cache.load(key)
+
+        assert program.parsed_format == 'format'
+        assert program.parsed_anchors == [('a', 'term')]
+        assert program.translations == {'k': 'v'}
+
+
+    def test_unreadable_entries_are_missing(self, tmpdir):
+        from screp.programcache import (
+                ProgramCache,
+                program_key,
+                )
+
+        cache = ProgramCache(str(tmpdir))
+        key = program_key('a')
+
+        tmpdir.join(key + '.pickle').write('garbage')
+
+        assert cache.load(key) is None
+
+
+    def test_keys(self):
+        from screp.programcache import program_key
+
+        assert program_key('a', None) == program_key('a', None)
+        assert program_key('a', None) != program_key(None, 'a')
+
+
+    def test_keys_change_with_the_sources(self, monkeypatch):
+        import screp.programcache as programcache
+
+        key = programcache.program_key('a')
+
+        monkeypatch.setattr(programcache, '_sources_hash', 'other')
+
+        assert programcache.program_key('a') != key
+
+        monkeypatch.setattr(programcache, '_sources_hash', None)
+        monkeypatch.setattr(programcache, 'PROGRAM_MODULES', ['parsed.py'])
+
+        assert programcache.program_key('a') != key
+
+
+def run(monkeypatch, tmpdir, argv):
+    import lxml.html as html
+    import screp.main as main
+    import screp.utils as utils
+    from screp.planner import make_plan
+    from screp.programcache import ProgramCache
+
+    monkeypatch.setattr(utils, 'css_translations', {})
+    monkeypatch.setattr(main, 'css_translations', utils.css_translations)
+
+    (options, selector, _) = main.parse_cli_options(argv)
+    monkeypatch.setattr(main, 'options', options, raising=False)
+
+    cache = ProgramCache(str(tmpdir))
+
+    program = main.load_program(cache)
+
+    factory = main.build_anchors_factory(program.parsed_anchors)
+    (formatter, terms) = main.build_format(program.parsed_format, factory)
+    plan = make_plan(terms, factory)
+    selector = main.get_selector(selector)
+
+    dom = html.fromstring(document)
+
+    records = [[t.execute(plan.evaluate({'$': e, '@': dom})) for t in plan.outputs] for e in selector(dom)]
+
+    main.save_program(cache, program)
+
+    return records
+
+
+class TestCachedPrograms(object):
+    @pytest.mark.parametrize('argv', [
+        ['-c', '$.tag, $.fdesc("b, i").text', 'td:first-child'],
+        ['-a', 'r=$.parent', '-a', 's=r.ancestors("table").first', '-j', 'a=r.attr("class"), b=s.attr("id")', 'td:first-child'],
+        ['-J', 'a=$.parent.children("td").last.text | upper, b=$.ancestors("table").first.fdesc("tr").attr("class")', 'td'],
+        ['-f', '<{$.text}>', 'td'],
+        ])
+    def test_no_parsing_nor_translation(self, monkeypatch, tmpdir, argv):
+        import screp.format_parsers as format_parsers
+        import screp.utils as utils
+
+        first = run(monkeypatch, tmpdir, argv)
+
+        assert len(tmpdir.listdir()) == 1
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Called!')
+
+        for name in ['read_csv_format', 'read_json_format', 'read_json_lines_format', 'read_general_format', 'read_anchor']:
+            monkeypatch.setattr(format_parsers, name, fail)
+
+        monkeypatch.setattr(utils, 'get_translator', fail)
+
+        assert run(monkeypatch, tmpdir, argv) == first
+
+
+    def test_different_options(self, monkeypatch, tmpdir):
+        assert run(monkeypatch, tmpdir, ['-c', '$.tag', 'td']) == [['td']] * 4
+        assert run(monkeypatch, tmpdir, ['-c', '$.parent.tag', 'td']) == [['tr']] * 4
+
+        assert len(tmpdir.listdir()) == 2
@@ -0,0 +1,183 @@
+import pytest
+
+
+document = '''
+<html><body>
+<div id="main" class="page wide">
+  <ul class="list">
+    <li class="item first"><a href="/1" class="link">one</a></li>
+    <li class="item"><span><a href="/2">two</a></span></li>
+    <!-- a comment -->
+    <li class="item	last selected" id="third"><a href="/3" class="link ext">three</a>
+      <ul><li class="item nested"><a href="/4">four</a></li></ul>
+    </li>
+  </ul>
+  <p class="items">not an item</p>
+  <div class="page"><p id="main">a duplicate id</p></div>
+</div>
+<div class="footer"><a href="/5">five</a></div>
+</body></html>
+'''
+
+simple_selectors = [
+        '*',
+        'li',
+        'a',
+        'LI',
+        '#main',
+        '#third',
+        'p#main',
+        '.item',
+        '.items',
+        'li.item',
+        '.item.last',
+        '.last.item.selected',
+        'li.nested',
+        'div.page',
+        '.page.wide',
+        'ul li',
+        'ul > li',
+        'ul>li',
+        'div  a',
+        'div ul li a',
+        'div > ul > li > a',
+        '#main li',
+        '#main > ul .item',
+        'ul ul li',
+        'li li a',
+        'li > a.link',
+        'div .link',
+        'body > div a',
+        '.page p',
+        ]
+
+other_selectors = [
+        'a[href]',
+        'li:first-child',
+        'li + li',
+        'li ~ li',
+        'a, p',
+        'li:not(.item)',
+        ]
+
+
+def make_dom():
+    import lxml.etree as etree
+
+    return etree.fromstring(document, etree.HTMLParser(remove_blank_text=True))
+
+
+def contexts(dom):
+    import lxml.etree as etree
+
+    return [dom] + list(dom.iter(etree.Element))[1:]
+
+
+class TestParseSimpleSelector(object):
+    @pytest.mark.parametrize('selector', simple_selectors)
+    def test_simple(self, selector):
+        from screp.selectors import parse_simple_selector
+
+        assert parse_simple_selector(selector) is not None
+
+
+    @pytest.mark.parametrize('selector', other_selectors)
+    def test_others(self, selector):
+        from screp.selectors import parse_simple_selector
+
+        assert parse_simple_selector(selector) is None
+
+
+    def test_parts(self):
+        from screp.selectors import parse_simple_selector
+
+        (compounds, combinators) = parse_simple_selector('div#main.a.b > li  .c')
+
+        assert [(c.tag, c.ids, c.classes) for c in compounds] == [
+                ('div', ('main',), ('a', 'b')),
+                ('li', (), ()),
+                (None, (), ('c',)),
+                ]
+        assert combinators == ['>', ' ']
+
+
+class TestSelectors(object):
+    @pytest.mark.parametrize('selector', simple_selectors + other_selectors)
+    def test_like_css_selector(self, selector):
+        from lxml.cssselect import CSSSelector
+        from screp.selectors import make_css_selector
+
+        dom = make_dom()
+        css_selector = CSSSelector(selector)
+        fast_selector = make_css_selector(selector)
+
+        for e in contexts(dom):
+            expected = css_selector(e)
+
+            assert fast_selector(e) == expected
+
+            if expected:
+                assert fast_selector.first(e) is expected[0]
+            else:
+                with pytest.raises(IndexError):
+                    fast_selector.first(e)
+
+
+    @pytest.mark.parametrize('selector', simple_selectors + other_selectors)
+    def test_indexed_like_css_selector(self, selector):
+        from lxml.cssselect import CSSSelector
+        from screp.selectors import make_css_selector
+        from screp.docindex import indexed_document
+
+        dom = make_dom()
+        css_selector = CSSSelector(selector)
+        fast_selector = make_css_selector(selector)
+
+        with indexed_document(dom):
+            # twice, the second time from the index
+            for _ in xrange(2):
+                for e in contexts(dom):
+                    expected = css_selector(e)
+
+                    assert fast_selector(e) == expected
+
+                    if expected:
+                        assert fast_selector.first(e) is expected[0]
+                    else:
+                        with pytest.raises(IndexError):
+                            fast_selector.first(e)
+
+
+    @pytest.mark.parametrize('axis', ['child::', 'ancestor::', 'following-sibling::', 'preceding-sibling::', 'self::'])
+    @pytest.mark.parametrize('selector', simple_selectors + other_selectors)
+    def test_axes_like_xpath(self, axis, selector):
+        from lxml.etree import XPath
+        from screp.utils import translate_css
+        from screp.selectors import make_axis_selector
+
+        dom = make_dom()
+        xpath = XPath(translate_css(selector, prefix=axis))
+        fast_selector = make_axis_selector(selector, axis)
+
+        for e in contexts(dom):
+            assert fast_selector(e) == xpath(e)
+
+
+    def test_uses_fast_paths(self):
+        from screp.selectors import (
+                make_css_selector,
+                make_axis_selector,
+                SimpleSelector,
+                AxisSelector,
+                SelfSelector,
+                IdSelector,
+                )
+        from screp.utils import CachedCSSSelector
+
+        assert isinstance(make_css_selector('ul > li.item'), SimpleSelector)
+        assert isinstance(make_css_selector('li:first-child'), CachedCSSSelector)
+        assert isinstance(make_css_selector('#main'), IdSelector)
+        assert isinstance(make_css_selector('p#main'), SimpleSelector)
+        assert isinstance(make_axis_selector('li.item', 'ancestor::'), AxisSelector)
+        assert isinstance(make_axis_selector('li.item', 'self::'), SelfSelector)
+        assert not isinstance(make_axis_selector('ul li', 'child::'), AxisSelector)
@@ -0,0 +1,282 @@
+import os
+import sys
+import time
+import signal
+import socket
+import subprocess
+import StringIO
+
+import pytest
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+DOCUMENT = '<ul><li><a href="/1">one</a></li><li><a href="/2">two</a></li></ul>'
+
+
+class TestProtocol(object):
+    def test_reads_requests(self):
+        from screp.server import read_request
+
+        rfile = StringIO.StringIO('FILE /tmp/a b.html\nDATA 5\nabcdeDATA 0\n')
+
+        source = read_request(rfile)
+        assert source.name == '/tmp/a b.html'
+
+        source = read_request(rfile)
+        assert source.read_data() == 'abcde'
+
+        source = read_request(rfile)
+        assert source.read_data() == ''
+
+        assert read_request(rfile) is None
+
+
+    @pytest.mark.parametrize('line', [
+        'GET /\n',
+        'FILE\n',
+        'DATA\n',
+        'DATA x\n',
+        'DATA -1\n',
+        'DATA 10\nabc',
+        'FILE /tmp/a.html',
+        ])
+    def test_invalid_requests(self, line):
+        from screp.server import (
+                read_request,
+                ProtocolError,
+                )
+
+        with pytest.raises(ProtocolError):
+            read_request(StringIO.StringIO(line))
+
+
+    def test_responses(self):
+        from screp.output import OutputSink
+        from screp.server import (
+                ChunkedStream,
+                read_response,
+                write_error,
+                ServerError,
+                )
+
+        wfile = StringIO.StringIO()
+        sink = OutputSink(ChunkedStream(wfile), flush_size=4)
+
+        sink.write('ab')
+        sink.write('cde\n')
+        sink.write('f')
+        sink.flush()
+        wfile.write('OK\n')
+
+        assert wfile.getvalue() == 'DATA 6\nabcde\nDATA 1\nfOK\n'
+        assert read_response(StringIO.StringIO(wfile.getvalue())) == 'abcde\nf'
+
+        wfile = StringIO.StringIO()
+        write_error(wfile, ValueError('Bad\ndocument!'))
+
+        with pytest.raises(ServerError) as e:
+            read_response(StringIO.StringIO(wfile.getvalue()))
+
+        assert str(e.value) == 'Bad document!'
+
+
+def start_server(path, *args):
+    command = [sys.executable, '-m', 'screp.main', '--serve', path] + list(args)
+
+    process = subprocess.Popen(command, cwd=ROOT, stderr=subprocess.PIPE)
+
+    for _ in xrange(100):
+        if os.path.exists(path):
+            return process
+
+        time.sleep(0.05)
+
+    process.kill()
+
+    raise AssertionError('The server did not start: %s' % (process.communicate()[1],))
+
+
+@pytest.fixture
+def server(tmpdir):
+    path = str(tmpdir.join('screp.sock'))
+
+    process = start_server(path, '-c', '$.fdesc("a").text, $.fdesc("a").attr("href")', 'li')
+
+    yield path
+
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+class TestServer(object):
+    def test_scrapes_files_and_data(self, server, tmpdir):
+        from screp.server import request
+
+        page = tmpdir.join('page.html')
+        page.write(DOCUMENT)
+
+        assert request(server, source=str(page)) == 'one,/1\r\ntwo,/2\r\n'
+        assert request(server, data=DOCUMENT) == 'one,/1\r\ntwo,/2\r\n'
+        assert request(server, data='<ul><li>x</li></ul>') == 'NULL,NULL\r\n'
+
+
+    def test_reports_errors(self, server, tmpdir):
+        from screp.server import (
+                request,
+                ServerError,
+                )
+
+        with pytest.raises(ServerError) as e:
+            request(server, source=str(tmpdir.join('missing.html')))
+
+        assert 'No such file' in str(e.value)
+
+        # the server still works
+        assert request(server, data=DOCUMENT) == 'one,/1\r\ntwo,/2\r\n'
+
+
+    def test_serves_several_requests_per_connection(self, server):
+        from screp.server import read_response
+
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(server)
+
+        rfile = s.makefile('rb')
+
+        for _ in xrange(3):
+            s.sendall('DATA %d\n%s' % (len(DOCUMENT), DOCUMENT))
+            assert read_response(rfile) == 'one,/1\r\ntwo,/2\r\n'
+
+        s.close()
+
+
+    def test_limits_connections(self, tmpdir):
+        from screp.server import read_response
+
+        path = str(tmpdir.join('screp.sock'))
+
+        process = start_server(path, '--max-connections', '1', '-c', '$.fdesc("a").text', 'li')
+
+        try:
+            request = 'DATA %d\n%s' % (len(DOCUMENT), DOCUMENT)
+
+            first = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            first.connect(path)
+            first.sendall(request)
+            assert read_response(first.makefile('rb')) == 'one\r\ntwo\r\n'
+
+            second = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            second.connect(path)
+            second.sendall(request)
+            second.settimeout(0.5)
+
+            # waits for the first connection to be closed
+            with pytest.raises(socket.timeout):
+                second.recv(1)
+
+            first.close()
+
+            second.settimeout(5)
+            assert read_response(second.makefile('rb')) == 'one\r\ntwo\r\n'
+        finally:
+            process.kill()
+            process.wait()
+
+
+class TestShutdown(object):
+    @pytest.mark.parametrize('signum', [signal.SIGTERM, signal.SIGINT])
+    def test_finishes_requests_then_exits(self, tmpdir, signum):
+        from screp.server import read_response
+
+        path = str(tmpdir.join('screp.sock'))
+
+        process = start_server(path, '-c', '$.fdesc("a").text', 'li')
+
+        try:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            s.connect(path)
+
+            rfile = s.makefile('rb')
+
+            s.sendall('DATA %d\n%s' % (len(DOCUMENT), DOCUMENT))
+            assert read_response(rfile) == 'one\r\ntwo\r\n'
+
+            # half sent when the server is stopped
+            s.sendall('DATA %d\n' % (len(DOCUMENT),))
+
+            process.send_signal(signum)
+            time.sleep(0.3)
+
+            s.sendall(DOCUMENT)
+            assert read_response(rfile) == 'one\r\ntwo\r\n'
+
+            # then the connection is closed
+            assert rfile.read() == ''
+
+            assert process.wait() == 0
+            assert not os.path.exists(path)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+    def test_closes_idle_connections(self, tmpdir):
+        path = str(tmpdir.join('screp.sock'))
+
+        process = start_server(path, '-c', '$.fdesc("a").text', 'li')
+
+        try:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            s.connect(path)
+            # accepted before stopping
+            time.sleep(0.3)
+
+            process.send_signal(signal.SIGTERM)
+
+            assert s.makefile('rb').read() == ''
+            assert process.wait() == 0
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+    def test_stops_at_max_connections(self, tmpdir):
+        path = str(tmpdir.join('screp.sock'))
+
+        process = start_server(path, '--max-connections', '1', '-c', '$.fdesc("a").text', 'li')
+
+        try:
+            first = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            first.connect(path)
+            time.sleep(0.3)
+
+            # waits for the first connection to be closed
+            second = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            second.connect(path)
+            time.sleep(0.3)
+
+            first.settimeout(5)
+            second.settimeout(5)
+            process.send_signal(signal.SIGTERM)
+
+            assert first.makefile('rb').read() == ''
+            assert second.makefile('rb').read() == ''
+            assert process.wait() == 0
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+    def test_refuses_a_used_socket(self, server):
+        process = subprocess.Popen([sys.executable, '-m', 'screp.main', '--serve', server, '-c', '$.text', 'li'],
+                cwd=ROOT, stderr=subprocess.PIPE)
+
+        (_, err) = process.communicate()
+
+        assert process.returncode == 1
+        assert 'already listens' in err
@@ -0,0 +1,132 @@
+import pytest
+
+
+def spin(seconds):
+    import time
+
+    end = time.time() + seconds
+
+    while time.time() < end:
+        pass
+
+
+class TestStats(object):
+    def test_times_stages(self):
+        from screp.stats import Stats
+
+        stats = Stats()
+
+        assert stats.time('a', lambda x: x + 1, 1) == 2
+        stats.time('a', spin, 0.01)
+
+        report = stats.report()
+
+        assert report['stages']['a']['calls'] == 2
+        assert report['stages']['a']['wall'] >= 0.01
+        assert report['stages']['a']['cpu'] > 0
+        assert report['wall'] >= report['stages']['a']['wall']
+
+
+    def test_nested_stages_are_excluded(self):
+        from screp.stats import Stats
+
+        stats = Stats()
+
+        def outer():
+            spin(0.01)
+            stats.time('inner', spin, 0.05)
+
+        stats.time('outer', outer)
+
+        stages = stats.report()['stages']
+
+        assert stages['inner']['wall'] >= 0.05
+        assert 0.01 <= stages['outer']['wall'] < 0.05
+
+
+    def test_errors_are_timed(self):
+        from screp.stats import Stats
+
+        stats = Stats()
+
+        with pytest.raises(ValueError):
+            stats.time('a', int, 'x')
+
+        assert stats.report()['stages']['a']['calls'] == 1
+
+
+    def test_timed_iter(self):
+        from screp.stats import Stats
+
+        stats = Stats()
+
+        assert list(stats.timed_iter('a', iter([1, 2, 3]))) == [1, 2, 3]
+        # the last call raises StopIteration
+        assert stats.report()['stages']['a']['calls'] == 4
+
+
+    def test_counters(self):
+        from screp.stats import Stats
+
+        stats = Stats()
+
+        stats.count('records', 10)
+        stats.count('records')
+        stats.count('errors')
+
+        assert stats.report()['counters'] == {'records': 11, 'errors': 1}
+
+
+    def test_report_is_json(self):
+        import json
+        import StringIO
+        from screp.stats import Stats
+
+        stats = Stats()
+        stats.count('documents')
+        stats.time('a', len, 'x')
+
+        out = StringIO.StringIO()
+        stats.write_report(out)
+
+        report = json.loads(out.getvalue())
+
+        assert report['counters'] == {'documents': 1}
+        assert set(report['stages']) == set(['a'])
+
+
+    def test_sections(self):
+        from screp.stats import Stats
+
+        stats = Stats()
+        stats.add_section('actions', {'csv_format:2 text': {'calls': 1, 'wall': 0.5}})
+
+        assert stats.report()['actions'] == {'csv_format:2 text': {'calls': 1, 'wall': 0.5}}
+
+
+class TestTimedStream(object):
+    def test_counts_bytes(self):
+        import StringIO
+        from screp.stats import (
+                Stats,
+                TimedStream,
+                )
+
+        stats = Stats()
+
+        out = StringIO.StringIO()
+        timed_out = TimedStream(out, stats, stage='output', counter='bytes_out')
+        timed_out.write('abc')
+        timed_out.flush()
+
+        timed_in = TimedStream(StringIO.StringIO('0123456789'), stats, stage='read_data', counter='bytes_in')
+
+        assert timed_in.read(4) == '0123'
+        assert timed_in.read() == '456789'
+
+        report = stats.report()
+
+        assert out.getvalue() == 'abc'
+        assert report['counters'] == {'bytes_out': 3, 'bytes_in': 10}
+        assert report['stages']['output']['calls'] == 2
+        assert report['stages']['read_data']['calls'] == 2
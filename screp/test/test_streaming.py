@@ -0,0 +1,133 @@
+import pytest
+from StringIO import StringIO
+
+
+document = '''<html><body>
+<div id="d1" class="x"><p>one</p><ul><li>a</li><li class="x">b</li><li>c</li></ul></div>
+<div id="d2"><p>two</p><ul><li>d</li><li>e</li></ul><span class="x">f</span></div>
+<table><tr><td>1</td><td>2</td></tr><tr><td>3</td><td></td></tr></table>
+</body></html>'''
+
+
+def make_program(spec, anchors=()):
+    from screp.main import make_anchors_factory
+    from screp.format_parsers import parse_csv_formatter
+
+    factory = make_anchors_factory(anchors)
+
+    (_, terms) = parse_csv_formatter(spec, factory)
+
+    return (terms, factory)
+
+
+def text(element):
+    return ''.join(element.itertext())
+
+
+def document_matches(selector):
+    import lxml.html as html
+    from lxml.cssselect import CSSSelector
+
+    return [text(e) for e in CSSSelector(selector)(html.fromstring(document))]
+
+
+selectors = [
+        'div',
+        '.x',
+        'li',
+        'ul > li',
+        'div li',
+        'li:nth-child(2)',
+        'li:first-child',
+        'li:last-child',
+        'li + li',
+        'p ~ ul',
+        'td:empty',
+        ]
+
+
+class TestMatchingTranslator(object):
+    @pytest.mark.parametrize('selector', selectors)
+    def test_matches_like_selector(self, selector):
+        import lxml.html as html
+        from lxml.cssselect import CSSSelector
+        from screp.streaming import make_matcher
+
+        dom = html.fromstring(document)
+        matcher = make_matcher(selector)
+
+        expected = CSSSelector(selector)(dom)
+
+        assert [e for e in dom.iter() if matcher(e)] == expected
+
+
+class TestProgramReach(object):
+    cases = [
+            ('$.text', [], 0),
+            ('$.desc("a").first.text', [], 0),
+            ('$.parent.text', [], 1),
+            ('$.parent.parent.tag', [], 2),
+            ('$.fsiblings("p").first.text', [], 1),
+            ('$.ancestors("div").first.tag', [], None),
+            ('@.desc("a").first.text', [], None),
+            ('$.text, $.parent.tag', [], 1),
+            ('p.text', ['p=$.parent'], 1),
+            ('p.parent.tag', ['p=$.parent'], 2),
+            ('$.text', ['p=$.ancestors("div").first'], None),
+            ]
+
+    @pytest.mark.parametrize(('spec', 'anchors', 'reach'), cases)
+    def test_reach(self, spec, anchors, reach):
+        from screp.streaming import program_reach
+
+        (terms, factory) = make_program(spec, anchors)
+
+        assert program_reach(terms, factory) == reach
+
+
+class TestIterStreamMatches(object):
+    @pytest.mark.parametrize('selector', selectors)
+    @pytest.mark.parametrize('reach', [0, 1, None])
+    def test_matches_like_selector(self, selector, reach):
+        from screp.streaming import iter_stream_matches
+
+        # the text is read as matches are generated, before it may be released
+        matches = [text(e) for (_, e) in iter_stream_matches(StringIO(document), selector, reach, chunk_size=16)]
+
+        assert matches == document_matches(selector)
+
+
+    def test_small_chunks(self):
+        import screp.streaming as streaming
+
+        stream = StringIO(document)
+        events = list(streaming.iter_parse_events(stream, chunk_size=7))
+
+        assert len([e for (ev, e) in events if ev == 'end' and e.tag == 'li']) == 5
+
+
+    def test_releases_processed_elements(self):
+        from screp.streaming import iter_stream_matches
+
+        rows = ''.join('<div class="r"><span>%s</span></div>' % (i,) for i in xrange(1000))
+        stream = StringIO('<html><body>%s</body></html>' % (rows,))
+
+        sizes = []
+
+        for (_, e) in iter_stream_matches(stream, '.r', 0, chunk_size=256):
+            assert e[0].text is not None
+            sizes.append(len(e.getparent()))
+
+        assert len(sizes) == 1000
+        assert max(sizes) < 10
+
+
+    def test_keeps_elements_in_reach(self):
+        from screp.streaming import iter_stream_matches
+
+        stream = StringIO(document)
+
+        for (_, e) in iter_stream_matches(stream, 'li', 1, chunk_size=16):
+            # the whole list is available to the terms
+            assert len(e.getparent()) in (2, 3)
+            assert all(li.text is not None for li in e.getparent())
@@ -166,6 +166,41 @@ class TestTerm(object):
         assert term.execute('0') == '012'
 
 
+    def test_errors_are_identified(self):
+        from screp.termactions import GenericTermAction
+
+        def f(v, i):
+            return v[i]
+
+        term = TestTerm.make_term([GenericTermAction(lambda v: v, identification='first'),
+            GenericTermAction(f, args=[5], identification='second')])
+
+        with pytest.raises(Exception) as e:
+            term.execute('abc')
+
+        assert str(e.value).startswith('second: ')
+
+
+    def test_compiled_actions(self):
+        from screp.planner import compose
+        from screp.termactions import (
+                GenericTermAction,
+                GenericSelectorTermAction,
+                RegexTermAction,
+                )
+
+        actions = [
+                GenericTermAction(lambda v, a, b, c: v + a + b + c, args=['1', '2', '3']),
+                GenericTermAction(lambda v, a, b: v + a + b, args=['4', '5']),
+                GenericSelectorTermAction(lambda v, sel, a: v + sel(a), lambda s: s.upper(), args=['x']),
+                RegexTermAction(['[0-9]', '-', 'f']),
+                ]
+
+        term = TestTerm.make_term(actions)
+
+        assert compose([a.compile() for a in actions])('0') == term.execute('0') == '-12345X'
+
+
     def test_add_action_cannot_follow(self):
         term = TestTerm.make_term([TestTermAction.make_action(lambda x: x, out_type='t1')])
 
@@ -0,0 +1,103 @@
+import pytest
+import os
+import time
+
+
+class TestMapInWorkers(object):
+    def test_ordered(self):
+        from screp.workers import map_in_workers
+
+        # earlier items take longer, so they complete last
+        def f(i):
+            time.sleep(0.05 * (5 - i))
+            return i * i
+
+        assert list(map_in_workers(f, range(6), 3)) == [i * i for i in range(6)]
+
+
+    def test_unordered(self):
+        from screp.workers import map_in_workers
+
+        def f(i):
+            time.sleep(0.05 * (5 - i))
+            return i * i
+
+        assert sorted(map_in_workers(f, range(6), 3, ordered=False)) == [i * i for i in range(6)]
+
+
+    def test_runs_in_other_processes(self):
+        from screp.workers import map_in_workers
+
+        pids = set(map_in_workers(lambda i: os.getpid(), range(4), 2))
+
+        assert os.getpid() not in pids
+
+
+    def test_inherits_unpicklable_state(self):
+        from screp.workers import map_in_workers
+
+        # a closure over a lambda cannot be pickled, only inherited
+        g = lambda x: x + 1
+
+        assert list(map_in_workers(lambda i: g(i), range(3), 2)) == [1, 2, 3]
+
+
+    def test_errors_are_raised_in_parent(self):
+        from screp.workers import map_in_workers
+
+        def f(i):
+            if i == 2:
+                raise KeyError('item %s' % (i,))
+            return i
+
+        results = map_in_workers(f, range(4), 2)
+
+        assert results.next() == 0
+        assert results.next() == 1
+
+        with pytest.raises(KeyError):
+            results.next()
+
+
+    @pytest.mark.parametrize('ordered', [True, False])
+    def test_bounded_window(self, ordered):
+        from screp.workers import map_in_workers
+
+        taken = []
+
+        def items():
+            for i in xrange(100):
+                taken.append(i)
+                yield i
+
+        results = map_in_workers(lambda i: time.sleep(0.01), items(), 2, ordered=ordered, window=4)
+
+        results.next()
+
+        # the window, and the item whose submission made it overflow
+        assert len(taken) <= 5
+
+        assert len(list(results)) == 99
+        assert len(taken) == 100
+
+
+    def test_unpicklable_errors(self):
+        import urllib2
+        from screp.workers import portable_exception
+
+        # pickled, but not unpickled
+        e = urllib2.HTTPError('http://example.com/', 404, 'Not Found', {}, None)
+
+        assert type(portable_exception(e)) is Exception
+        assert str(portable_exception(e)) == str(e)
+
+        e = ValueError('Bad value')
+
+        assert portable_exception(e) is e
+
+
+    def test_invalid_workers(self):
+        from screp.workers import map_in_workers
+
+        with pytest.raises(ValueError):
+            list(map_in_workers(lambda i: i, range(3), 0))
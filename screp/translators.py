@@ -0,0 +1,48 @@
+"""
+The translators of CSS selectors to XPath expressions used by translate_css.
+Importing cssselect takes a while, so this module is imported only when a
+selector is actually translated, which a cached program does not need.
+"""
+from cssselect import GenericTranslator
+from lxml.cssselect import LxmlTranslator
+
+
+def add_condition(xpath, condition):
+    # unlike XPathExpr.add_condition, keeps the existing condition grouped
+    if xpath.condition:
+        xpath.condition = '(%s) and (%s)' % (xpath.condition, condition)
+    else:
+        xpath.condition = condition
+
+    return xpath
+
+
+class MatchingTranslator(GenericTranslator):
+    """
+    Translates CSS selectors to XPath expressions that test whether the context
+    element itself matches, by turning combinators into conditions on its
+    ancestors and preceding siblings. To be used with the 'self::' prefix.
+    """
+    def xpath_descendant_combinator(self, left, right):
+        return add_condition(right, 'ancestor::%s' % (left,))
+
+
+    def xpath_child_combinator(self, left, right):
+        return add_condition(right, 'parent::%s' % (left,))
+
+
+    def xpath_direct_adjacent_combinator(self, left, right):
+        return add_condition(right, 'preceding-sibling::*[1][self::%s]' % (left,))
+
+
+    def xpath_indirect_adjacent_combinator(self, left, right):
+        return add_condition(right, 'preceding-sibling::%s' % (left,))
+
+
+# the translators, by name
+translators = {
+        'generic': GenericTranslator(),
+        'matching': MatchingTranslator(),
+        # the translator of lxml's CSSSelector
+        'lxml': LxmlTranslator(),
+        }
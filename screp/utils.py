@@ -1,6 +1,11 @@
 import sys
 
-from cssselect import GenericTranslator
+from lxml.etree import (
+        XPath,
+        FunctionNamespace,
+        )
+
+from .docindex import memoized
 
 
 def raise_again(s):
@@ -20,4 +25,85 @@ def preprocess_selector(selector):
         return selector
 
 
-generic_translator = GenericTranslator()
+def get_translator(name):
+    """
+    Returns the translator 'name' (see translators.py), importing cssselect
+    the first time.
+    """
+    from .translators import translators
+
+    return translators[name]
+
+
+# key -> translation, for the selectors translated so far; saved with the
+# compiled programs, so that later runs don't translate them again
+css_translations = {}
+
+
+def cached_translation(key, translate):
+    """
+    Returns the translation with the given key, computing it with 'translate'
+    the first time.
+    """
+    try:
+        return css_translations[key]
+    except KeyError:
+        xpath = css_translations[key] = translate()
+        return xpath
+
+
+# whether the XPath functions of lxml's translations are registered
+lxml_functions_registered = False
+
+
+def register_functions(translator):
+    """
+    Registers the XPath functions the translations of 'translator' call, if
+    not done yet: lxml's translator calls one for :contains(), registered when
+    lxml.cssselect is imported, which running a cached program doesn't do.
+    """
+    global lxml_functions_registered
+
+    if translator != 'lxml' or lxml_functions_registered:
+        return
+
+    ns = FunctionNamespace('http://codespeak.net/lxml/css/')
+    ns.prefix = '__lxml_internal_css'
+    ns['lower-case'] = lambda context, s: s.lower()
+
+    lxml_functions_registered = True
+
+
+def translate_css(css, prefix='descendant-or-self::', translator='generic'):
+    register_functions(translator)
+
+    return cached_translation((translator, css, prefix), lambda: get_translator(translator).css_to_xpath(css, prefix=prefix))
+
+
+class CachedCSSSelector(XPath):
+    """
+    Like lxml's CSSSelector, but translated with translate_css, and without
+    importing lxml.cssselect unless translating.
+    """
+    def __init__(self, css):
+        XPath.__init__(self, translate_css(css, translator='lxml'))
+        self.css = css
+
+
+    def __call__(self, element):
+        return memoized(self, element, self._select)
+
+
+    def _select(self, element):
+        return XPath.__call__(self, element)
+
+
+    def first(self, element):
+        return self(element)[0]
+
+
+    def __repr__(self):
+        return '<%s %s for %r>' % (
+                self.__class__.__name__,
+                hex(abs(id(self)))[2:],
+                self.css)
@@ -0,0 +1,121 @@
+import multiprocessing
+import pickle
+import signal
+import Queue
+from collections import deque
+
+
+# how many items, per worker, may be submitted ahead of the results generated
+WINDOW_FACTOR = 2
+
+
+# the function the worker processes apply to each item; it is set before the
+# workers are forked, so that they inherit it (and the compiled program it
+# refers to) once, instead of receiving it pickled with every item
+job = None
+
+
+def init_worker():
+    # interruptions are handled by the parent, which terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def portable_exception(e):
+    # some exceptions are pickled, but cannot be unpickled (urllib2.HTTPError)
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return Exception(str(e))
+
+
+def run_job(item):
+    try:
+        return (job(item), None)
+    except Exception as e:
+        return (None, portable_exception(e))
+
+
+def wait_for(get):
+    # waiting with a timeout keeps the parent responsive to signals
+    while True:
+        try:
+            return get(1.0)
+        except (multiprocessing.TimeoutError, Queue.Empty):
+            continue
+
+
+def iter_ordered(pool, items, window):
+    pending = deque()
+
+    for item in items:
+        pending.append(pool.apply_async(run_job, (item,)))
+
+        while len(pending) > window:
+            yield wait_for(pending.popleft().get)
+
+    while len(pending) > 0:
+        yield wait_for(pending.popleft().get)
+
+
+def iter_unordered(pool, items, window):
+    done = Queue.Queue()
+    pending = 0
+
+    for item in items:
+        pool.apply_async(run_job, (item,), callback=done.put)
+        pending += 1
+
+        while pending > window:
+            yield wait_for(lambda timeout: done.get(True, timeout))
+            pending -= 1
+
+    for _ in xrange(pending):
+        yield wait_for(lambda timeout: done.get(True, timeout))
+
+
+def map_in_workers(f, items, workers, ordered=True, window=None):
+    """
+    Generates f(item) for each of the items, computed by a pool of 'workers'
+    processes; the results follow the order of the items or, if not 'ordered',
+    the order in which they are completed.
+
+    The worker processes are forked with 'f' already in place, so only the
+    items and the results are passed between processes; both must be picklable.
+    An exception raised by 'f' is raised again in the parent.
+
+    At most 'window' items (by default WINDOW_FACTOR per worker) are taken
+    from 'items' ahead of the results generated, so that a lazy sequence of
+    large items is not read all at once.
+    """
+    global job
+
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1!")
+
+    if window is None:
+        window = workers * WINDOW_FACTOR
+
+    job = f
+
+    pool = multiprocessing.Pool(workers, initializer=init_worker)
+
+    try:
+        if ordered:
+            results = iter_ordered(pool, items, window)
+        else:
+            results = iter_unordered(pool, items, window)
+
+        for (result, error) in results:
+            if error is not None:
+                raise error
+
+            yield result
+
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        job = None